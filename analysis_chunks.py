@@ -0,0 +1,212 @@
+"""
+Focus Catcher - Chunked Session Analysis
+大会话的分块分析（map-reduce）：按 token 预算切分捕捉、并发摘要各片段、摘要过多时逐层合并到汇总 Prompt 的预算内、按内容哈希缓存片段摘要
+"""
+
+import hashlib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database import ChunkSummary
+from focus_prompts import CHUNK_MERGE_PROMPT, CHUNK_SUMMARY_PROMPT
+
+# 单个分析 Prompt 中捕捉内容的 token 预算，超出则改用分块分析
+ANALYSIS_PROMPT_TOKENS = int(os.getenv("ANALYSIS_PROMPT_TOKENS", "6000"))
+
+# 每个片段的 token 预算
+ANALYSIS_CHUNK_TOKENS = int(os.getenv("ANALYSIS_CHUNK_TOKENS", "2000"))
+
+# 同时进行的片段摘要请求数
+ANALYSIS_CHUNK_CONCURRENCY = int(os.getenv("ANALYSIS_CHUNK_CONCURRENCY", "4"))
+
+# 片段摘要缓存最多保留的行数，超出时删除最久未使用的
+ANALYSIS_CHUNK_CACHE_ROWS = int(os.getenv("ANALYSIS_CHUNK_CACHE_ROWS", "10000"))
+
+# 每条捕捉送入 Prompt 的最大字符数
+CAPTURE_PREVIEW_CHARS = 200
+
+_CJK_RE = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: one per CJK character, one per four other characters."""
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+def capture_preview(text: str) -> str:
+    return (text or "")[:CAPTURE_PREVIEW_CHARS]
+
+
+def fits_in_prompt(texts: list[str], budget: int = ANALYSIS_PROMPT_TOKENS) -> bool:
+    """Whether the capture previews fit in a single analysis prompt."""
+    return sum(estimate_tokens(capture_preview(text)) for text in texts) <= budget
+
+
+def split_into_chunks(texts: list[str], budget: int = ANALYSIS_CHUNK_TOKENS) -> list[list[str]]:
+    """
+    Split capture previews, in order, into chunks of at most `budget` tokens.
+
+    Chunks are filled greedily from the start, so appending captures to a
+    session only changes its last chunk and earlier summaries stay cached.
+    """
+    chunks, current, used = [], [], 0
+    for text in texts:
+        preview = capture_preview(text)
+        tokens = estimate_tokens(preview)
+        if current and used + tokens > budget:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(preview)
+        used += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def chunk_hash(chunk: list[str], prompt: str = CHUNK_SUMMARY_PROMPT) -> str:
+    """Content hash of a chunk, including the prompt so prompt edits invalidate it."""
+    digest = hashlib.sha256(prompt.encode("utf-8"))
+    for preview in chunk:
+        digest.update(b"\x00")
+        digest.update(preview.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def group_summaries(summaries: list[str], budget: int = ANALYSIS_CHUNK_TOKENS) -> list[list[str]]:
+    """
+    Group consecutive summaries of at most `budget` tokens for merging.
+
+    Every group but a trailing single one has at least two summaries, so
+    each merge round shrinks the list even when summaries are long.
+    """
+    groups, current, used = [], [], 0
+    for summary in summaries:
+        tokens = estimate_tokens(summary)
+        if len(current) >= 2 and used + tokens > budget:
+            groups.append(current)
+            current, used = [], 0
+        current.append(summary)
+        used += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _chunk_prompt(chunk: list[str]) -> str:
+    captures_list = "\n".join(f"{idx}. {preview}" for idx, preview in enumerate(chunk, 1))
+    return CHUNK_SUMMARY_PROMPT.format(capture_count=len(chunk), captures_list=captures_list)
+
+
+def _merge_prompt(group: list[str]) -> str:
+    return CHUNK_MERGE_PROMPT.format(summary_count=len(group), chunk_summaries=format_chunk_summaries(group))
+
+
+def _summarize_cached(db: Session, chunks: list[list[str]], template: str, build_prompt, generate) -> list[str]:
+    """
+    Summarize each chunk, reusing cached summaries.
+
+    The missing ones are requested concurrently, at most
+    ANALYSIS_CHUNK_CONCURRENCY at a time, and stored afterwards.
+
+    Args:
+        template: The prompt template (part of the cache key)
+        build_prompt: Callable (chunk) -> prompt
+    """
+    hashes = [chunk_hash(chunk, template) for chunk in chunks]
+
+    cached = {
+        row.content_hash: row.summary
+        for row in db.query(ChunkSummary).filter(ChunkSummary.content_hash.in_(set(hashes))).all()
+    }
+    missing = {key: chunk for key, chunk in zip(hashes, chunks) if key not in cached}
+    print(f"[Analysis] {len(chunks)} chunk(s), {len(chunks) - len(missing)} cached, {len(missing)} to summarize")
+
+    if cached:
+        db.query(ChunkSummary).filter(ChunkSummary.content_hash.in_(set(cached))).update(
+            {ChunkSummary.last_used_at: datetime.utcnow()}, synchronize_session=False
+        )
+
+    if missing:
+        def summarize(chunk):
+            return generate(build_prompt(chunk)).strip()
+
+        with ThreadPoolExecutor(max_workers=min(ANALYSIS_CHUNK_CONCURRENCY, len(missing))) as pool:
+            summaries = list(pool.map(summarize, missing.values()))
+
+        for (key, chunk), summary in zip(missing.items(), summaries):
+            cached[key] = summary
+            db.merge(ChunkSummary(content_hash=key, capture_count=len(chunk), summary=summary))
+        evict_chunk_summaries(db)
+
+    db.commit()
+    return [cached[key] for key in hashes]
+
+
+def summarize_in_chunks(db: Session, texts: list[str], generate) -> list[str]:
+    """
+    Summarize captures chunk by chunk (the map step).
+
+    Args:
+        db: Database session (only used from the calling thread)
+        texts: Capture texts in session order
+        generate: Callable (prompt) -> str calling the LLM
+
+    Returns:
+        One summary per chunk, in order
+    """
+    return _summarize_cached(db, split_into_chunks(texts), CHUNK_SUMMARY_PROMPT, _chunk_prompt, generate)
+
+
+def reduce_chunk_summaries(db: Session, summaries: list[str], generate,
+                           budget: int = ANALYSIS_PROMPT_TOKENS) -> list[str]:
+    """
+    Merge consecutive summaries, level by level, until they fit in one prompt.
+
+    Each level groups the summaries with group_summaries and asks the LLM
+    to merge every group (merged summaries are cached like chunk ones).
+
+    Args:
+        db: Database session
+        summaries: Chunk summaries in session order
+        generate: Callable (prompt) -> str calling the LLM
+        budget: Token budget of the formatted summaries
+
+    Returns:
+        Summaries whose format_chunk_summaries text fits the budget (or a single one)
+    """
+    level = 0
+    while len(summaries) > 1 and estimate_tokens(format_chunk_summaries(summaries)) > budget:
+        level += 1
+        groups = group_summaries(summaries)
+        print(f"[Analysis] Merging {len(summaries)} summaries into {len(groups)} (level {level})")
+        summaries = _summarize_cached(db, groups, CHUNK_MERGE_PROMPT, _merge_prompt, generate)
+    return summaries
+
+
+def evict_chunk_summaries(db: Session, max_rows: int = ANALYSIS_CHUNK_CACHE_ROWS) -> int:
+    """
+    Delete the least recently used cached summaries beyond max_rows.
+
+    Returns:
+        Number of rows deleted
+    """
+    excess = db.query(func.count(ChunkSummary.content_hash)).scalar() - max_rows
+    if excess <= 0:
+        return 0
+    oldest = db.query(ChunkSummary.content_hash).order_by(
+        func.coalesce(ChunkSummary.last_used_at, ChunkSummary.created_at).asc()
+    ).limit(excess).subquery()
+    return db.query(ChunkSummary).filter(
+        ChunkSummary.content_hash.in_(db.query(oldest.c.content_hash))
+    ).delete(synchronize_session=False)
+
+
+def format_chunk_summaries(summaries: list[str]) -> str:
+    """Join chunk summaries for the reduce prompt."""
+    return "\n\n".join(f"【片段 {idx}】\n{summary}" for idx, summary in enumerate(summaries, 1))
@@ -0,0 +1,179 @@
+"""
+Focus Catcher - Background Analysis Jobs
+后台 AI 分析任务队列：任务持久化到 SQLite，由固定数量的工作线程执行，同一会话的重复请求合并为一个任务
+"""
+
+import asyncio
+import json
+import os
+import queue
+import threading
+import traceback
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from database import AnalysisJob, SessionLocal
+
+# 同时执行分析的工作线程数
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "2"))
+
+# 仍在排队或执行中的任务状态
+ACTIVE_JOB_STATUSES = ("queued", "running")
+
+
+class AnalysisJobQueue:
+    """
+    Bounded pool of worker threads running session analyses.
+
+    Jobs are stored as AnalysisJob rows so their state and result survive a
+    restart; an in-memory event per job lets callers wait for completion.
+    """
+
+    def __init__(self, handler, workers: int = ANALYSIS_WORKERS):
+        """
+        Args:
+            handler: Callable (db, session_id) -> dict returning the analysis result
+            workers: Number of worker threads
+        """
+        self._handler = handler
+        self._workers = max(1, workers)
+        self._queue = queue.Queue()
+        self._events = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        """Start the worker threads (no-op if they are already running)."""
+        if self._threads:
+            return
+        for index in range(self._workers):
+            thread = threading.Thread(target=self._run, name=f"analysis-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        """Ask the workers to exit once their current job is done."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def enqueue(self, db: Session, session_id: int) -> AnalysisJob:
+        """
+        Queue an analysis of a session.
+
+        If the session already has a queued or running job, that job is
+        returned instead of creating a second one.
+        """
+        with self._lock:
+            job = db.query(AnalysisJob).filter(
+                AnalysisJob.session_id == session_id,
+                AnalysisJob.status.in_(ACTIVE_JOB_STATUSES)
+            ).order_by(AnalysisJob.id.desc()).first()
+            if job is not None:
+                return job
+
+            job = AnalysisJob(session_id=session_id, status="queued")
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+            self._events[job.id] = threading.Event()
+        self._queue.put(job.id)
+        return job
+
+    def submit(self, session_id: int) -> AnalysisJob:
+        """enqueue() with its own database session (for the async endpoints)."""
+        db = SessionLocal()
+        try:
+            return self.enqueue(db, session_id)
+        finally:
+            db.close()
+
+    def recover(self, db: Session) -> int:
+        """Re-queue jobs left queued or running by a previous process."""
+        jobs = db.query(AnalysisJob).filter(
+            AnalysisJob.status.in_(ACTIVE_JOB_STATUSES)
+        ).order_by(AnalysisJob.id.asc()).all()
+        for job in jobs:
+            job.status = "queued"
+            job.started_at = None
+        db.commit()
+
+        for job in jobs:
+            with self._lock:
+                self._events.setdefault(job.id, threading.Event())
+            self._queue.put(job.id)
+        return len(jobs)
+
+    def wait(self, job_id: int, timeout: float) -> bool:
+        """
+        Block until the job has finished or the timeout expires.
+
+        Returns:
+            True if the job is no longer queued or running
+        """
+        with self._lock:
+            event = self._events.get(job_id)
+        if event is None:
+            return True
+        return event.wait(timeout)
+
+    async def wait_async(self, job_id: int, timeout: float, poll_interval: float = 0.2) -> bool:
+        """Like wait(), but polls without holding a threadpool thread."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            with self._lock:
+                event = self._events.get(job_id)
+            if event is None or event.is_set():
+                return True
+            if loop.time() >= deadline:
+                return False
+            await asyncio.sleep(poll_interval)
+
+    def pending_count(self) -> int:
+        """Number of jobs queued or running in this process."""
+        with self._lock:
+            return len(self._events)
+
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                break
+
+            db = SessionLocal()
+            try:
+                job = db.query(AnalysisJob).filter(AnalysisJob.id == job_id).first()
+                if job is None or job.status not in ACTIVE_JOB_STATUSES:
+                    continue
+                job.status = "running"
+                job.started_at = datetime.utcnow()
+                db.commit()
+
+                try:
+                    result = self._handler(db, job.session_id)
+                except Exception as e:
+                    db.rollback()
+                    job.status = "failed"
+                    # HTTPException carries a status code and detail worth keeping
+                    job.error_status = getattr(e, "status_code", 500)
+                    job.error = str(getattr(e, "detail", e))
+                    print(f"[Analysis] Job #{job_id} failed: {job.error}")
+                else:
+                    job.status = "done"
+                    job.result = json.dumps(result, ensure_ascii=False)
+                job.finished_at = datetime.utcnow()
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                print(f"[Analysis] Error running job #{job_id}: {e}")
+                traceback.print_exc()
+            finally:
+                db.close()
+                with self._lock:
+                    event = self._events.pop(job_id, None)
+                if event:
+                    event.set()
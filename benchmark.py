@@ -0,0 +1,214 @@
+"""
+Focus Catcher - Load Benchmark
+端到端基准测试：使用临时 SQLite 数据库和离线模拟的 LLM 启动服务，并发请求捕捉、会话列表和分析接口，输出延迟分位数和吞吐量（JSON）
+
+Usage:
+    python benchmark.py --captures 500 --concurrency 16 --llm-latency 0.2 --output bench.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+# 模拟的学习主题，每个主题连续捕捉若干条，以触发主题检测和会话切换
+TOPICS = [
+    ("python asyncio", ["event loop", "coroutine", "await", "gather tasks", "async generator", "semaphore"]),
+    ("比特币 交易", ["区块链", "挖矿", "钱包地址", "手续费", "闪电网络", "交易确认"]),
+    ("react hooks", ["useState", "useEffect cleanup", "useMemo", "custom hook", "dependency array", "useContext"]),
+    ("机器学习 模型", ["梯度下降", "过拟合", "交叉验证", "正则化", "学习率", "损失函数"]),
+    ("sqlite performance", ["WAL mode", "index", "vacuum", "page cache", "busy timeout", "query plan"]),
+]
+
+
+def capture_text(index: int, block: int, rng: random.Random) -> str:
+    topic, details = TOPICS[(index // block) % len(TOPICS)]
+    return f"{topic} {rng.choice(details)} {rng.choice(details)} #{index}"
+
+
+def percentile(ordered: list[float], p: float) -> float | None:
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))], 2)
+
+
+def summarize(latencies: list[float], errors: dict, duration: float) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(latencies) + sum(errors.values()),
+        "errors": errors,
+        "p50_ms": percentile(ordered, 50),
+        "p95_ms": percentile(ordered, 95),
+        "p99_ms": percentile(ordered, 99),
+        "mean_ms": round(sum(ordered) / len(ordered), 2) if ordered else None,
+        "max_ms": round(ordered[-1], 2) if ordered else None,
+        "throughput_rps": round(len(latencies) / duration, 2) if duration else None,
+        "duration_s": round(duration, 3)
+    }
+
+
+async def run_load(client, total: int, concurrency: int, send) -> dict:
+    """
+    Send `total` requests with at most `concurrency` in flight.
+
+    Args:
+        send: Coroutine function (client, index) -> httpx.Response
+    """
+    latencies, errors = [], {}
+    next_index = iter(range(total))
+
+    async def worker():
+        for index in next_index:
+            started = time.perf_counter()
+            try:
+                response = await send(client, index)
+                status = response.status_code
+            except Exception as e:
+                status = type(e).__name__
+            elapsed = (time.perf_counter() - started) * 1000
+            if status == 200 or status == 202:
+                latencies.append(elapsed)
+            else:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def drive(args, base_url: str, main) -> dict:
+    import httpx
+
+    rng = random.Random(args.seed)
+    texts = [capture_text(i, args.topic_block, rng) for i in range(args.captures)]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        async def send_capture(client, index):
+            return await client.post("/api/focus/capture", json={
+                "selected_text": texts[index],
+                "page_url": f"https://example.com/{index % 50}",
+                "page_title": texts[index][:30],
+                "deferred": args.deferred
+            })
+
+        results["capture"] = await run_load(client, args.captures, args.concurrency, send_capture)
+
+        # Deferred captures are placed in the background; let that finish first
+        placement_started = time.perf_counter()
+        while main.placement_worker.pending_count():
+            await asyncio.sleep(0.05)
+        results["capture"]["placement_drain_s"] = round(time.perf_counter() - placement_started, 3)
+
+        async def send_list(client, index):
+            return await client.get("/api/focus/sessions", params={"limit": 50})
+
+        results["sessions"] = await run_load(client, args.session_requests, args.concurrency, send_list)
+
+        sessions = (await client.get("/api/focus/sessions", params={"limit": 200})).json()["sessions"]
+        session_ids = [s["id"] for s in sessions if s["capture_count"] > 0]
+
+        async def send_analyze(client, index):
+            return await client.post(f"/api/focus/analyze/{session_ids[index % len(session_ids)]}")
+
+        if session_ids and args.analyze_requests:
+            results["analyze"] = await run_load(client, args.analyze_requests, args.concurrency, send_analyze)
+            results["analyze"]["sessions"] = len(session_ids)
+
+        results["llm"] = (await client.get("/api/llm/stats")).json()["sites"]
+
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Focus Catcher end-to-end load benchmark (offline, fake LLM)")
+    parser.add_argument("--captures", type=int, default=300, help="number of POST /api/focus/capture requests")
+    parser.add_argument("--session-requests", type=int, default=200, help="number of GET /api/focus/sessions requests")
+    parser.add_argument("--analyze-requests", type=int, default=20, help="number of POST /api/focus/analyze requests")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight per phase")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="fake LLM latency per call (seconds)")
+    parser.add_argument("--topic-block", type=int, default=20, help="consecutive captures per topic")
+    parser.add_argument("--topic-mode", default=None, help="TOPIC_DETECTION_MODE (local, llm, hybrid)")
+    parser.add_argument("--deferred", action="store_true", help="send captures with deferred placement")
+    parser.add_argument("--llm-cache", action="store_true", help="keep the LLM response cache enabled")
+    parser.add_argument("--timeout", type=float, default=60, help="per-request timeout (seconds)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--verbose", action="store_true", help="show the server's log output")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="focus-bench-")
+
+    # Must be set before the app (and its database engine) is imported
+    os.environ["FOCUS_DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["LLM_CACHE_PATH"] = os.path.join(workdir, "llm_cache.db") if args.llm_cache else ""
+    os.environ["LLM_BACKEND"] = "live"
+    if args.topic_mode:
+        os.environ["TOPIC_DETECTION_MODE"] = args.topic_mode
+
+    # The app serves ./frontend, so run from the project directory
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, os.getcwd())
+
+    log = sys.stdout if args.verbose else open(os.devnull, "w")
+    with contextlib.redirect_stdout(log):
+        import uvicorn
+        import main
+        from fake_llm import FakeGeminiModel, FakeOpenAIClient
+
+        # The gateway resolves these at call time, so the whole pipeline runs offline
+        main.get_gemini_model = lambda: FakeGeminiModel(args.llm_latency)
+        main.get_openai_client = lambda: FakeOpenAIClient(args.llm_latency)
+
+        port = free_port()
+        server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.05)
+
+        try:
+            results = asyncio.run(drive(args, f"http://127.0.0.1:{port}", main))
+        finally:
+            server.should_exit = True
+            thread.join(10)
+
+    report = {
+        "config": {
+            "captures": args.captures,
+            "session_requests": args.session_requests,
+            "analyze_requests": args.analyze_requests,
+            "concurrency": args.concurrency,
+            "llm_latency_s": args.llm_latency,
+            "topic_mode": os.getenv("TOPIC_DETECTION_MODE", "hybrid"),
+            "deferred": args.deferred,
+            "llm_cache": args.llm_cache,
+            "database": os.environ["FOCUS_DATABASE_URL"]
+        },
+        "results": results
+    }
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main_cli()
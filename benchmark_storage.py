@@ -0,0 +1,256 @@
+"""
+Focus Catcher - Storage Benchmark
+SQLite 存储基准测试：在同一份数据（默认 10 万条捕捉）上对比默认配置与调优配置（WAL、pragma、复合索引）下热点查询的延迟，并测量全文检索（FTS5）与 LIKE 全表扫描的延迟
+
+Usage:
+    python benchmark_storage.py --captures 100000 --sessions 2000 --output storage.json
+    python benchmark_storage.py --captures 1000000 --sessions 20000 --iterations 50 --writes 50
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# 本次调优新增的索引（基线配置中删除它们）
+TUNED_INDEXES = [
+    "ix_captures_session_timestamp",
+    "ix_sessions_status_start_time",
+    "ix_sessions_start_time_id",
+    "ix_captures_session_content_hash",
+]
+
+# 与 main.py 中的热点查询相同的 SQL
+QUERIES = {
+    "active_session": (
+        "SELECT * FROM sessions WHERE status = 'active' ORDER BY start_time DESC LIMIT 1",
+        lambda ctx: ()
+    ),
+    "session_page": (
+        "SELECT * FROM sessions ORDER BY start_time DESC, id DESC LIMIT 51",
+        lambda ctx: ()
+    ),
+    "session_captures": (
+        "SELECT * FROM captures WHERE session_id = ? ORDER BY timestamp ASC",
+        lambda ctx: (ctx["rng"].randint(1, ctx["sessions"]),)
+    ),
+    "recent_captures": (
+        "SELECT * FROM captures WHERE session_id = ? ORDER BY timestamp DESC LIMIT 5",
+        lambda ctx: (ctx["rng"].randint(1, ctx["sessions"]),)
+    ),
+}
+
+
+def percentile(ordered: list[float], p: float) -> float:
+    return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))], 3)
+
+
+def timings(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    return {
+        "p50_ms": percentile(ordered, 50),
+        "p95_ms": percentile(ordered, 95),
+        "p99_ms": percentile(ordered, 99),
+        "mean_ms": round(sum(ordered) / len(ordered), 3)
+    }
+
+
+def synthetic_vocabulary(rng: random.Random, size: int = 5000) -> list[str]:
+    """Random ASCII words and 2-4 character CJK words, so trigrams are spread like real text."""
+    words = set()
+    while len(words) < size:
+        if rng.random() < 0.3:
+            words.add("".join(chr(rng.randint(0x4E00, 0x9FA5)) for _ in range(rng.randint(2, 4))))
+        else:
+            words.add("".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 9))))
+    return sorted(words)
+
+
+def build_database(path: str, captures: int, sessions: int, seed: int):
+    """Create the app schema (via database.init_db) and fill it with synthetic data."""
+    os.environ["FOCUS_DATABASE_URL"] = f"sqlite:///{path}"
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import database
+    # Keep stdout for the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        database.init_db()
+    database.engine.dispose()
+
+    rng = random.Random(seed)
+    vocabulary = synthetic_vocabulary(rng)
+    start = datetime(2025, 1, 1)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO sessions (id, start_time, end_time, status, capture_count, core_goal) VALUES (?, ?, ?, ?, 0, ?)",
+        [
+            (i, start + timedelta(hours=i), start + timedelta(hours=i, minutes=50),
+             "active" if i == sessions else "completed", f"主题 {i}")
+            for i in range(1, sessions + 1)
+        ]
+    )
+    rows = []
+    for i in range(captures):
+        session_id = rng.randint(1, sessions)
+        rows.append((
+            session_id,
+            f"capture {i} about topic {session_id} " + " ".join(rng.choices(vocabulary, k=rng.randint(3, 20))),
+            f"https://example.com/{rng.randint(1, 500)}",
+            f"page {session_id}",
+            start + timedelta(hours=session_id, seconds=rng.randint(0, 3000)),
+            "placed"
+        ))
+    conn.executemany(
+        "INSERT INTO captures (session_id, selected_text, page_url, page_title, timestamp, placement_status) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        rows
+    )
+    conn.execute(
+        "UPDATE sessions SET capture_count = (SELECT COUNT(*) FROM captures WHERE captures.session_id = sessions.id)"
+    )
+    conn.commit()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return vocabulary
+
+
+def open_profile(path: str, profile: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, isolation_level=None)
+    if profile == "baseline":
+        # SQLite defaults as the app used them before: rollback journal, synchronous=FULL
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.execute("PRAGMA synchronous=FULL")
+        for name in TUNED_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+    else:
+        from database import SQLITE_BUSY_TIMEOUT_MS, SQLITE_CACHE_SIZE_KB, SQLITE_MMAP_SIZE
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("ANALYZE")
+    return conn
+
+
+def run_profile(path: str, profile: str, args) -> dict:
+    conn = open_profile(path, profile)
+    ctx = {"rng": random.Random(args.seed), "sessions": args.sessions}
+    results = {}
+
+    for name, (sql, params) in QUERIES.items():
+        samples = []
+        for _ in range(args.iterations):
+            values = params(ctx)
+            started = time.perf_counter()
+            conn.execute(sql, values).fetchall()
+            samples.append((time.perf_counter() - started) * 1000)
+        results[name] = timings(samples)
+        results[name]["plan"] = " / ".join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params(ctx)))
+
+    # A capture write as capture_focus does it: insert + counter update, one commit each
+    samples = []
+    for i in range(args.writes):
+        session_id = args.sessions
+        started = time.perf_counter()
+        conn.execute("BEGIN")
+        conn.execute(
+            "INSERT INTO captures (session_id, selected_text, page_url, timestamp, placement_status) VALUES (?, ?, ?, ?, 'placed')",
+            (session_id, f"benchmark write {i}", "https://example.com", datetime.utcnow())
+        )
+        conn.execute("UPDATE sessions SET capture_count = capture_count + 1 WHERE id = ?", (session_id,))
+        conn.execute("COMMIT")
+        samples.append((time.perf_counter() - started) * 1000)
+    results["capture_write"] = timings(samples)
+
+    conn.close()
+    return results
+
+
+def run_search(path: str, vocabulary: list[str], args) -> dict:
+    """Latency of /api/focus/search queries (first page of 20) on the tuned profile."""
+    from capture_search import build_search_query, MIN_INDEXED_TERM_CHARS
+
+    conn = open_profile(path, "tuned")
+    rng = random.Random(args.seed)
+    ascii_words = [word for word in vocabulary if word.isascii()]
+    cjk_words = [word for word in vocabulary if not word.isascii() and len(word) >= MIN_INDEXED_TERM_CHARS]
+    short_words = [word for word in vocabulary if len(word) < MIN_INDEXED_TERM_CHARS]
+
+    cases = {
+        "one_term": lambda: rng.choice(ascii_words),
+        "two_terms": lambda: f"{rng.choice(ascii_words)} {rng.choice(cjk_words)}",
+        "cjk_term": lambda: rng.choice(cjk_words),
+        "short_term_scan": lambda: rng.choice(short_words),
+        "no_match": lambda: rng.choice(ascii_words) + "qz",
+    }
+    results = {}
+    for name, make_query in cases.items():
+        samples = []
+        for _ in range(args.iterations):
+            sql, params, mode = build_search_query(make_query(), None, 20, 0)
+            started = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            samples.append((time.perf_counter() - started) * 1000)
+        results[name] = {**timings(samples), "mode": mode}
+
+    # What the no_match search costs without the index: a LIKE scan over every capture
+    samples = []
+    for _ in range(args.iterations):
+        started = time.perf_counter()
+        conn.execute(
+            "SELECT id FROM captures WHERE selected_text LIKE ? ORDER BY id DESC LIMIT 21",
+            (f"%{rng.choice(ascii_words)}qz%",)
+        ).fetchall()
+        samples.append((time.perf_counter() - started) * 1000)
+    results["like_scan_baseline"] = timings(samples)
+
+    conn.close()
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Compare SQLite storage profiles on a large synthetic database")
+    parser.add_argument("--captures", type=int, default=100000)
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--iterations", type=int, default=300, help="runs of each read query")
+    parser.add_argument("--writes", type=int, default=300, help="single-capture write transactions")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="focus-storage-")
+    source = os.path.join(workdir, "source.db")
+    vocabulary = build_database(source, args.captures, args.sessions, args.seed)
+
+    report = {"config": vars(args), "results": {}}
+    for profile in ("baseline", "tuned"):
+        path = os.path.join(workdir, f"{profile}.db")
+        shutil.copy(source, path)
+        report["results"][profile] = run_profile(path, profile, args)
+
+    report["search"] = run_search(os.path.join(workdir, "tuned.db"), vocabulary, args)
+
+    report["speedup_p50"] = {
+        name: round(report["results"]["baseline"][name]["p50_ms"] / max(report["results"]["tuned"][name]["p50_ms"], 1e-6), 1)
+        for name in report["results"]["tuned"]
+    }
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main_cli()
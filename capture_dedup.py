@@ -0,0 +1,202 @@
+"""
+Focus Catcher - Capture Deduplication
+捕捉去重：内容哈希识别完全重复，SimHash 签名识别近似重复，同一页面的重叠选区按 shingle 包含度识别；重复的捕捉合并到已有捕捉并累加命中次数
+"""
+
+import hashlib
+import os
+import re
+import unicodedata
+from dataclasses import dataclass, field
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database import Capture
+
+# 是否在写入时去重
+CAPTURE_DEDUP = os.getenv("CAPTURE_DEDUP", "true").lower() not in ("0", "false", "no")
+
+# 近似重复只与会话中最近的若干条捕捉比较（完全重复通过索引查整个会话）
+DEDUP_WINDOW = int(os.getenv("DEDUP_WINDOW", "100"))
+
+# SimHash 汉明距离不超过该值视为近似重复
+DEDUP_SIMHASH_DISTANCE = int(os.getenv("DEDUP_SIMHASH_DISTANCE", "3"))
+
+# 同一页面的两段选区，较短一段有该比例的 shingle 出现在另一段中即视为重叠
+DEDUP_CONTAINMENT = float(os.getenv("DEDUP_CONTAINMENT", "0.8"))
+
+# shingle 长度（字符），对中文和英文都适用
+SHINGLE_CHARS = 4
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """NFKC, lowercase, collapsed whitespace: copies differing only in these are exact duplicates."""
+    return _SPACE_RE.sub(" ", unicodedata.normalize("NFKC", text or "").lower()).strip()
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def shingles(text: str) -> set[int]:
+    """64-bit hashes of the overlapping character shingles of the normalized text."""
+    normalized = normalize_text(text)
+    if len(normalized) <= SHINGLE_CHARS:
+        grams = {normalized} if normalized else set()
+    else:
+        grams = {normalized[i:i + SHINGLE_CHARS] for i in range(len(normalized) - SHINGLE_CHARS + 1)}
+    return {
+        int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "big")
+        for gram in grams
+    }
+
+
+def simhash(features: set[int]) -> int:
+    """
+    64-bit SimHash of a feature set, as a signed integer (SQLite INTEGER range).
+
+    Each bit is set when more than half of the feature hashes have it set;
+    texts sharing most shingles get signatures a few bits apart.
+    """
+    if not features:
+        return 0
+    # One string of all hashes in binary; s[i::64] is bit i of every hash
+    bits = "".join(format(feature, "064b") for feature in features)
+    value = 0
+    for i in range(64):
+        value = (value << 1) | (bits[i::64].count("1") * 2 > len(features))
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count("1")
+
+
+def containment(a: set[int], b: set[int]) -> float:
+    """Share of the smaller shingle set found in the other one."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+@dataclass
+class Candidate:
+    """A capture's dedup signature (stored, or new in the current request)."""
+
+    text: str
+    page_url: str | None
+    content_hash: str
+    simhash: int
+    capture_id: int | None = None   # None until a new capture is inserted
+    extra_hits: int = 0             # Duplicates merged into a new capture before its insert
+    _shingles: set[int] | None = field(default=None, repr=False)
+
+    @classmethod
+    def from_text(cls, text: str, page_url: str | None = None, capture_id: int = None) -> "Candidate":
+        features = shingles(text)
+        candidate = cls(text, page_url, content_hash(text), simhash(features), capture_id)
+        candidate._shingles = features
+        return candidate
+
+    @property
+    def shingles(self) -> set[int]:
+        if self._shingles is None:
+            self._shingles = shingles(self.text)
+        return self._shingles
+
+
+class DuplicateFinder:
+    """
+    Looks up duplicates of new captures within a session.
+
+    Exact duplicates are found through the (session_id, content_hash) index
+    over the whole session; near duplicates and overlapping selections are
+    compared against the session's DEDUP_WINDOW most recent captures, which
+    are loaded once per session and extended with the captures added through
+    add(), so a batch also deduplicates against itself.
+    """
+
+    def __init__(self, db: Session, window: int = DEDUP_WINDOW):
+        self.db = db
+        self.window = window
+        self._recent = {}   # session_id -> [Candidate], newest last
+
+    def find(self, session_id: int, new: Candidate) -> tuple[Candidate, str] | None:
+        """
+        Returns:
+            (existing candidate, kind) with kind "exact", "near" or "overlap", or None
+        """
+        recent = self._load(session_id)
+        for candidate in reversed(recent):
+            if candidate.content_hash == new.content_hash:
+                return candidate, "exact"
+
+        row = self.db.query(Capture.id, Capture.selected_text, Capture.page_url, Capture.simhash).filter(
+            Capture.session_id == session_id,
+            Capture.content_hash == new.content_hash
+        ).first()
+        if row is not None:
+            return Candidate(row.selected_text, row.page_url, new.content_hash, row.simhash, row.id), "exact"
+
+        for candidate in reversed(recent):
+            if hamming(candidate.simhash, new.simhash) <= DEDUP_SIMHASH_DISTANCE:
+                return candidate, "near"
+            if new.page_url and candidate.page_url == new.page_url and containment(new.shingles, candidate.shingles) >= DEDUP_CONTAINMENT:
+                return candidate, "overlap"
+        return None
+
+    def add(self, session_id: int, candidate: Candidate):
+        """Make a new capture visible to later lookups in the same session."""
+        self._load(session_id).append(candidate)
+
+    def _load(self, session_id: int) -> list[Candidate]:
+        if session_id not in self._recent:
+            rows = self.db.query(
+                Capture.id, Capture.selected_text, Capture.page_url, Capture.content_hash, Capture.simhash
+            ).filter(Capture.session_id == session_id).order_by(Capture.id.desc()).limit(self.window).all()
+            recent = []
+            for row in reversed(rows):
+                if row.content_hash is None:
+                    # Stored before deduplication existed
+                    recent.append(Candidate.from_text(row.selected_text, row.page_url, row.id))
+                else:
+                    recent.append(Candidate(row.selected_text, row.page_url, row.content_hash, row.simhash, row.id))
+            self._recent[session_id] = recent
+        return self._recent[session_id]
+
+
+def merge_duplicate(db: Session, existing: Candidate, new: Candidate, kind: str) -> str | None:
+    """
+    Count a duplicate capture as another hit of the existing one.
+
+    For an overlapping selection the longer text is kept, so re-selecting a
+    paragraph after one of its sentences keeps the whole paragraph.
+
+    Returns:
+        The previous text if a stored capture's text was replaced (the caller
+        updates what was derived from it), otherwise None
+    """
+    replace = kind == "overlap" and len(normalize_text(new.text)) > len(normalize_text(existing.text))
+    old_text = existing.text
+    if replace:
+        existing.text = new.text
+        existing.content_hash = new.content_hash
+        existing.simhash = new.simhash
+        existing._shingles = new._shingles
+
+    if existing.capture_id is None:
+        existing.extra_hits += 1
+        return None
+
+    values = {Capture.hit_count: func.coalesce(Capture.hit_count, 1) + 1}
+    if replace:
+        values.update({
+            Capture.selected_text: new.text,
+            Capture.content_hash: new.content_hash,
+            Capture.simhash: new.simhash
+        })
+    db.query(Capture).filter(Capture.id == existing.capture_id).update(values, synchronize_session=False)
+    return old_text if replace else None
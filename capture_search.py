@@ -0,0 +1,186 @@
+"""
+Focus Catcher - Capture Search
+捕捉全文检索：SQLite FTS5 外部内容表（trigram 分词，支持中日韩文本）由触发器与 captures 表同步，查询按 BM25 排序并返回摘要片段
+"""
+
+import re
+
+# 外部内容表只保存倒排索引，正文仍从 captures 表读取
+SEARCH_INDEX_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS captures_fts USING fts5("
+    "selected_text, page_title, content='captures', content_rowid='id', tokenize='trigram')",
+    # 只在正文或标题变化时更新索引（主题归类只改 session_id）
+    "CREATE TRIGGER IF NOT EXISTS captures_fts_insert AFTER INSERT ON captures BEGIN "
+    "INSERT INTO captures_fts (rowid, selected_text, page_title) VALUES (new.id, new.selected_text, new.page_title); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS captures_fts_delete AFTER DELETE ON captures BEGIN "
+    "INSERT INTO captures_fts (captures_fts, rowid, selected_text, page_title) "
+    "VALUES ('delete', old.id, old.selected_text, old.page_title); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS captures_fts_update AFTER UPDATE OF selected_text, page_title ON captures BEGIN "
+    "INSERT INTO captures_fts (captures_fts, rowid, selected_text, page_title) "
+    "VALUES ('delete', old.id, old.selected_text, old.page_title); "
+    "INSERT INTO captures_fts (rowid, selected_text, page_title) VALUES (new.id, new.selected_text, new.page_title); "
+    "END",
+]
+
+# 批量导入时在事务内暂时去掉的逐行插入触发器
+SEARCH_INSERT_TRIGGER = SEARCH_INDEX_DDL[1]
+
+# trigram 分词只能索引至少 3 个字符的词，更短的词用 LIKE 过滤
+MIN_INDEXED_TERM_CHARS = 3
+
+# 摘要片段的高亮标记和长度（trigram 下一个 token 约等于一个字符）
+SNIPPET_OPEN = "【"
+SNIPPET_CLOSE = "】"
+SNIPPET_TOKENS = 64
+
+# 每页最多返回的结果数
+SEARCH_MAX_LIMIT = 100
+
+
+def create_search_index(conn) -> bool:
+    """
+    Create the FTS table and its triggers if missing.
+
+    Args:
+        conn: SQLAlchemy connection inside a transaction
+
+    Returns:
+        True if the index was newly created (and has been filled from captures)
+    """
+    exists = conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'captures_fts'"
+    ).first() is not None
+    for statement in SEARCH_INDEX_DDL:
+        conn.exec_driver_sql(statement)
+    if not exists:
+        conn.exec_driver_sql("INSERT INTO captures_fts (captures_fts) VALUES ('rebuild')")
+    return not exists
+
+
+def pause_search_index(conn) -> int:
+    """
+    Open a bulk load's write transaction and drop the per-row insert trigger.
+
+    Must be the first statement of the transaction: it starts it with BEGIN
+    IMMEDIATE, because pysqlite opens no transaction for DDL and an
+    autocommitted DROP would outlive a failed load. Holding the write lock
+    from the start also means no other writer ever sees the trigger
+    missing. Pair it with resume_search_index before the commit, also when
+    the load fails.
+
+    Returns:
+        The highest capture ID before the load
+    """
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+    conn.exec_driver_sql("DROP TRIGGER IF EXISTS captures_fts_insert")
+    return conn.exec_driver_sql("SELECT COALESCE(MAX(id), 0) FROM captures").scalar()
+
+
+def resume_search_index(conn, after_id: int):
+    """Index the captures inserted since pause_search_index in one statement and restore the trigger."""
+    conn.exec_driver_sql(
+        "INSERT INTO captures_fts (rowid, selected_text, page_title) "
+        "SELECT id, selected_text, page_title FROM captures WHERE id > ?",
+        (after_id,)
+    )
+    conn.exec_driver_sql(SEARCH_INSERT_TRIGGER)
+
+
+def merge_search_index(conn, pages: int, force: bool = False) -> bool:
+    """
+    Do one bounded step (about `pages` pages) of FTS segment merging, which
+    also drops the delete markers left behind by deleted captures.
+
+    Args:
+        conn: sqlite3 (DB-API) connection
+        pages: Amount of work per step
+        force: Merge even if there are few segments (first step after a deletion)
+
+    Returns:
+        True if the step did any work (call again until it returns False)
+    """
+    before = conn.total_changes
+    conn.execute("INSERT INTO captures_fts (captures_fts, rank) VALUES ('merge', ?)", (-pages if force else pages,))
+    conn.commit()
+    return conn.total_changes - before >= 2
+
+
+def split_terms(query: str) -> tuple[list[str], list[str]]:
+    """Split a query on whitespace into (indexed terms, terms too short for the index)."""
+    terms = [term for term in re.split(r"\s+", query.strip()) if term]
+    indexed = [term for term in terms if len(term) >= MIN_INDEXED_TERM_CHARS]
+    short = [term for term in terms if len(term) < MIN_INDEXED_TERM_CHARS]
+    return indexed, short
+
+
+def like_pattern(term: str) -> str:
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def build_search_query(query: str, session_id: int | None, limit: int, offset: int) -> tuple[str, dict, str]:
+    """
+    Build the SQL for a search. All terms must match (AND).
+
+    Terms of at least three characters go to the FTS index as quoted phrases
+    and are ranked with BM25; shorter terms (e.g. two-character Chinese words)
+    are applied as LIKE filters. A query with only short terms cannot use the
+    index and scans captures newest first instead.
+
+    Returns:
+        (sql, params, mode) with mode "fts" or "scan"; the SQL fetches
+        limit + 1 rows so the caller can tell whether another page exists
+    """
+    indexed, short = split_terms(query)
+    params = {"limit": limit + 1, "offset": offset}
+    filters = []
+    for idx, term in enumerate(short):
+        params[f"like_{idx}"] = like_pattern(term)
+        filters.append(
+            f"(c.selected_text LIKE :like_{idx} ESCAPE '\\' OR c.page_title LIKE :like_{idx} ESCAPE '\\')"
+        )
+    if session_id is not None:
+        params["session_id"] = session_id
+        filters.append("c.session_id = :session_id")
+
+    if indexed:
+        params["match"] = " ".join('"' + term.replace('"', '""') + '"' for term in indexed)
+        sql = (
+            "SELECT c.id, c.session_id, c.selected_text, c.page_url, c.page_title, c.timestamp, "
+            f"snippet(captures_fts, 0, '{SNIPPET_OPEN}', '{SNIPPET_CLOSE}', '…', {SNIPPET_TOKENS}) AS snippet, "
+            "bm25(captures_fts) AS score "
+            "FROM captures_fts JOIN captures c ON c.id = captures_fts.rowid "
+            "WHERE captures_fts MATCH :match"
+            + "".join(f" AND {condition}" for condition in filters)
+            + " ORDER BY rank LIMIT :limit OFFSET :offset"
+        )
+        return sql, params, "fts"
+
+    sql = (
+        "SELECT c.id, c.session_id, c.selected_text, c.page_url, c.page_title, c.timestamp, "
+        "NULL AS snippet, NULL AS score FROM captures c"
+        + (" WHERE " + " AND ".join(filters) if filters else "")
+        + " ORDER BY c.id DESC LIMIT :limit OFFSET :offset"
+    )
+    return sql, params, "scan"
+
+
+def make_snippet(text: str, terms: list[str], width: int = SNIPPET_TOKENS) -> str:
+    """Snippet around the first occurrence of any term (for results without an FTS match)."""
+    text = text or ""
+    lowered = text.lower()
+    positions = [(lowered.find(term.lower()), term) for term in terms]
+    positions = [(pos, term) for pos, term in positions if pos >= 0]
+    if not positions:
+        return text[:width] + ("…" if len(text) > width else "")
+
+    pos, term = min(positions)
+    start = max(0, pos - width // 2)
+    end = min(len(text), start + width)
+    return (
+        ("…" if start > 0 else "")
+        + text[start:pos] + SNIPPET_OPEN + text[pos:pos + len(term)] + SNIPPET_CLOSE + text[pos + len(term):end]
+        + ("…" if end < len(text) else "")
+    )
@@ -0,0 +1,103 @@
+"""
+Focus Catcher - Background Capture Placement
+后台主题归类：捕捉先入库，再由后台线程完成主题检测和会话归属
+"""
+
+import asyncio
+import queue
+import threading
+import traceback
+
+from database import SessionLocal
+
+
+class CapturePlacementWorker:
+    """
+    Single background thread that places pending captures into sessions.
+
+    Captures are processed strictly in submission order so that a topic shift
+    detected for one capture can move every later capture along with it.
+    """
+
+    def __init__(self, handler):
+        """
+        Args:
+            handler: Callable (db, capture_id) -> None doing the actual placement
+        """
+        self._handler = handler
+        self._queue = queue.Queue()
+        self._events = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Start the worker thread (no-op if it is already running)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="capture-placement", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Ask the worker to finish the queued captures and exit."""
+        if not self._thread:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, capture_id: int):
+        """Queue a capture for placement."""
+        with self._lock:
+            self._events.setdefault(capture_id, threading.Event())
+        self._queue.put(capture_id)
+
+    def wait(self, capture_id: int, timeout: float) -> bool:
+        """
+        Block until the capture has been placed or the timeout expires.
+
+        Returns:
+            True if the capture is no longer queued
+        """
+        with self._lock:
+            event = self._events.get(capture_id)
+        if event is None:
+            return True
+        return event.wait(timeout)
+
+    async def wait_async(self, capture_id: int, timeout: float, poll_interval: float = 0.2) -> bool:
+        """Like wait(), but polls without holding a threadpool thread."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            with self._lock:
+                event = self._events.get(capture_id)
+            if event is None or event.is_set():
+                return True
+            if loop.time() >= deadline:
+                return False
+            await asyncio.sleep(poll_interval)
+
+    def pending_count(self) -> int:
+        """Number of captures still waiting for placement."""
+        with self._lock:
+            return len(self._events)
+
+    def _run(self):
+        while True:
+            capture_id = self._queue.get()
+            if capture_id is None:
+                break
+
+            db = SessionLocal()
+            try:
+                self._handler(db, capture_id)
+            except Exception as e:
+                db.rollback()
+                print(f"[Placement] Error placing capture #{capture_id}: {e}")
+                traceback.print_exc()
+            finally:
+                db.close()
+                with self._lock:
+                    event = self._events.pop(capture_id, None)
+                if event:
+                    event.set()
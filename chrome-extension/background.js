@@ -42,10 +42,10 @@ chrome.contextMenus.onClicked.addListener((info, tab) => {
         page_title: tab.title
       };
       
-      // 直接发送到后端
-      sendToBackend(captureData)
-        .then(response => {
-          console.log('[Focus Catcher] Capture successful from context menu:', response);
+      // 先写入本地队列，立即提示成功；后台批量上传
+      enqueueCapture(captureData)
+        .then(() => {
+          console.log('[Focus Catcher] Capture queued from context menu');
           
           // 通知 content script 显示 Toast
           chrome.tabs.sendMessage(tab.id, {
@@ -55,9 +55,6 @@ chrome.contextMenus.onClicked.addListener((info, tab) => {
           }).catch(err => {
             console.log('[Focus Catcher] Could not send toast message:', err);
           });
-          
-          // 检查是否需要自动触发 AI 分析
-          checkAutoAnalyze(response);
         })
         .catch(error => {
           console.error('[Focus Catcher] Capture failed:', error);
@@ -96,16 +93,13 @@ chrome.commands.onCommand.addListener((command) => {
 // 监听来自 content script 的消息
 chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
   if (request.action === 'send-to-backend') {
-    // 发送到 FastAPI 后端
-    sendToBackend(request.data)
-      .then(response => {
-        sendResponse({ success: true, data: response });
-        
-        // 检查是否需要自动触发 AI 分析
-        checkAutoAnalyze(response);
+    // 写入本地队列后立即响应，上传在后台完成
+    enqueueCapture(request.data)
+      .then(queueDepth => {
+        sendResponse({ success: true, queued: true, queueDepth });
       })
       .catch(error => {
-        console.error('[Focus Catcher] Backend error:', error);
+        console.error('[Focus Catcher] Queue error:', error);
         sendResponse({ success: false, error: error.message });
       });
     
@@ -114,37 +108,225 @@ chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
   }
 });
 
-// 发送数据到 FastAPI 后端
-async function sendToBackend(data) {
-  const url = `${API_BASE_URL}/api/focus/capture`;
+// ============================================================
+// 本地捕捉队列：先持久化到 chrome.storage.local，再合并成批量请求上传
+// ============================================================
+
+const QUEUE_KEY = 'focusCatcherQueue';
+const QUEUE_STATS_KEY = 'focusCatcherQueueStats';
+const FLUSH_WINDOW_MS = 1500;        // 合并该时间窗口内的捕捉
+const FLUSH_BATCH_SIZE = 100;        // 每个批量请求最多包含的捕捉数
+const RETRY_BASE_MS = 2000;          // 重试的初始等待时间
+const RETRY_MAX_MS = 5 * 60 * 1000;  // 重试的最长等待时间
+const FLUSH_ALARM = 'focus-catcher-flush';
+
+let queueLock = Promise.resolve();
+let flushTimer = null;
+let flushing = false;
+let flushBatchSize = FLUSH_BATCH_SIZE;  // 被拒绝且无法定位无效捕捉时对半拆分，上传成功后恢复
+
+// 串行化队列的读-改-写，避免并发捕捉互相覆盖
+function updateQueue(mutate) {
+  const run = queueLock.then(async () => {
+    const stored = await chrome.storage.local.get(QUEUE_KEY);
+    const queue = mutate(stored[QUEUE_KEY] || []);
+    await chrome.storage.local.set({ [QUEUE_KEY]: queue });
+    return queue;
+  });
+  queueLock = run.catch(() => {});
+  return run;
+}
+
+async function updateQueueStats(changes) {
+  const stored = await chrome.storage.local.get(QUEUE_STATS_KEY);
+  await chrome.storage.local.set({ [QUEUE_STATS_KEY]: { ...(stored[QUEUE_STATS_KEY] || {}), ...changes } });
+}
+
+// 把捕捉写入本地队列，返回当前队列长度；后端不会接受的捕捉直接拒绝，不进入队列
+async function enqueueCapture(data) {
+  if (typeof data.selected_text !== 'string' || !data.selected_text.trim()) {
+    throw new Error('没有选中的文字');
+  }
+  if (typeof data.page_url !== 'string') {
+    throw new Error('缺少页面地址');
+  }
   
-  console.log('[Focus Catcher] Sending to backend:', url, data);
+  const item = {
+    selected_text: data.selected_text,
+    page_url: data.page_url,
+    page_title: typeof data.page_title === 'string' ? data.page_title : null,
+    timestamp: new Date().toISOString(),
+    idempotency_key: crypto.randomUUID()
+  };
   
-  try {
-    const response = await fetch(url, {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify(data)
-    });
+  const queue = await updateQueue(queue => [...queue, item]);
+  console.log(`[Focus Catcher] Capture queued (${queue.length} pending)`);
+  
+  scheduleFlush(FLUSH_WINDOW_MS);
+  return queue.length;
+}
 
+function scheduleFlush(delay) {
+  if (flushTimer) {
+    return; // 已有计划中的上传（或正在退避等待）
+  }
+  flushTimer = setTimeout(() => {
+    flushTimer = null;
+    flushQueue();
+  }, delay);
+}
+
+// 上传队列中的捕捉，失败时按指数退避重试
+async function flushQueue() {
+  if (flushing) {
+    return;
+  }
+  flushing = true;
+  
+  try {
+    const stored = await chrome.storage.local.get([QUEUE_KEY, QUEUE_STATS_KEY]);
+    const queue = stored[QUEUE_KEY] || [];
+    const stats = stored[QUEUE_STATS_KEY] || {};
+    if (queue.length === 0) {
+      return;
+    }
+    
+    const batch = queue.slice(0, flushBatchSize);
+    const startedAt = performance.now();
+    let response;
+    try {
+      response = await fetch(`${API_BASE_URL}/api/focus/captures:batch`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ captures: batch })
+      });
+    } catch (error) {
+      response = null;
+      console.error('[Focus Catcher] Flush failed:', error);
+    }
+    
+    // 网络错误、429、409 和 5xx 可以重试；其他 4xx 重试也不会成功
+    const retryable = !response || response.status >= 500 || response.status === 429 || response.status === 409;
+    
+    if (retryable) {
+      const failures = (stats.consecutiveFailures || 0) + 1;
+      const delay = Math.min(RETRY_MAX_MS, RETRY_BASE_MS * 2 ** (failures - 1)) * (0.5 + Math.random());
+      console.log(`[Focus Catcher] Backend unavailable, retrying in ${Math.round(delay / 1000)}s (${queue.length} pending)`);
+      
+      await updateQueueStats({
+        consecutiveFailures: failures,
+        lastError: response ? `HTTP ${response.status}` : '无法连接后端',
+        nextRetryAt: Date.now() + delay
+      });
+      clearTimeout(flushTimer);
+      flushTimer = null;
+      scheduleFlush(delay);
+      return;
+    }
+    
+    let dropped = batch;
     if (!response.ok) {
-      throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+      // 只丢弃后端指出的无效捕捉；无法定位时拆成两半分别上传，直到单条被拒绝
+      const invalid = await invalidBatchIndexes(response, batch.length);
+      if (invalid.size === 0 && batch.length > 1) {
+        flushBatchSize = Math.ceil(batch.length / 2);
+        console.warn(`[Focus Catcher] Batch rejected (HTTP ${response.status}), retrying in batches of ${flushBatchSize}`);
+        scheduleFlush(0);
+        return;
+      }
+      if (invalid.size > 0) {
+        dropped = batch.filter((_, index) => invalid.has(index));
+      }
+    }
+    
+    const sentKeys = new Set(dropped.map(item => item.idempotency_key));
+    const remaining = await updateQueue(queue => queue.filter(item => !sentKeys.has(item.idempotency_key)));
+    
+    if (!response.ok) {
+      console.error(`[Focus Catcher] Batch rejected (HTTP ${response.status}), dropped ${dropped.length} invalid capture(s)`);
+      await updateQueueStats({ consecutiveFailures: 0, lastError: `HTTP ${response.status}，已丢弃 ${dropped.length} 条`, nextRetryAt: null });
+    } else {
+      flushBatchSize = FLUSH_BATCH_SIZE;
+      const result = await response.json();
+      const latency = Math.round(performance.now() - startedAt);
+      console.log(`[Focus Catcher] Flushed ${batch.length} capture(s) in ${latency}ms (${result.created} new)`);
+      
+      await updateQueueStats({
+        consecutiveFailures: 0,
+        lastError: null,
+        nextRetryAt: null,
+        lastFlushAt: Date.now(),
+        lastFlushLatencyMs: latency,
+        lastFlushCount: batch.length,
+        // 从捕捉到成功上传的最长等待时间
+        lastFlushDelayMs: Date.now() - Date.parse(batch[0].timestamp)
+      });
+      
+      // 检查是否需要自动触发 AI 分析
+      for (const session of result.sessions) {
+        checkAutoAnalyze(session);
+      }
     }
-
-    const result = await response.json();
-    console.log('[Focus Catcher] Backend response:', result);
     
-    return result;
+    if (remaining.length > 0) {
+      scheduleFlush(0);
+    }
+  } finally {
+    flushing = false;
+  }
+}
+
+// 从 FastAPI 的 422 响应中找出无效捕捉在批次中的下标（detail[].loc 形如 ["body", "captures", 3, "selected_text"]）
+async function invalidBatchIndexes(response, batchSize) {
+  const invalid = new Set();
+  if (response.status !== 422) {
+    return invalid;
+  }
+  try {
+    const body = await response.json();
+    for (const error of Array.isArray(body.detail) ? body.detail : []) {
+      const [source, field, index] = error.loc || [];
+      if (source === 'body' && field === 'captures' && Number.isInteger(index) && index < batchSize) {
+        invalid.add(index);
+      }
+    }
   } catch (error) {
-    console.error('[Focus Catcher] Fetch error:', error);
-    throw error;
+    console.log('[Focus Catcher] Could not parse validation errors:', error);
+  }
+  return invalid;
+}
+
+// Service worker 可能随时被挂起，定时器会丢失；用 alarm 兜底，并在启动时上传遗留的捕捉
+chrome.alarms.create(FLUSH_ALARM, { periodInMinutes: 1 });
+chrome.alarms.onAlarm.addListener(async (alarm) => {
+  if (alarm.name !== FLUSH_ALARM || flushTimer) {
+    return;
+  }
+  const stored = await chrome.storage.local.get(QUEUE_STATS_KEY);
+  const nextRetryAt = (stored[QUEUE_STATS_KEY] || {}).nextRetryAt;
+  if (!nextRetryAt || Date.now() >= nextRetryAt) {
+    flushQueue();
   }
+});
+scheduleFlush(0);
+
+// 等待后台分析任务完成（长轮询，每次最多等待 30 秒）
+async function waitForAnalysisJob(job, maxAttempts = 20) {
+  for (let attempt = 0; attempt < maxAttempts; attempt++) {
+    if (job.status === 'done' || job.status === 'failed') {
+      return job;
+    }
+    const response = await fetch(`${API_BASE_URL}/api/focus/analyze/jobs/${job.job_id}?wait=30`);
+    job = await response.json();
+  }
+  return job;
 }
 
 // 检查是否需要自动触发 AI 分析
-async function checkAutoAnalyze(captureResponse) {
+// currentSession: 批量上传响应中的会话状态（session_id, capture_count, analysis_stale）
+async function checkAutoAnalyze(currentSession) {
   try {
     // 获取设置
     const result = await chrome.storage.sync.get('focusCatcherSettings');
@@ -155,24 +337,22 @@ async function checkAutoAnalyze(captureResponse) {
     }
     
     const threshold = settings.analyzeThreshold || 5;
-    const sessionId = captureResponse.session_id;
+    const sessionId = currentSession.session_id;
     
-    // 获取会话信息
-    const sessionsResponse = await fetch(`${API_BASE_URL}/api/focus/sessions`);
-    const sessionsData = await sessionsResponse.json();
-    
-    // 找到当前会话
-    const currentSession = sessionsData.sessions.find(s => s.id === sessionId);
-    
-    if (currentSession && currentSession.capture_count >= threshold && currentSession.status !== 'analyzed') {
+    if (currentSession.capture_count >= threshold && currentSession.analysis_stale) {
       console.log(`[Focus Catcher] Auto-triggering AI analysis for session ${sessionId} (${currentSession.capture_count} captures)`);
       
-      // 触发 AI 分析
-      const analysisResponse = await fetch(`${API_BASE_URL}/api/focus/analyze/${sessionId}`, {
+      // 加入后台分析队列（同一会话正在分析时会返回已有任务，不会重复分析）
+      const enqueueResponse = await fetch(`${API_BASE_URL}/api/focus/analyze/${sessionId}/jobs`, {
         method: 'POST'
       });
+      if (!enqueueResponse.ok) {
+        throw new Error(`HTTP ${enqueueResponse.status}: ${enqueueResponse.statusText}`);
+      }
+      
+      const job = await waitForAnalysisJob(await enqueueResponse.json());
       
-      if (analysisResponse.ok) {
+      if (job.status === 'done') {
         console.log('[Focus Catcher] Auto-analysis completed successfully');
         
         // 显示通知
@@ -5,15 +5,15 @@ const API_BASE_URL = 'http://127.0.0.1:8000';
 // 加载统计数据
 async function loadStats() {
   try {
-    const response = await fetch(`${API_BASE_URL}/api/focus/sessions`);
+    // 只请求今天开始的会话
+    const startOfToday = new Date();
+    startOfToday.setHours(0, 0, 0, 0);
+    const params = new URLSearchParams({ since: startOfToday.toISOString(), limit: 200 });
+    
+    const response = await fetch(`${API_BASE_URL}/api/focus/sessions?${params}`);
     const data = await response.json();
     
-    // 计算今日数据
-    const today = new Date().toDateString();
-    const todaySessions = data.sessions.filter(session => {
-      const sessionDate = new Date(session.start_time).toDateString();
-      return sessionDate === today;
-    });
+    const todaySessions = data.sessions;
     
     const todayCaptures = todaySessions.reduce((sum, session) => sum + session.capture_count, 0);
     
@@ -26,6 +26,34 @@ async function loadStats() {
   }
 }
 
+// 显示本地捕捉队列的状态（由 background.js 维护）
+async function loadQueueStatus() {
+  const stored = await chrome.storage.local.get(['focusCatcherQueue', 'focusCatcherQueueStats']);
+  const queue = stored.focusCatcherQueue || [];
+  const stats = stored.focusCatcherQueueStats || {};
+  
+  document.getElementById('queueDepth').textContent = queue.length;
+  document.getElementById('flushLatency').textContent =
+    stats.lastFlushLatencyMs != null ? `${stats.lastFlushLatencyMs}ms` : '-';
+  
+  let status = '';
+  if (stats.lastError && stats.nextRetryAt) {
+    const seconds = Math.max(0, Math.round((stats.nextRetryAt - Date.now()) / 1000));
+    status = `⚠️ ${stats.lastError}，${seconds} 秒后重试`;
+  } else if (stats.lastError) {
+    status = `⚠️ ${stats.lastError}`;
+  } else if (stats.lastFlushAt) {
+    status = `✅ 上次同步：${new Date(stats.lastFlushAt).toLocaleTimeString()}（${stats.lastFlushCount} 条）`;
+  }
+  document.getElementById('syncStatus').textContent = status;
+}
+
+chrome.storage.onChanged.addListener((changes, area) => {
+  if (area === 'local' && (changes.focusCatcherQueue || changes.focusCatcherQueueStats)) {
+    loadQueueStatus();
+  }
+});
+
 // 查看历史记录
 document.getElementById('viewHistory').addEventListener('click', () => {
   chrome.tabs.create({ url: `${API_BASE_URL}/test_capture.html` });
@@ -38,4 +66,5 @@ document.getElementById('openSettings').addEventListener('click', () => {
 
 // 页面加载时获取统计数据
 loadStats();
+loadQueueStatus();
 
@@ -0,0 +1,258 @@
+"""
+Focus Catcher - Export / Import
+会话和捕捉的流式导出与导入：NDJSON（可选 gzip），按批读取和写入，内存占用与数据量无关
+"""
+
+import json
+import os
+import time
+import zlib
+from datetime import datetime
+
+from sqlalchemy import DateTime, insert, select
+
+from capture_search import pause_search_index, resume_search_index
+from database import DATABASE_URL, AsyncSessionLocal, Capture, Session as DBSession, async_engine
+
+EXPORT_FORMAT = "focus-catcher-export"
+EXPORT_VERSION = 1
+
+# 导出时每次从数据库读取的行数
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "1000"))
+
+# 导入时每条 INSERT（executemany）写入的行数，以及每个事务写入的行数
+IMPORT_BATCH_ROWS = int(os.getenv("IMPORT_BATCH_ROWS", "2000"))
+IMPORT_TRANSACTION_ROWS = int(os.getenv("IMPORT_TRANSACTION_ROWS", "20000"))
+
+SESSION_TABLE = DBSession.__table__
+CAPTURE_TABLE = Capture.__table__
+
+# 会话的增量分析状态引用源数据库的捕捉 ID，导入后不再成立：不导入，下一次分析从头开始
+SESSION_ANALYSIS_STATE = {"analysis", "analyzed_capture_count", "analyzed_through_capture_id"}
+
+
+class ImportFormatError(ValueError):
+    """The uploaded export is malformed (raised with the offending line number)."""
+
+
+def _to_json(row) -> dict:
+    return {
+        name: value.isoformat() if isinstance(value, datetime) else value
+        for name, value in row._mapping.items()
+    }
+
+
+def _from_json(table, record: dict, skip: set[str], line_number: int) -> dict:
+    """
+    Keep the table's columns from a record, parsing DateTime values.
+
+    Raises:
+        ImportFormatError: A DateTime value is not an ISO 8601 string
+    """
+    values = {}
+    for column in table.columns:
+        if column.name in skip or column.name not in record:
+            continue
+        value = record[column.name]
+        if value is not None and isinstance(column.type, DateTime):
+            try:
+                value = datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise ImportFormatError(f"Line {line_number}: invalid {column.name} {value!r}")
+        values[column.name] = value
+    return values
+
+
+async def export_lines(compress: bool = False):
+    """
+    Yield the whole database as NDJSON: a header, every session, every
+    capture (ordered by id), and a footer with counts and throughput.
+
+    Rows are read EXPORT_BATCH_ROWS at a time from server-side cursors.
+    With compress=True the output is a gzip stream.
+    """
+    started = time.perf_counter()
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    counts = {"sessions": 0, "captures": 0}
+
+    def encode(lines: list[dict]) -> bytes:
+        data = "".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines).encode("utf-8")
+        return compressor.compress(data) if compressor else data
+
+    yield encode([{
+        "type": "header",
+        "format": EXPORT_FORMAT,
+        "version": EXPORT_VERSION,
+        "exported_at": datetime.utcnow().isoformat()
+    }])
+
+    async with AsyncSessionLocal() as db:
+        for kind, table in (("session", SESSION_TABLE), ("capture", CAPTURE_TABLE)):
+            query = select(table).order_by(table.c.id).execution_options(yield_per=EXPORT_BATCH_ROWS)
+            result = await db.stream(query)
+            async for rows in result.partitions():
+                counts[f"{kind}s"] += len(rows)
+                chunk = encode([{"type": kind, **_to_json(row)} for row in rows])
+                if chunk:
+                    yield chunk
+
+    elapsed = time.perf_counter() - started
+    rows = counts["sessions"] + counts["captures"]
+    print(f"[Export] {counts['sessions']} session(s), {counts['captures']} capture(s) in {elapsed:.2f}s")
+    tail = encode([{
+        "type": "footer",
+        **counts,
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_s": round(rows / elapsed, 1) if elapsed else None
+    }])
+    if compressor:
+        tail += compressor.flush()
+    yield tail
+
+
+async def iter_lines(chunks):
+    """Split a stream of byte chunks (plain or gzip) into lines."""
+    decompressor = None
+    buffer = b""
+    first = True
+    async for chunk in chunks:
+        if first and chunk:
+            # gzip magic number; otherwise plain NDJSON
+            if chunk[:2] == b"\x1f\x8b":
+                decompressor = zlib.decompressobj(31)
+            first = False
+        if decompressor:
+            chunk = decompressor.decompress(chunk)
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if decompressor:
+        buffer += decompressor.flush()
+    for line in buffer.split(b"\n"):
+        yield line
+
+
+async def import_lines(chunks) -> dict:
+    """
+    Import an export produced by export_lines.
+
+    Sessions get new IDs (captures are re-pointed to them), so the data can
+    be loaded into a database that already has sessions; imported sessions
+    are never left active, and their stored analysis (which refers to the
+    source database's capture IDs) is dropped so the next one starts over. Captures whose idempotency key already exists
+    are skipped. Up to IMPORT_TRANSACTION_ROWS parsed rows are buffered and
+    then written in one transaction (IMPORT_BATCH_ROWS per statement), so
+    the write lock is never held while waiting for the upload; batches
+    committed before an error stay. On SQLite each transaction's captures
+    are added to the search index in one statement at commit rather than
+    by the per-row trigger.
+
+    Args:
+        chunks: Async iterable of the uploaded bytes
+
+    Returns:
+        Counts, the IDs of the created sessions ("session_ids") and the throughput
+    """
+    started = time.perf_counter()
+    session_ids = {}   # exported session ID -> new session ID
+    stats = {"sessions": 0, "captures": 0, "skipped": 0}
+    pending = []       # ("session", exported ID, values) / ("capture", exported session ID, values)
+    header_seen = False
+    line_number = 0
+
+    def insert_rows(conn, kind: str, rows: list):
+        if kind == "session":
+            result = conn.execute(
+                insert(DBSession).returning(DBSession.id, sort_by_parameter_order=True),
+                [values for _, values in rows]
+            )
+            session_ids.update(zip([old_id for old_id, _ in rows], result.scalars().all()))
+            stats["sessions"] += len(rows)
+            return
+        captures = []
+        for old_session_id, values in rows:
+            session_id = session_ids.get(old_session_id)
+            if session_id is None:
+                stats["skipped"] += 1
+                continue
+            captures.append({**values, "session_id": session_id})
+        if captures:
+            result = conn.execute(insert(Capture).prefix_with("OR IGNORE"), captures)
+            stats["captures"] += result.rowcount
+            stats["skipped"] += len(captures) - result.rowcount
+
+    def write_transaction(conn):
+        # Index the transaction's captures in bulk instead of row by row
+        index_from = pause_search_index(conn) if DATABASE_URL.startswith("sqlite") else None
+        try:
+            batch, batch_kind = [], None
+            for kind, old_id, values in pending:
+                if batch and (kind != batch_kind or len(batch) >= IMPORT_BATCH_ROWS):
+                    insert_rows(conn, batch_kind, batch)
+                    batch = []
+                batch_kind = kind
+                batch.append((old_id, values))
+            if batch:
+                insert_rows(conn, batch_kind, batch)
+        finally:
+            # Also on failure, so the trigger is back even if the rollback does not happen
+            if index_from is not None:
+                resume_search_index(conn, index_from)
+        conn.commit()
+
+    async with async_engine.connect() as conn:
+        async def flush():
+            if pending:
+                await conn.run_sync(write_transaction)
+                pending.clear()
+
+        async for raw in iter_lines(chunks):
+            line_number += 1
+            if not raw.strip():
+                continue
+            try:
+                record = json.loads(raw)
+                kind = record.get("type")
+            except (ValueError, AttributeError):
+                raise ImportFormatError(f"Line {line_number}: not a JSON object")
+
+            if not header_seen:
+                if kind != "header" or record.get("format") != EXPORT_FORMAT:
+                    raise ImportFormatError(f"Line {line_number}: missing {EXPORT_FORMAT} header")
+                if record.get("version", 0) > EXPORT_VERSION:
+                    raise ImportFormatError(f"Unsupported export version {record.get('version')}")
+                header_seen = True
+                continue
+
+            if kind == "session":
+                values = _from_json(SESSION_TABLE, record, {"id"} | SESSION_ANALYSIS_STATE, line_number)
+                if values.get("status") == "active":
+                    # Only this instance's own session stays active
+                    values["status"] = "completed"
+                pending.append(("session", record.get("id"), values))
+            elif kind == "capture":
+                values = _from_json(CAPTURE_TABLE, record, {"id", "session_id"}, line_number)
+                pending.append(("capture", record.get("session_id"), values))
+            elif kind == "footer":
+                continue
+            else:
+                raise ImportFormatError(f"Line {line_number}: unknown record type {kind!r}")
+
+            if len(pending) >= IMPORT_TRANSACTION_ROWS:
+                await flush()
+
+        if not header_seen:
+            raise ImportFormatError("Empty upload")
+        await flush()
+
+    elapsed = time.perf_counter() - started
+    rows = stats["sessions"] + stats["captures"]
+    print(f"[Import] {stats['sessions']} session(s), {stats['captures']} capture(s), "
+          f"{stats['skipped']} skipped in {elapsed:.2f}s")
+    return {
+        **stats,
+        "session_ids": sorted(session_ids.values()),
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_s": round(rows / elapsed, 1) if elapsed else None
+    }
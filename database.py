@@ -3,15 +3,83 @@ Focus Catcher - Database Models
 数据库模型定义
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import create_engine, make_url, event, inspect, text, Column, Index, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
+import os
+
+from capture_search import create_search_index
+
+# 数据库配置（可通过环境变量指定其他数据库，例如基准测试使用临时文件）
+DATABASE_URL = os.getenv("FOCUS_DATABASE_URL", "sqlite:///./focus_catcher.db")
+
+# SQLite 性能参数
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))        # 写锁等待时间
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))           # 每个连接的页缓存
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))    # 内存映射读取的大小
+
+# 已有数据库是否在启动时切换到增量 vacuum（需要一次完整 VACUUM，耗时与数据库大小成正比；新数据库总是启用）
+SQLITE_ENABLE_INCREMENTAL_VACUUM = os.getenv("SQLITE_ENABLE_INCREMENTAL_VACUUM", "").lower() in ("1", "true", "yes")
+
+# 连接池配置（同步引擎和异步引擎各自一个连接池）
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))              # 常驻连接数
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))       # 高峰时额外允许的连接数
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))     # 等待空闲连接的秒数，超时报错
+
+
+def async_database_url(url: str) -> str:
+    """Async driver URL for the same database (sqlite:// -> sqlite+aiosqlite://)."""
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+
+def database_dir(url: str) -> str:
+    """Directory of a SQLite database file (the working directory for other databases)."""
+    path = make_url(url).database
+    if not url.startswith("sqlite") or not path or path == ":memory:":
+        return os.getcwd()
+    return os.path.dirname(os.path.abspath(path))
+
+
+# 数据目录：数据库文件所在目录，本地缓存文件（如 LLM 响应缓存）也放在这里
+DATA_DIR = database_dir(DATABASE_URL)
+
+POOL_OPTIONS = {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW, "pool_timeout": DB_POOL_TIMEOUT}
+
+# 同步引擎：后台工作线程（主题归类、分析任务）和批量写入使用
+engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False}, **POOL_OPTIONS)
+
+# 异步引擎：FastAPI 端点使用，数据库等待期间事件循环可以继续处理其他请求（包括 LLM 调用）
+async_engine = create_async_engine(async_database_url(DATABASE_URL), **POOL_OPTIONS)
+
+
+@event.listens_for(engine, "connect")
+@event.listens_for(async_engine.sync_engine, "connect")
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    WAL lets readers run while a capture is being written, and with WAL
+    synchronous=NORMAL is still safe against corruption (a power loss can
+    only drop the last transactions).
+    """
+    if not DATABASE_URL.startswith("sqlite"):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
 
-# 数据库配置
-DATABASE_URL = "sqlite:///./focus_catcher.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# 提交后不让对象过期，避免在异步代码中触发隐式的延迟加载
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 
@@ -23,6 +91,7 @@ class Session(Base):
     start_time = Column(DateTime, default=datetime.utcnow)
     end_time = Column(DateTime, nullable=True)
     status = Column(String, default="active")  # active, completed, abandoned
+    capture_count = Column(Integer, default=0)  # 冗余计数，随捕捉写入在同一事务中更新
     
     # AI 生成的总结（批量分析后填充）
     core_goal = Column(Text, nullable=True)
@@ -30,8 +99,26 @@ class Session(Base):
     branches = Column(Text, nullable=True)
     action_guide = Column(Text, nullable=True)
     
+    # 最近一次分析的时间和当时的捕捉数（用于判断分析是否过期）
+    analyzed_at = Column(DateTime, nullable=True)
+    analyzed_capture_count = Column(Integer, default=0)
+    
+    # 完整的结构化分析结果（JSON）和已分析到的最大捕捉 ID，用于增量分析
+    analysis = Column(Text, nullable=True)
+    analyzed_through_capture_id = Column(Integer, default=0)
+    
     # 关联的捕捉记录
     captures = relationship("Capture", back_populates="session")
+    
+    # 主题摘要（增量维护）
+    topic = relationship("SessionTopic", uselist=False, back_populates="session")
+    
+    __table_args__ = (
+        # 查找当前活跃会话：WHERE status = ? ORDER BY start_time DESC
+        Index("ix_sessions_status_start_time", "status", "start_time"),
+        # 会话列表的键集分页：ORDER BY start_time DESC, id DESC
+        Index("ix_sessions_start_time_id", "start_time", "id"),
+    )
 
 
 # 捕捉记录表
@@ -52,13 +139,171 @@ class Capture(Base):
     content_type = Column(String, nullable=True)
     suggested_action = Column(Text, nullable=True)
     
+    # 主题归类状态：placed（已确定会话）| pending（等待后台主题检测）
+    placement_status = Column(String, default="placed")
+    
+    # 客户端生成的幂等键（批量上传重试时避免重复入库）
+    idempotency_key = Column(String, nullable=True, unique=True, index=True)
+    
+    # 去重签名：规范化文本的 SHA-256 和 64 位 SimHash；重复捕捉合并后累加命中次数
+    content_hash = Column(String, nullable=True)
+    simhash = Column(Integer, nullable=True)
+    hit_count = Column(Integer, default=1)
+    
     # 关联的会话
     session = relationship("Session", back_populates="captures")
+    
+    __table_args__ = (
+        # 按会话读取捕捉：WHERE session_id = ? ORDER BY timestamp
+        Index("ix_captures_session_timestamp", "session_id", "timestamp"),
+        # 会话内的完全重复查找：WHERE session_id = ? AND content_hash = ?
+        Index("ix_captures_session_content_hash", "session_id", "content_hash"),
+    )
+
+
+# 合并到已有捕捉的批量上传条目没有自己的捕捉行，其幂等键记录在这里（重试时识别为重复）
+class CaptureKey(Base):
+    __tablename__ = "capture_keys"
+    
+    idempotency_key = Column(String, primary_key=True)
+    capture_id = Column(Integer, ForeignKey("captures.id"), index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+# 为已有数据库补齐新增的列（create_all 不会修改已存在的表）
+def migrate_columns():
+    added = set()
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}"
+                default = column.default.arg if column.default is not None and column.default.is_scalar else None
+                if isinstance(default, str):
+                    ddl += f" DEFAULT '{default}'"
+                elif isinstance(default, (int, float)):
+                    ddl += f" DEFAULT {default}"
+                conn.execute(text(ddl))
+                added.add(f"{table.name}.{column.name}")
+                print(f"[Database] Added column {table.name}.{column.name}")
+    return added
+
+
+# 会话主题摘要表（每次捕捉时增量更新，避免重复扫描捕捉记录）
+class SessionTopic(Base):
+    __tablename__ = "session_topics"
+    
+    session_id = Column(Integer, ForeignKey("sessions.id"), primary_key=True)
+    
+    vector_count = Column(Integer, default=0)   # 已并入主题向量的捕捉数
+    
+    # JSON 编码的稀疏数据
+    term_counts = Column(Text, default="{}")    # 词频 {term: count}
+    vector_sum = Column(Text, default="{}")     # 单位向量之和，质心 = vector_sum / vector_count
+    keywords = Column(Text, default="[]")       # 高频关键词
+    
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    # 关联的会话
+    session = relationship("Session", back_populates="topic")
+
+
+# AI 分析任务表（后台队列，持久化任务状态和结果）
+class AnalysisJob(Base):
+    __tablename__ = "analysis_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(Integer, ForeignKey("sessions.id"), index=True)
+    status = Column(String, default="queued")  # queued, running, done, failed
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    
+    result = Column(Text, nullable=True)        # 分析结果 JSON
+    error = Column(Text, nullable=True)
+    error_status = Column(Integer, nullable=True)  # 失败时对应的 HTTP 状态码
+
+
+# 分块分析的片段摘要缓存（按片段内容哈希，内容不变时复用）
+class ChunkSummary(Base):
+    __tablename__ = "chunk_summaries"
+    
+    content_hash = Column(String, primary_key=True)
+    capture_count = Column(Integer, default=0)
+    summary = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)  # 超出缓存上限时按它淘汰
+
+
+# 增量 vacuum：删除会话后可以分批把空闲页归还给文件系统
+def enable_incremental_vacuum(switch_existing: bool = SQLITE_ENABLE_INCREMENTAL_VACUUM) -> bool:
+    """
+    Set auto_vacuum=INCREMENTAL on a new database.
+
+    The mode only takes effect after a full VACUUM, which on an existing
+    database rewrites the whole file, so that is only done when
+    switch_existing is set (SQLITE_ENABLE_INCREMENTAL_VACUUM).
+
+    Returns:
+        True if incremental vacuum is on
+    """
+    with engine.connect() as conn:
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:
+            return True
+        existing = conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE type = 'table'").first() is not None
+        if existing and not switch_existing:
+            print("[Database] Incremental auto-vacuum is off; set SQLITE_ENABLE_INCREMENTAL_VACUUM=1 to switch "
+                  "(runs a full VACUUM once)")
+            return False
+        # 新数据库也需要 VACUUM（连接时设置 WAL 已写入文件头），空库很快
+        conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+        if existing:
+            print("[Database] Switched to incremental auto-vacuum")
+        return True
 
 
 # 创建所有表
 def init_db():
+    if engine.dialect.name == "sqlite":
+        enable_incremental_vacuum()
     Base.metadata.create_all(bind=engine)
+    added = migrate_columns()
+    
+    # 新增的列和索引同样需要为已有的表补建
+    created_indexes = False
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspect(engine).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=engine)
+                created_indexes = True
+                print(f"[Database] Created index {index.name}")
+    
+    # 新建索引后更新查询规划器的统计信息
+    if created_indexes and engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+    
+    # 捕捉全文检索索引（FTS5，依赖 SQLite）
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            if create_search_index(conn):
+                print("[Database] Built full-text search index")
+    
+    # 新增的冗余计数列需要用一次聚合查询回填
+    if "sessions.capture_count" in added:
+        with engine.begin() as conn:
+            conn.execute(text(
+                "UPDATE sessions SET capture_count = "
+                "(SELECT COUNT(*) FROM captures WHERE captures.session_id = sessions.id)"
+            ))
 
 
 # 获取数据库会话
@@ -69,3 +314,8 @@ def get_db():
     finally:
         db.close()
 
+
+# 获取异步数据库会话
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
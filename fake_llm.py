@@ -0,0 +1,91 @@
+"""
+Focus Catcher - Fake LLM Backend
+离线的确定性 LLM 后端：模拟 Gemini 模型和 OpenAI 客户端（可配置延迟），用于基准测试和无 API Key 的本地运行
+"""
+
+import hashlib
+import json
+import os
+import time
+from types import SimpleNamespace
+
+from analysis_chunks import estimate_tokens
+
+# 每次模拟调用的延迟（秒）
+LLM_FAKE_LATENCY = float(os.getenv("LLM_FAKE_LATENCY", "0.05"))
+
+FAKE_GEMINI_MODEL_NAME = "fake-gemini"
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:8]
+
+
+class FakeGeminiModel:
+    """Stand-in for genai.GenerativeModel answering each prompt type deterministically."""
+
+    model_name = FAKE_GEMINI_MODEL_NAME
+
+    def __init__(self, latency: float = LLM_FAKE_LATENCY):
+        self.latency = latency
+
+    def generate_content(self, prompt: str, generation_config: dict = None):
+        time.sleep(self.latency)
+        digest = _digest(prompt)
+
+        if '"related"' in prompt:
+            # Topic detection: related unless the hash says otherwise (about 1 in 4)
+            related = int(digest, 16) % 4 != 0
+            text = json.dumps({
+                "related": related,
+                "new_topic": "" if related else f"主题 {digest}",
+                "confidence": 0.9,
+                "reason": "fake backend"
+            }, ensure_ascii=False)
+        elif "core_goal" in prompt:
+            text = json.dumps({
+                "core_goal": f"学习主题 {digest}",
+                "main_thread": [f"关键信息点 {digest}-1", f"关键信息点 {digest}-2"],
+                "branches": [f"延伸问题 {digest}"],
+                "understood": [f"已覆盖 {digest}"],
+                "unclear": [f"待查阅 {digest}"],
+                "action_guide": ["回顾建议 1", "回顾建议 2", "回顾建议 3"],
+                "learning_pattern": "概念学习型"
+            }, ensure_ascii=False)
+        else:
+            text = f"1. 片段要点 {digest}\n2. 片段疑问 {digest}"
+
+        usage = SimpleNamespace(prompt_token_count=estimate_tokens(prompt), candidates_token_count=estimate_tokens(text))
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+
+class _FakeCompletions:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def create(self, model: str = None, messages: list = None, stream: bool = False, **kwargs):
+        time.sleep(self.latency)
+        last = (messages[-1].get("content") or "") if messages else ""
+        content = f"这是离线模拟的回答（{_digest(json.dumps(messages, ensure_ascii=False, default=str))}）：{last[:50]}"
+
+        if stream:
+            return self._stream(content)
+
+        message = SimpleNamespace(content=content, tool_calls=None)
+        usage = SimpleNamespace(
+            prompt_tokens=sum(estimate_tokens(str(m.get("content") or "")) for m in messages or []),
+            completion_tokens=estimate_tokens(content)
+        )
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+    def _stream(self, content: str):
+        for start in range(0, len(content), 8):
+            delta = SimpleNamespace(content=content[start:start + 8], tool_calls=None)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+class FakeOpenAIClient:
+    """Stand-in for the OpenAI client; answers without calling tools."""
+
+    def __init__(self, latency: float = LLM_FAKE_LATENCY):
+        self.chat = SimpleNamespace(completions=_FakeCompletions(latency))
@@ -32,42 +32,77 @@ CAPTURE_ANALYSIS_PROMPT = """你是一个学习意图识别助手。用户在学
 - suggested_action 要具体可执行
 """
 
-# 会话深度分析 Prompt（批量分析）
-SESSION_ANALYSIS_PROMPT = """你是一个学习回顾助手。用户在学习过程中捕捉了一些内容片段，现在需要你帮助他们无损地回顾这些内容。
+# 会话增量分析 Prompt（把新捕捉合并进上一次的分析结果）
+SESSION_MERGE_PROMPT = """你是一个学习路径分析专家。下面是对某个学习会话前 {previous_count} 条捕捉的分析结果，之后用户又捕捉了 {new_count} 条新内容。
 
-**会话信息：**
-- 会话 ID: {session_id}
-- 开始时间: {start_time}
-- 捕捉数量: {capture_count}
+**上一次的分析结果：**
+{previous_analysis}
 
-**捕捉列表：**
-{captures_list}
+高频关键词：{keywords}
 
-**你的任务：**
-作为一个记忆锚点，帮助用户快速回顾这次学习会话。请分析：
+**新增的学习捕捉记录：**
+{new_captures}
 
-1. **核心主题** - 这些捕捉围绕什么主题？用一句话概括
-2. **关键信息点** - 提取出最重要的 3-5 个信息点（保持原文关键词）
-3. **内容脉络** - 这些捕捉之间的逻辑关系是什么？
-4. **重点内容** - 哪些是用户可能需要重点回顾的？
-5. **遗留问题** - 有哪些问题或概念可能还需要进一步查阅？
+**你的任务：**
+把新增捕捉合并进上一次的分析，输出覆盖全部 {total_count} 条捕捉的完整分析：
+- 保留上一次分析中仍然成立的内容，不要因为新内容而丢失旧的信息点
+- 新内容改变了核心主题时，更新 core_goal
+- 各数组字段的条目数量要求与原分析相同
 
-**输出 JSON 格式：**
+**输出 JSON 格式（字段与上一次的分析结果完全相同）：**
 {{
-  "core_goal": "核心主题（一句话，保持简洁）",
-  "main_thread": ["关键信息点 1", "关键信息点 2", "关键信息点 3"],
-  "branches": ["相关延伸点 1", "相关延伸点 2"],
-  "understood": ["已覆盖的内容 1", "已覆盖的内容 2"],
-  "unclear": ["可能需要进一步查阅的问题 1", "可能需要进一步查阅的问题 2"],
-  "action_guide": ["回顾建议 1", "回顾建议 2", "回顾建议 3"],
-  "learning_pattern": "内容特点观察（如：概念密集型、实操步骤型、问题探索型等）"
+  "core_goal": "核心学习目标（字符串）",
+  "main_thread": ["主线问题（2-3个）"],
+  "branches": ["分支问题（1-3个）"],
+  "understood": ["已经理解的部分（1-3个）"],
+  "unclear": ["还需要弄清楚的问题（1-3个）"],
+  "action_guide": ["下一步学习建议（3-5个）"],
+  "learning_pattern": "学习模式观察（字符串）"
 }}
 
-**重要原则：**
-- 保持客观，提取原文关键信息，不要过度解读
-- 帮助用户快速回忆起"我当时在看什么"
-- 作为记忆锚点，让用户能无损回顾
-- 只返回 JSON，不要其他内容
+只返回 JSON，不要其他内容。
+"""
+
+# 分块摘要 Prompt（map：大会话先按片段分别摘要）
+CHUNK_SUMMARY_PROMPT = """你是一个学习回顾助手。下面是用户在一次学习会话中连续捕捉的 {capture_count} 条内容（整个会话的一个片段）。
+
+**捕捉内容：**
+{captures_list}
+
+**你的任务：**
+用 3-6 条要点概括这个片段：涉及的主题、关键信息点（保留原文关键词）、出现的疑问。
+每条要点一行，以数字序号开头，只输出要点，不要其他内容。
+"""
+
+# 片段摘要合并 Prompt（片段摘要过多、放不进汇总 Prompt 时，先把相邻的摘要逐层合并）
+CHUNK_MERGE_PROMPT = """你是一个学习回顾助手。下面是一次学习会话中相邻 {summary_count} 个片段的要点摘要（按时间顺序）。
+
+**片段摘要：**
+{chunk_summaries}
+
+**你的任务：**
+把它们合并为一份 4-8 条要点的摘要：保留主要主题、关键信息点（保留原文关键词）和仍未解决的疑问，去掉重复内容。
+每条要点一行，以数字序号开头，只输出要点，不要其他内容。
+"""
+
+# 分块汇总 Prompt（reduce：把所有片段摘要合并为完整的会话分析）
+SESSION_REDUCE_PROMPT = """你是一个学习路径分析专家。一个学习会话共有 {capture_count} 条捕捉，已按时间顺序分成 {chunk_count} 个片段，下面是每个片段的要点摘要。
+
+高频关键词：{keywords}
+
+**片段摘要：**
+{chunk_summaries}
+
+请综合所有片段，返回 JSON 格式的分析结果，包含以下字段：
+- core_goal: 核心学习目标（字符串，简洁描述用户在学什么）
+- main_thread: 主线问题（字符串数组，2-3个核心关注点）
+- branches: 分支问题（字符串数组，1-3个延伸或相关问题）
+- understood: 已经理解的部分（字符串数组，1-3个要点）
+- unclear: 还需要弄清楚的问题（字符串数组，1-3个问题）
+- action_guide: 下一步学习建议（字符串数组，3-5个具体可执行的步骤）
+- learning_pattern: 学习模式观察（字符串，例如：深度优先、广度优先、问题驱动等）
+
+只返回 JSON，不要其他内容。
 """
 
 # 生成学习指南 Prompt（用户友好的输出）
@@ -154,21 +189,3 @@ React Hooks 的基础用法和核心概念
 📊 内容特点
 概念学习型，覆盖了 React Hooks 的主要功能
 """
-
-
-def format_captures_for_analysis(captures):
-    """
-    将捕捉记录格式化为 Prompt 输入
-    """
-    captures_text = []
-    for idx, capture in enumerate(captures, 1):
-        captures_text.append(f"""
-【捕捉 {idx}】
-- ID: #{capture['id']}
-- 时间: {capture['timestamp']}
-- 内容: {capture['selected_text'][:200]}{'...' if len(capture['selected_text']) > 200 else ''}
-- 页面: {capture['page_title'] or 'N/A'}
-- URL: {capture['page_url']}
-""")
-    return "\n".join(captures_text)
-
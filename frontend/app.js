@@ -100,22 +100,8 @@ async function handleSubmit(e) {
     userInput.disabled = true;
     
     try {
-        // Call API
-        const response = await fetch(`${API_BASE_URL}/chat`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                user_message: message
-            })
-        });
-        
-        if (!response.ok) {
-            throw new Error(`API error: ${response.status} ${response.statusText}`);
-        }
-        
-        const data = await response.json();
+        // Call streaming API (progress and answer text render as they arrive)
+        const data = await streamChat(message);
         
         // Remove thinking animation
         removeThinkingAnimation();
@@ -154,6 +140,90 @@ async function handleSubmit(e) {
     }
 }
 
+// Streaming Chat
+async function streamChat(message) {
+    const response = await fetch(`${API_BASE_URL}/chat/stream`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+            user_message: message
+        })
+    });
+    
+    if (!response.ok) {
+        throw new Error(`API error: ${response.status} ${response.statusText}`);
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let streamedText = '';
+    let streamingMessage = null;
+    
+    // Remove the partially streamed answer (the final message replaces it)
+    const clearStreamingMessage = () => {
+        if (streamingMessage) {
+            streamingMessage.remove();
+            streamingMessage = null;
+        }
+        streamedText = '';
+    };
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        
+        buffer += decoder.decode(value, { stream: true });
+        
+        // Server-sent events are separated by a blank line
+        const chunks = buffer.split('\n\n');
+        buffer = chunks.pop();
+        
+        for (const chunk of chunks) {
+            if (!chunk.startsWith('data: ')) continue;
+            const event = JSON.parse(chunk.slice(6));
+            
+            switch (event.type) {
+                case 'turn_start':
+                    clearStreamingMessage();
+                    if (!document.getElementById('thinking-animation')) {
+                        showThinkingAnimation();
+                    }
+                    updateThinkingStatus(event.turn > 1 ? `Thinking (step ${event.turn})` : 'Thinking');
+                    break;
+                case 'tool_call':
+                    updateThinkingStatus(event.function === 'web_search'
+                        ? `🔍 Searching: ${event.arguments.query || ''}`
+                        : `📄 Reading: ${event.arguments.url || ''}`);
+                    break;
+                case 'tool_result':
+                    updateThinkingStatus(event.summary);
+                    break;
+                case 'delta':
+                    if (!streamingMessage) {
+                        removeThinkingAnimation();
+                        streamingMessage = addMessageToUI('assistant', '');
+                    }
+                    streamedText += event.content;
+                    streamingMessage.querySelector('.message-content').innerHTML = escapeHtml(streamedText);
+                    scrollToBottom();
+                    break;
+                case 'done':
+                    clearStreamingMessage();
+                    return { content: event.content, tool_calls: event.tool_calls };
+                case 'error':
+                    clearStreamingMessage();
+                    throw new Error(event.detail);
+            }
+        }
+    }
+    
+    clearStreamingMessage();
+    throw new Error('Stream ended unexpectedly');
+}
+
 // UI Functions
 function addMessageToUI(role, content, toolCalls = null) {
     const messageDiv = document.createElement('div');
@@ -186,6 +256,7 @@ function addMessageToUI(role, content, toolCalls = null) {
     
     messagesContainer.appendChild(messageDiv);
     scrollToBottom();
+    return messageDiv;
 }
 
 function showThinkingAnimation() {
@@ -212,6 +283,13 @@ function showThinkingAnimation() {
     scrollToBottom();
 }
 
+function updateThinkingStatus(text) {
+    const label = document.querySelector('#thinking-animation .thinking-content span');
+    if (label) {
+        label.textContent = text;
+    }
+}
+
 function removeThinkingAnimation() {
     const thinkingDiv = document.getElementById('thinking-animation');
     if (thinkingDiv) {
@@ -0,0 +1,120 @@
+"""
+Focus Catcher - Async HTTP Client
+共享的异步 HTTP 客户端：连接池、keep-alive、按主机限流、超时与重试
+"""
+
+import asyncio
+import os
+import random
+from urllib.parse import urlsplit
+
+import httpx
+
+# 可通过环境变量调整的参数
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", "4"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+
+# 这些状态码通常是暂时性的，值得重试
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+
+
+class AsyncHTTPClient:
+    """
+    Pooled async HTTP client shared by the agent tools.
+
+    One httpx.AsyncClient is created at startup and reused for every request,
+    so connections (and TLS sessions) are kept alive between tool calls.
+    """
+
+    def __init__(
+        self,
+        timeout: float = HTTP_TIMEOUT,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive: int = HTTP_MAX_KEEPALIVE,
+        per_host_limit: int = HTTP_PER_HOST_LIMIT,
+        max_retries: int = HTTP_MAX_RETRIES,
+        backoff_base: float = HTTP_BACKOFF_BASE
+    ):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.per_host_limit = per_host_limit
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self._client = None
+        self._host_limits = {}
+
+    async def start(self):
+        """Create the underlying connection pool."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive
+                ),
+                follow_redirects=True
+            )
+
+    async def close(self):
+        """Close all pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._host_limits.clear()
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Send a request with per-host concurrency limiting and retries.
+
+        Transport errors and RETRY_STATUS_CODES are retried with exponential
+        backoff; other HTTP errors are raised immediately.
+
+        Raises:
+            httpx.HTTPError: If the request still fails after all retries
+        """
+        await self.start()
+
+        async with self._host_limit(url):
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = await self._client.request(method, url, **kwargs)
+                    if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                        await self._backoff(attempt, response)
+                        continue
+                    # 304 answers a conditional request; callers handle it themselves
+                    if response.status_code != 304:
+                        response.raise_for_status()
+                    return response
+                except httpx.TransportError:
+                    if attempt >= self.max_retries:
+                        raise
+                    await self._backoff(attempt)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc.lower()
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_limits[host]
+
+    async def _backoff(self, attempt: int, response: httpx.Response = None):
+        delay = self.backoff_base * (2 ** attempt)
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        # Jitter keeps parallel retries from hitting the host at the same moment
+        await asyncio.sleep(delay * (0.5 + random.random()))
+
+
+# 全局共享实例（在应用启动时创建连接池，关闭时释放）
+http_client = AsyncHTTPClient()
@@ -0,0 +1,339 @@
+"""
+Focus Catcher - LLM Gateway
+所有 Gemini / OpenAI 调用的统一入口：按内容寻址的响应缓存（SQLite，TTL + 容量淘汰）、按调用点统计延迟和 token、可替换的后端
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+
+# 响应缓存路径，未设置时为数据目录下的 llm_cache.db，留空则不缓存
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH")
+
+LLM_CACHE_FILENAME = "llm_cache.db"
+
+# 缓存有效期（秒）
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+
+# 缓存容量上限（按响应大小计算），超出后淘汰最久未使用的条目
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# 每个调用点保留的最近延迟样本数（用于计算分位数）
+LATENCY_SAMPLES = 500
+
+
+def cache_key(provider: str, model: str, request: dict) -> str:
+    """Content address of an LLM request: provider, model, prompt and config."""
+    payload = json.dumps(
+        {"provider": provider, "model": model, "request": request},
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    SQLite-backed cache of LLM responses keyed by cache_key().
+
+    Entries expire after their TTL; when the total size exceeds max_bytes the
+    least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str, ttl: float = LLM_CACHE_TTL, max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, response TEXT, size INTEGER, "
+            "prompt_tokens INTEGER, completion_tokens INTEGER, "
+            "expires_at REAL, last_used REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_last_used ON llm_cache (last_used)")
+        self._db.commit()
+        self._bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: str) -> tuple[dict, int, int] | None:
+        """Return (response, prompt_tokens, completion_tokens) for a fresh entry."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response, prompt_tokens, completion_tokens, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[3] < now:
+                self.stats["misses"] += 1
+                return None
+            self._db.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.stats["hits"] += 1
+            return json.loads(row[0]), row[1] or 0, row[2] or 0
+
+    def put(self, key: str, response: dict, prompt_tokens: int = 0, completion_tokens: int = 0, ttl: float = None):
+        """Store a response."""
+        data = json.dumps(response, ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            old = self._db.execute("SELECT size FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, data, size, prompt_tokens, completion_tokens, now + (ttl if ttl is not None else self.ttl), now)
+            )
+            self._bytes += size - (old[0] if old else 0)
+            if self._bytes > self.max_bytes:
+                self._evict(now)
+            self._db.commit()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            return {**self.stats, "entries": entries, "bytes": self._bytes}
+
+    def _evict(self, now: float):
+        # Expired entries go first, then the least recently used ones
+        removed = self._db.execute("SELECT COUNT(*) FROM llm_cache WHERE expires_at < ?", (now,)).fetchone()[0]
+        self._db.execute("DELETE FROM llm_cache WHERE expires_at < ?", (now,))
+        self._bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+
+        rows = self._db.execute("SELECT key, size FROM llm_cache ORDER BY last_used ASC").fetchall()
+        for key, size in rows:
+            if self._bytes <= self.max_bytes * 0.9:
+                break
+            self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._bytes -= size
+            removed += 1
+        self.stats["evictions"] += removed
+
+
+class CallSiteStats:
+    """Latency and token counters for one call site."""
+
+    def __init__(self):
+        self.calls = 0
+        self.cache_hits = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.tokens_saved = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def snapshot(self) -> dict:
+        ordered = sorted(self.latencies)
+
+        def percentile(p):
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))], 1)
+
+        return {
+            "calls": self.calls,
+            "cache_hits": self.cache_hits,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "tokens_saved": self.tokens_saved,
+            "latency_ms_p50": percentile(50),
+            "latency_ms_p95": percentile(95)
+        }
+
+
+class LLMGateway:
+    """
+    Single entry point for LLM calls.
+
+    The backend is a pair of factories returning a Gemini-style model
+    (generate_content) and an OpenAI-style client (chat.completions.create),
+    so a fake backend can be swapped in with use_backend().
+    """
+
+    def __init__(self, cache: LLMResponseCache | None = None):
+        self.cache = cache
+        self._gemini_factory = None
+        self._openai_factory = None
+        self.gemini_model_name = None
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    def use_cache(self, cache: LLMResponseCache | None):
+        """Attach the response cache (None disables caching)."""
+        self.cache = cache
+
+    def use_backend(self, gemini_factory, openai_factory, gemini_model_name: str):
+        """
+        Args:
+            gemini_factory: Callable () -> model with generate_content()
+            openai_factory: Callable () -> client with chat.completions.create()
+            gemini_model_name: Model name, part of the cache key
+        """
+        self._gemini_factory = gemini_factory
+        self._openai_factory = openai_factory
+        self.gemini_model_name = gemini_model_name
+
+    def generate(self, site: str, prompt: str, generation_config: dict = None, use_cache: bool = True, ttl: float = None) -> str:
+        """
+        Generate text with the Gemini backend.
+
+        Args:
+            site: Call site name used for accounting (e.g. "topic_detection")
+            prompt: The prompt
+            generation_config: Passed to generate_content, part of the cache key
+            use_cache: Whether an identical earlier request may be answered from cache
+            ttl: Cache lifetime for this response (defaults to LLM_CACHE_TTL)
+
+        Returns:
+            The response text
+        """
+        key = cache_key("gemini", self.gemini_model_name, {"prompt": prompt, "config": generation_config})
+        cached = self._lookup(site, key, use_cache)
+        if cached is not None:
+            return cached["text"]
+
+        def call():
+            kwargs = {"generation_config": generation_config} if generation_config else {}
+            response = self._gemini_factory().generate_content(prompt, **kwargs)
+            usage = getattr(response, "usage_metadata", None)
+            return (
+                {"text": response.text},
+                getattr(usage, "prompt_token_count", 0) or 0,
+                getattr(usage, "candidates_token_count", 0) or 0
+            )
+
+        return self._call(site, key, call, use_cache, ttl)["text"]
+
+    def chat(self, site: str, use_cache: bool = True, ttl: float = None, **kwargs):
+        """
+        Non-streaming chat completion with the OpenAI backend.
+
+        Returns:
+            An object with .content and .tool_calls, like the SDK's message
+        """
+        key = self.chat_cache_key(kwargs)
+        cached = self._lookup(site, key, use_cache)
+        if cached is not None:
+            return message_from_dict(cached)
+
+        def call():
+            response = self._openai_factory().chat.completions.create(**kwargs)
+            usage = getattr(response, "usage", None)
+            return (
+                message_to_dict(response.choices[0].message),
+                getattr(usage, "prompt_tokens", 0) or 0,
+                getattr(usage, "completion_tokens", 0) or 0
+            )
+
+        return message_from_dict(self._call(site, key, call, use_cache, ttl))
+
+    def chat_cache_key(self, kwargs: dict) -> str:
+        return cache_key("openai", kwargs.get("model"), kwargs)
+
+    def cached_chat(self, site: str, kwargs: dict):
+        """Cached message for a chat request, or None (for the streaming path)."""
+        cached = self._lookup(site, self.chat_cache_key(kwargs), True)
+        return message_from_dict(cached) if cached is not None else None
+
+    def open_chat_stream(self, site: str, **kwargs):
+        """Start a streaming chat completion; finish with finish_chat_stream()."""
+        started = time.perf_counter()
+        try:
+            stream = self._openai_factory().chat.completions.create(stream=True, **kwargs)
+        except Exception:
+            self._record(site, error=True)
+            raise
+        return stream, started
+
+    def finish_chat_stream(self, site: str, started: float, kwargs: dict, message, use_cache: bool = True, ttl: float = None):
+        """Record a completed stream and cache the assembled message."""
+        self._record(site, latency=(time.perf_counter() - started) * 1000)
+        if use_cache and self.cache is not None:
+            self.cache.put(self.chat_cache_key(kwargs), message_to_dict(message), ttl=ttl)
+
+    def snapshot(self) -> dict:
+        """Per-call-site accounting and cache counters."""
+        with self._lock:
+            sites = {site: stats.snapshot() for site, stats in self._sites.items()}
+        return {"sites": sites, "cache": self.cache.snapshot() if self.cache is not None else None}
+
+    def _lookup(self, site: str, key: str, use_cache: bool):
+        if not use_cache or self.cache is None:
+            return None
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        response, prompt_tokens, completion_tokens = entry
+        with self._lock:
+            stats = self._sites.setdefault(site, CallSiteStats())
+            stats.calls += 1
+            stats.cache_hits += 1
+            stats.tokens_saved += prompt_tokens + completion_tokens
+        return response
+
+    def _call(self, site: str, key: str, call, use_cache: bool, ttl: float | None) -> dict:
+        started = time.perf_counter()
+        try:
+            response, prompt_tokens, completion_tokens = call()
+        except Exception:
+            self._record(site, error=True)
+            raise
+        self._record(site, (time.perf_counter() - started) * 1000, prompt_tokens, completion_tokens)
+        if use_cache and self.cache is not None:
+            self.cache.put(key, response, prompt_tokens, completion_tokens, ttl)
+        return response
+
+    def _record(self, site: str, latency: float = None, prompt_tokens: int = 0, completion_tokens: int = 0, error: bool = False):
+        with self._lock:
+            stats = self._sites.setdefault(site, CallSiteStats())
+            stats.calls += 1
+            if error:
+                stats.errors += 1
+                return
+            stats.prompt_tokens += prompt_tokens
+            stats.completion_tokens += completion_tokens
+            if latency is not None:
+                stats.latencies.append(latency)
+
+
+def message_to_dict(message) -> dict:
+    """Serialize an SDK chat message (content + tool calls) for the cache."""
+    return {
+        "content": message.content,
+        "tool_calls": [
+            {"id": tc.id, "name": tc.function.name, "arguments": tc.function.arguments}
+            for tc in message.tool_calls or []
+        ]
+    }
+
+
+def message_from_dict(data: dict):
+    return SimpleNamespace(
+        content=data.get("content"),
+        tool_calls=[
+            SimpleNamespace(id=tc["id"], function=SimpleNamespace(name=tc["name"], arguments=tc["arguments"]))
+            for tc in data.get("tool_calls") or []
+        ] or None
+    )
+
+
+def open_response_cache(data_dir: str) -> LLMResponseCache | None:
+    """
+    Open the response cache configured by LLM_CACHE_PATH.
+
+    Args:
+        data_dir: Directory for the cache file when LLM_CACHE_PATH is not set
+
+    Returns:
+        The cache, or None if caching is disabled (LLM_CACHE_PATH set to "")
+    """
+    if LLM_CACHE_PATH == "":
+        return None
+    return LLMResponseCache(LLM_CACHE_PATH or os.path.join(data_dir, LLM_CACHE_FILENAME))
+
+
+# 全局共享实例（后端和响应缓存在 main.py 启动时配置）
+llm_gateway = LLMGateway()
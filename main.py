@@ -1,28 +1,107 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool, iterate_in_threadpool
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from openai import OpenAI
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, insert, select, delete, text, DateTime
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta, timezone
 import os
-import requests
+import asyncio
+import httpx
 import json
 from bs4 import BeautifulSoup
 import re
+from types import SimpleNamespace
+from collections import Counter
 import google.generativeai as genai
 
 # Import database models
-from database import get_db, init_db, Session as DBSession, Capture
+from database import (
+    get_db,
+    get_async_db,
+    init_db,
+    async_engine,
+    AsyncSessionLocal,
+    SessionLocal,
+    DATA_DIR,
+    Session as DBSession,
+    Capture,
+    CaptureKey,
+    SessionTopic,
+    AnalysisJob
+)
+
+# Shared async HTTP client for the agent tools
+from http_client import http_client
+
+# Extracted page content cache for read_page
+from page_cache import page_cache, normalize_url
+
+# Search result cache with request coalescing for web_search
+from search_cache import search_cache
+
+# Background topic placement for deferred captures
+from capture_worker import CapturePlacementWorker
+
+# Background analysis job queue
+from analysis_jobs import AnalysisJobQueue
+
+# Local topic detection
+from topic_detection import (
+    TOPIC_DETECTION_MODE,
+    TOPIC_MIN_CAPTURES,
+    classify_vector,
+    cosine,
+    text_vector,
+    topic_label
+)
+
+# Nearest-session index for routing captures back to earlier topics
+from session_index import after_commit, session_index, SESSION_ROUTING_THRESHOLD
+
+# Incremental per-session topic summaries
+from session_topics import (
+    backfill_session_topics,
+    get_session_topic,
+    merge_capture_text,
+    merge_capture_texts,
+    rebuild_session_topic,
+    record_captures,
+    replace_capture_text,
+    topic_centroid,
+    topic_keywords
+)
+
+# Streaming export / import of all sessions and captures
+from data_transfer import export_lines, import_lines, ImportFormatError
+
+# Bulk session deletion and the periodic retention policy
+from session_retention import RetentionWorker, SessionCriteria, count_sessions, purge_sessions, retention_policy
+
+# Single entry point for LLM calls (response cache, accounting, fake backend)
+from llm_gateway import llm_gateway, open_response_cache
+from fake_llm import FakeGeminiModel, FakeOpenAIClient, FAKE_GEMINI_MODEL_NAME
 
 # Import AI prompts
 from focus_prompts import (
-    SESSION_ANALYSIS_PROMPT,
-    LEARNING_GUIDE_PROMPT,
-    format_captures_for_analysis
+    SESSION_MERGE_PROMPT,
+    SESSION_REDUCE_PROMPT
 )
 
+# Exact and near-duplicate detection at ingest
+from capture_dedup import CAPTURE_DEDUP, Candidate, DuplicateFinder, merge_duplicate
+
+# Full-text search over captures (SQLite FTS5)
+from capture_search import SEARCH_MAX_LIMIT, build_search_query, make_snippet, split_terms
+
+# Map-reduce analysis for sessions too large for one prompt
+from analysis_chunks import fits_in_prompt, format_chunk_summaries, reduce_chunk_summaries, summarize_in_chunks
+
 # Try to load environment variables from .env file (ignore if file doesn't exist or can't be read)
 try:
     from dotenv import load_dotenv
@@ -39,6 +118,59 @@ app = FastAPI(title="Chat API with Focus Catcher", version="1.0.0")
 def startup_event():
     init_db()
     print("✅ Database initialized")
+    
+    if llm_gateway.cache is None:
+        llm_gateway.use_cache(open_response_cache(DATA_DIR))
+    
+    placement_worker.start()
+    analysis_queue.start()
+    retention_worker.start()
+    
+    db = SessionLocal()
+    try:
+        backfilled = backfill_session_topics(db)
+        if backfilled:
+            print(f"✅ Built topic summaries for {backfilled} session(s)")
+        
+        indexed = session_index.build(db)
+        print(f"✅ Session topic index built ({indexed} recent session(s))")
+        
+        # Re-queue captures whose placement was interrupted by a restart
+        pending = db.query(Capture.id).filter(
+            Capture.placement_status == "pending"
+        ).order_by(Capture.id.asc()).all()
+        for (capture_id,) in pending:
+            placement_worker.submit(capture_id)
+        if pending:
+            print(f"✅ Re-queued {len(pending)} pending capture placement(s)")
+        
+        requeued = analysis_queue.recover(db)
+        if requeued:
+            print(f"✅ Re-queued {requeued} unfinished analysis job(s)")
+    finally:
+        db.close()
+
+
+@app.on_event("startup")
+async def start_http_client():
+    await http_client.start()
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    placement_worker.stop()
+    analysis_queue.stop()
+    retention_worker.stop()
+
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await http_client.close()
+
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    await async_engine.dispose()
 
 # Add CORS middleware to allow frontend to call the API
 app.add_middleware(
@@ -70,6 +202,9 @@ def get_openai_client():
     return _client
 
 
+GEMINI_MODEL_NAME = 'gemini-2.5-flash'  # 使用最新最快的模型
+
+
 def get_gemini_model():
     """Get or create Gemini model instance."""
     api_key = os.getenv("GOOGLE_API_KEY")
@@ -80,7 +215,21 @@ def get_gemini_model():
         )
     
     genai.configure(api_key=api_key)
-    return genai.GenerativeModel('gemini-2.5-flash')  # 使用最新最快的模型
+    return genai.GenerativeModel(GEMINI_MODEL_NAME)
+
+
+# LLM backend: "live" calls Gemini / OpenAI, "fake" answers offline (no API keys needed)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "live")
+
+# Cache lifetime (seconds) for /chat responses; 0 (the default) disables it,
+# since answers depend on live tool results (search, captures) and go stale
+LLM_CHAT_CACHE_TTL = float(os.getenv("LLM_CHAT_CACHE_TTL", "0"))
+
+if LLM_BACKEND == "fake":
+    llm_gateway.use_backend(FakeGeminiModel, FakeOpenAIClient, FAKE_GEMINI_MODEL_NAME)
+else:
+    # Looked up at call time so the factories can be replaced (e.g. in benchmarks)
+    llm_gateway.use_backend(lambda: get_gemini_model(), lambda: get_openai_client(), GEMINI_MODEL_NAME)
 
 
 def print_message_history(messages: list):
@@ -177,7 +326,25 @@ def print_message_history(messages: list):
     print("="*80 + "\n")
 
 
-def web_search(query: str) -> dict:
+async def web_search(query: str) -> dict:
+    """
+    Perform a web search, served from the search cache when possible.
+    Identical concurrent queries share one upstream call, and failures
+    are cached for a short window.
+    
+    Args:
+        query: The search query string
+        
+    Returns:
+        dict: Search results from the API
+        
+    Raises:
+        Exception: If the API call fails (or failed recently)
+    """
+    return await search_cache.get_or_fetch(query, fetch_web_search)
+
+
+async def fetch_web_search(query: str) -> dict:
     """
     Perform a web search using the internal search API.
     
@@ -205,16 +372,22 @@ def web_search(query: str) -> dict:
     }
     
     try:
-        response = requests.post(url, json=payload, headers=headers)
-        response.raise_for_status()
+        response = await http_client.post(url, json=payload, headers=headers)
         return response.json()
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code in (401, 403):
+            # Not cached as a failure, so a corrected key works immediately
+            raise PermissionError(f"Web search API rejected the API key: {str(e)}")
+        raise Exception(f"Web search API call failed: {str(e)}")
+    except httpx.HTTPError as e:
         raise Exception(f"Web search API call failed: {str(e)}")
 
 
-def read_page(url: str) -> dict:
+async def read_page(url: str) -> dict:
     """
     Fetch a web page and extract its main text content.
+    Results are cached per normalized URL; stale entries are revalidated
+    with ETag / Last-Modified so unchanged pages cost only a 304.
     
     Args:
         url: The URL of the page to read
@@ -225,50 +398,89 @@ def read_page(url: str) -> dict:
     Raises:
         Exception: If the page cannot be fetched or parsed
     """
+    cache_key = normalize_url(url)
+    cached = await page_cache.get(cache_key)
+    if cached is not None and cached.fresh:
+        print(f"[Cache] read_page hit: {cache_key}")
+        return {**cached.result, "url": url}
+    
     try:
-        # Fetch the page
+        # Fetch the page (conditionally if we hold a stale copy)
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
         }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        # Parse HTML
-        soup = BeautifulSoup(response.content, 'lxml')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style", "nav", "footer", "header"]):
-            script.decompose()
-        
-        # Get title
-        title = soup.title.string if soup.title else "No title"
-        
-        # Extract text
-        text = soup.get_text(separator='\n', strip=True)
-        
-        # Clean up whitespace
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = '\n'.join(chunk for chunk in chunks if chunk)
-        
-        # Limit text length to avoid overwhelming the LLM
-        max_length = 8000
-        if len(text) > max_length:
-            text = text[:max_length] + "\n\n[Content truncated due to length...]"
-        
-        return {
-            "url": url,
-            "title": title,
-            "content": text,
-            "length": len(text)
-        }
+        if cached is not None:
+            headers.update(cached.validator_headers())
+        response = await http_client.get(url, headers=headers)
+        
+        if response.status_code == 304:
+            if cached is not None:
+                print(f"[Cache] read_page revalidated: {cache_key}")
+                await page_cache.refresh(cache_key, cached)
+                return {**cached.result, "url": url}
+            # No copy to reuse: an empty 304 body is not page content, fetch unconditionally
+            response = await http_client.get(url, headers={**headers, "Cache-Control": "no-cache"})
+            if response.status_code == 304:
+                raise Exception("Server answered 304 Not Modified to an unconditional request")
+        
+        # Parse HTML off the event loop
+        result = await run_in_threadpool(extract_page_content, url, response.content)
+        await page_cache.put(
+            cache_key,
+            result,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified")
+        )
+        return result
         
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         raise Exception(f"Failed to fetch page: {str(e)}")
     except Exception as e:
         raise Exception(f"Failed to parse page: {str(e)}")
 
 
+def extract_page_content(url: str, html: bytes) -> dict:
+    """
+    Extract the title and main text content from an HTML document.
+    
+    Args:
+        url: The URL the document was fetched from
+        html: Raw HTML bytes
+        
+    Returns:
+        dict: Contains the URL, title, and extracted text content
+    """
+    # Parse HTML
+    soup = BeautifulSoup(html, 'lxml')
+    
+    # Remove script and style elements
+    for script in soup(["script", "style", "nav", "footer", "header"]):
+        script.decompose()
+    
+    # Get title
+    title = soup.title.string if soup.title else "No title"
+    
+    # Extract text
+    text = soup.get_text(separator='\n', strip=True)
+    
+    # Clean up whitespace
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    text = '\n'.join(chunk for chunk in chunks if chunk)
+    
+    # Limit text length to avoid overwhelming the LLM
+    max_length = 8000
+    if len(text) > max_length:
+        text = text[:max_length] + "\n\n[Content truncated due to length...]"
+    
+    return {
+        "url": url,
+        "title": title,
+        "content": text,
+        "length": len(text)
+    }
+
+
 # Tool schema for LLM to understand available functions
 TOOLS = [
     {
@@ -308,6 +520,122 @@ TOOLS = [
 ]
 
 
+# Maximum number of tool calls running at once within one agent turn
+TOOL_CALL_CONCURRENCY = int(os.getenv("TOOL_CALL_CONCURRENCY", "4"))
+
+# Overall time budget (seconds) for all tool calls of one agent turn
+TOOL_TURN_DEADLINE = float(os.getenv("TOOL_TURN_DEADLINE", "30"))
+
+
+async def execute_tool_call(function_name: str, function_args: dict) -> str:
+    """
+    Execute a single tool call.
+    
+    Args:
+        function_name: Name of the tool requested by the LLM
+        function_args: Parsed arguments of the call
+        
+    Returns:
+        str: JSON result (or JSON error) to send back as the tool message
+    """
+    print(f"[Agent] Calling tool: '{function_name}'")
+    print(f"[Agent] Arguments: {function_args}")
+    
+    try:
+        if function_name == "web_search":
+            query = function_args.get("query", "")
+            tool_result = await web_search(query)
+            
+            # Format the result for display
+            result_str = json.dumps(tool_result, ensure_ascii=False, indent=2)
+            print(f"[System] Tool Output: {result_str[:200]}..." if len(result_str) > 200 else f"[System] Tool Output: {result_str}")
+            return result_str
+            
+        elif function_name == "read_page":
+            url = function_args.get("url", "")
+            tool_result = await read_page(url)
+            
+            # Format the result for display
+            result_str = json.dumps(tool_result, ensure_ascii=False, indent=2)
+            print(f"[System] Tool Output (read_page):")
+            print(f"[System]   URL: {tool_result.get('url', 'N/A')}")
+            print(f"[System]   Title: {tool_result.get('title', 'N/A')}")
+            print(f"[System]   Content length: {tool_result.get('length', 0)} characters")
+            print(f"[System]   Preview: {tool_result.get('content', '')[:150]}...")
+            return result_str
+            
+        else:
+            error_msg = f"Unknown tool: {function_name}"
+            print(f"[System] Error: {error_msg}")
+            return json.dumps({"error": error_msg})
+    
+    except Exception as e:
+        error_msg = f"Tool execution failed: {str(e)}"
+        print(f"[System] Error: {error_msg}")
+        return json.dumps({"error": error_msg})
+
+
+def summarize_tool_result(function_name: str, result_str: str) -> str:
+    """One-line summary of a tool result for progress events."""
+    try:
+        result = json.loads(result_str)
+    except json.JSONDecodeError:
+        return result_str[:100]
+    
+    if "error" in result:
+        return f"❌ {result['error']}"
+    if function_name == "read_page":
+        return f"📄 {result.get('title', 'N/A')} ({result.get('length', 0)} chars)"
+    if function_name == "web_search":
+        return f"🔍 {len(result.get('queries', []))} query result(s)"
+    return result_str[:100]
+
+
+async def execute_tool_calls(calls: list[tuple[str, str, dict]], emit=None) -> list[str]:
+    """
+    Execute all tool calls of one agent turn concurrently.
+    
+    At most TOOL_CALL_CONCURRENCY calls run at once, and calls still running
+    after TOOL_TURN_DEADLINE seconds are cancelled and reported as errors.
+    
+    Args:
+        calls: (tool_call_id, function_name, function_args) in the order the LLM issued them
+        emit: Optional async callback receiving a tool_result event as each call finishes
+        
+    Returns:
+        list[str]: Tool message contents, in the same order as calls
+    """
+    semaphore = asyncio.Semaphore(TOOL_CALL_CONCURRENCY)
+    
+    async def run(tool_call_id: str, function_name: str, function_args: dict) -> str:
+        async with semaphore:
+            result_str = await execute_tool_call(function_name, function_args)
+        if emit:
+            await emit({
+                "type": "tool_result",
+                "id": tool_call_id,
+                "function": function_name,
+                "summary": summarize_tool_result(function_name, result_str)
+            })
+        return result_str
+    
+    tasks = [asyncio.create_task(run(*call)) for call in calls]
+    done, pending = await asyncio.wait(tasks, timeout=TOOL_TURN_DEADLINE)
+    
+    for task in pending:
+        task.cancel()
+    if pending:
+        print(f"[System] Error: {len(pending)} tool call(s) exceeded the {TOOL_TURN_DEADLINE:g}s turn deadline")
+    
+    results = []
+    for task in tasks:
+        if task in done:
+            results.append(task.result())
+        else:
+            results.append(json.dumps({"error": f"Tool call timed out after {TOOL_TURN_DEADLINE:g}s"}))
+    return results
+
+
 # Request model
 class ChatRequest(BaseModel):
     user_message: str
@@ -328,6 +656,7 @@ class CaptureRequest(BaseModel):
     selected_text: str
     page_url: str
     page_title: str | None = None
+    deferred: bool = False  # True: store immediately, detect topic shift in the background
 
 
 class CaptureResponse(BaseModel):
@@ -336,6 +665,94 @@ class CaptureResponse(BaseModel):
     capture_id: int
     session_id: int
     message: str
+    placement: str = "placed"  # "pending" when session_id is provisional (deferred mode)
+    capture_count: int = 0
+    analysis_stale: bool = True  # Captures were added since the last analysis
+    analysis_recommended: bool = False
+    duplicate: str | None = None  # "exact", "near" or "overlap" when merged into an existing capture
+    hit_count: int = 1
+
+
+class SessionStatusResponse(BaseModel):
+    """Response model for the lightweight session status endpoint."""
+    session_id: int
+    status: str
+    capture_count: int
+    last_analyzed_at: datetime | None
+    analysis_stale: bool
+    analysis_recommended: bool
+
+
+class BatchCaptureItem(BaseModel):
+    """One capture of a batch upload."""
+    selected_text: str
+    page_url: str
+    page_title: str | None = None
+    timestamp: datetime | None = None  # Client-side capture time (defaults to now)
+    idempotency_key: str | None = None  # Retried uploads with the same key are not stored twice
+
+
+class CaptureBatchRequest(BaseModel):
+    """Request model for batch capture ingestion; captures are in capture order."""
+    captures: list[BatchCaptureItem]
+
+
+class BatchCaptureResult(BaseModel):
+    """Outcome of one capture of a batch, in request order."""
+    index: int
+    capture_id: int
+    session_id: int
+    status: str  # "created", "duplicate" (idempotency key seen before) or "merged" (same content as another capture)
+
+
+class SessionBulkDeleteRequest(BaseModel):
+    """Filters of a bulk session deletion; all given filters must match."""
+    status: list[str] | None = None  # Active sessions are only deleted when "active" is listed
+    older_than_days: float | None = None  # Sessions started more than this many days ago
+    captures_below: int | None = None  # Sessions with fewer captures than this
+    dry_run: bool = False  # Only count the matching sessions
+
+
+class CaptureBatchResponse(BaseModel):
+    """Response model for batch capture ingestion."""
+    success: bool
+    created: int
+    duplicates: int
+    merged: int = 0
+    results: list[BatchCaptureResult]
+    sessions: list[SessionStatusResponse]  # Every session that received captures
+
+
+# Number of captures after which a session is worth analyzing
+ANALYSIS_THRESHOLD = 5
+
+# Maximum number of captures accepted by one batch request
+CAPTURE_BATCH_MAX_SIZE = int(os.getenv("CAPTURE_BATCH_MAX_SIZE", "5000"))
+
+# Columns that GET /api/focus/captures/{session_id} can return (fields=)
+CAPTURE_FIELDS = {
+    "id": Capture.id,
+    "session_id": Capture.session_id,
+    "selected_text": Capture.selected_text,
+    "page_url": Capture.page_url,
+    "page_title": Capture.page_title,
+    "timestamp": Capture.timestamp,
+    "focus_point": Capture.focus_point,
+    "content_type": Capture.content_type,
+    "suggested_action": Capture.suggested_action,
+    "placement_status": Capture.placement_status,
+    "hit_count": Capture.hit_count
+}
+CAPTURE_DEFAULT_FIELDS = [
+    "id", "selected_text", "page_url", "page_title", "timestamp",
+    "focus_point", "content_type", "suggested_action", "hit_count"
+]
+
+# Rows fetched per round trip when streaming captures as NDJSON
+CAPTURE_STREAM_BATCH = 500
+
+# How long (seconds) the synchronous analyze endpoint waits for its job
+ANALYSIS_WAIT_TIMEOUT = float(os.getenv("ANALYSIS_WAIT_TIMEOUT", "300"))
 
 
 class SessionResponse(BaseModel):
@@ -353,6 +770,21 @@ async def root():
     return {"message": "Chat API is running. Use POST /chat to send messages."}
 
 
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Hit, miss and eviction counters of the tool caches."""
+    return {
+        "read_page": page_cache.snapshot(),
+        "web_search": search_cache.snapshot()
+    }
+
+
+@app.get("/api/llm/stats")
+async def llm_stats():
+    """Per-call-site LLM latency and token usage, plus response cache counters."""
+    return llm_gateway.snapshot()
+
+
 # Serve frontend
 @app.get("/")
 async def serve_frontend():
@@ -360,140 +792,157 @@ async def serve_frontend():
     return FileResponse("frontend/index.html")
 
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def complete_chat(emit=None, **kwargs):
     """
-    Chat endpoint with full Agentic Loop implementation.
+    Call the chat completions API through the LLM gateway, off the event loop.
+    
+    Without emit this is a plain blocking call run in the threadpool. With
+    emit the response is streamed: text chunks are emitted as delta events
+    and tool call fragments are assembled into complete tool calls. A cached
+    response is emitted as a single delta.
+    
+    Returns:
+        An object with .content and .tool_calls, like the SDK's message
+    """
+    use_cache = LLM_CHAT_CACHE_TTL > 0
+    if emit is None:
+        return await run_in_threadpool(
+            llm_gateway.chat, "chat", use_cache=use_cache, ttl=LLM_CHAT_CACHE_TTL, **kwargs
+        )
+    
+    cached = await run_in_threadpool(llm_gateway.cached_chat, "chat", kwargs) if use_cache else None
+    if cached is not None:
+        if cached.content:
+            await emit({"type": "delta", "content": cached.content})
+        return cached
+    
+    stream, started = await run_in_threadpool(llm_gateway.open_chat_stream, "chat", **kwargs)
+    
+    content_parts = []
+    tool_calls = {}
+    async for chunk in iterate_in_threadpool(stream):
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        
+        if delta.content:
+            content_parts.append(delta.content)
+            await emit({"type": "delta", "content": delta.content})
+        
+        for tc in delta.tool_calls or []:
+            call = tool_calls.setdefault(tc.index, {"id": None, "name": "", "arguments": ""})
+            if tc.id:
+                call["id"] = tc.id
+            if tc.function and tc.function.name:
+                call["name"] += tc.function.name
+            if tc.function and tc.function.arguments:
+                call["arguments"] += tc.function.arguments
+    
+    message = SimpleNamespace(
+        content="".join(content_parts) or None,
+        tool_calls=[
+            SimpleNamespace(
+                id=call["id"],
+                function=SimpleNamespace(name=call["name"], arguments=call["arguments"] or "{}")
+            )
+            for _, call in sorted(tool_calls.items())
+        ] or None
+    )
+    await run_in_threadpool(
+        llm_gateway.finish_chat_stream, "chat", started, kwargs, message, use_cache=use_cache, ttl=LLM_CHAT_CACHE_TTL
+    )
+    return message
+
+
+async def run_agent(user_message: str, emit=None) -> ChatResponse:
+    """
+    Full Agentic Loop implementation shared by /chat and /chat/stream.
     The LLM can call tools, receive results, and iterate up to max_turns times.
     
     Args:
-        request: ChatRequest containing user_message field
+        user_message: The user's question
+        emit: Optional async callback receiving progress events
+              (turn_start, tool_call, tool_result, delta). When given, LLM
+              responses are streamed and their text arrives as delta events.
         
     Returns:
         ChatResponse containing the assistant's final response and tool call history
     """
     max_turns = 10  # Maximum number of agent turns to prevent infinite loops (increased from 5)
     
-    try:
-        # Get OpenAI client
-        client = get_openai_client()
-        
-        # Initialize conversation history
-        messages = [
-            {"role": "user", "content": request.user_message}
-        ]
-        
-        # Track all tool calls made during the conversation
-        all_tool_calls = []
-        
-        # Track consecutive empty responses
-        consecutive_empty_responses = 0
-        
-        # Track consecutive tool-only turns (no text generation)
-        consecutive_tool_turns = 0
+    # Initialize conversation history
+    messages = [
+        {"role": "user", "content": user_message}
+    ]
+    
+    # Track all tool calls made during the conversation
+    all_tool_calls = []
+    
+    # Track consecutive empty responses
+    consecutive_empty_responses = 0
+    
+    # Track consecutive tool-only turns (no text generation)
+    consecutive_tool_turns = 0
+    
+    print(f"\n{'='*60}")
+    print(f"[User] {user_message}")
+    print(f"{'='*60}")
+    
+    # Agentic Loop: iterate up to max_turns
+    for turn in range(max_turns):
+        print(f"\n[Turn {turn + 1}/{max_turns}]")
+        if emit:
+            await emit({"type": "turn_start", "turn": turn + 1, "max_turns": max_turns})
+        
+        # Call LLM with current conversation history
+        message = await complete_chat(
+            emit,
+            model="gpt-5",
+            messages=messages,
+            tools=TOOLS,
+            tool_choice="auto"
+        )
         
-        print(f"\n{'='*60}")
-        print(f"[User] {request.user_message}")
-        print(f"{'='*60}")
+        # Add assistant's message to conversation history
+        # Convert to dict format for messages array
+        # Note: content can be None when tool_calls are present
+        assistant_message = {
+            "role": "assistant",
+            "content": message.content if message.content else None
+        }
         
-        # Agentic Loop: iterate up to max_turns
-        for turn in range(max_turns):
-            print(f"\n[Turn {turn + 1}/{max_turns}]")
-            
-            # Call LLM with current conversation history
-            response = client.chat.completions.create(
-                model="gpt-5",
-                messages=messages,
-                tools=TOOLS,
-                tool_choice="auto"
-            )
-            
-            # Extract the assistant's response
-            message = response.choices[0].message
+        # Check if the model wants to call tools
+        if message.tool_calls:
+            # Increment consecutive tool turns counter
+            consecutive_tool_turns += 1
             
-            # Add assistant's message to conversation history
-            # Convert to dict format for messages array
-            # Note: content can be None when tool_calls are present
-            assistant_message = {
-                "role": "assistant",
-                "content": message.content if message.content else None
-            }
-            
-            # Check if the model wants to call tools
-            if message.tool_calls:
-                # Increment consecutive tool turns counter
-                consecutive_tool_turns += 1
+            # Check if we've had too many consecutive tool calls
+            if consecutive_tool_turns >= 5:
+                # LLM is stuck in a search loop - force it to generate an answer
+                print(f"[Agent] Warning: {consecutive_tool_turns} consecutive tool calls detected")
+                print(f"[Agent] Forcing answer generation to break the loop...")
                 
-                # Check if we've had too many consecutive tool calls
-                if consecutive_tool_turns >= 5:
-                    # LLM is stuck in a search loop - force it to generate an answer
-                    print(f"[Agent] Warning: {consecutive_tool_turns} consecutive tool calls detected")
-                    print(f"[Agent] Forcing answer generation to break the loop...")
-                    
-                    # Add a strong directive
-                    messages.append({
-                        "role": "system",
-                        "content": "你已经搜索了足够多的信息。现在必须停止搜索，基于已获取的所有搜索结果生成一个完整的回答。即使搜索结果中没有直接答案，你也要总结链接、标题等信息，或者告诉用户你找到了哪些相关资源。不要再调用任何工具。"
-                    })
-                    
-                    # Call LLM without tools
-                    try:
-                        final_response = client.chat.completions.create(
-                            model="gpt-5",
-                            messages=messages,
-                            tools=None,
-                            temperature=0.7
-                        )
-                        
-                        final_message = final_response.choices[0].message
-                        final_answer = final_message.content or "抱歉，虽然我进行了多次搜索，但无法生成满意的回答。建议您直接访问相关新闻网站获取最新信息。"
-                        
-                        print(f"[Agent] Forced Final Answer: {final_answer}")
-                        print(f"{'='*60}\n")
-                        
-                        messages.append({
-                            "role": "assistant",
-                            "content": final_answer
-                        })
-                        
-                        print_message_history(messages)
-                        
-                        return ChatResponse(
-                            content=final_answer,
-                            tool_calls=all_tool_calls if all_tool_calls else None
-                        )
-                    except Exception as e:
-                        print(f"[Error] Failed to force answer: {e}")
-                        # Continue to normal flow
+                # Add a strong directive
+                messages.append({
+                    "role": "system",
+                    "content": "你已经搜索了足够多的信息。现在必须停止搜索，基于已获取的所有搜索结果生成一个完整的回答。即使搜索结果中没有直接答案，你也要总结链接、标题等信息，或者告诉用户你找到了哪些相关资源。不要再调用任何工具。"
+                })
                 
-                # Check if this is the last turn
-                if turn == max_turns - 1:
-                    # Last turn but LLM still wants to call tools
-                    # Force it to generate an answer instead
-                    print(f"[Agent] Warning: Last turn reached, but LLM wants to call {len(message.tool_calls)} tool(s)")
-                    print(f"[Agent] Forcing final answer generation...")
-                    
-                    # Add a system message to force answer generation
-                    messages.append({
-                        "role": "system",
-                        "content": "这是最后一轮对话。请基于已获取的信息生成最终答案，不要再调用工具。如果信息不足，请说明并给出部分答案。"
-                    })
-                    
-                    # Call LLM again without tools to force text generation
-                    final_response = client.chat.completions.create(
+                # Call LLM without tools
+                try:
+                    final_message = await complete_chat(
+                        emit,
                         model="gpt-5",
                         messages=messages,
-                        tools=None,  # Disable tools
+                        tools=None,
                         temperature=0.7
                     )
                     
-                    final_message = final_response.choices[0].message
-                    final_answer = final_message.content or "抱歉，我无法生成完整的回答。请尝试简化您的问题。"
+                    final_answer = final_message.content or "抱歉，虽然我进行了多次搜索，但无法生成满意的回答。建议您直接访问相关新闻网站获取最新信息。"
                     
                     print(f"[Agent] Forced Final Answer: {final_answer}")
                     print(f"{'='*60}\n")
                     
-                    # Add final message to history
                     messages.append({
                         "role": "assistant",
                         "content": final_answer
@@ -505,117 +954,43 @@ async def chat(request: ChatRequest):
                         content=final_answer,
                         tool_calls=all_tool_calls if all_tool_calls else None
                     )
+                except Exception as e:
+                    print(f"[Error] Failed to force answer: {e}")
+                    # Continue to normal flow
+            
+            # Check if this is the last turn
+            if turn == max_turns - 1:
+                # Last turn but LLM still wants to call tools
+                # Force it to generate an answer instead
+                print(f"[Agent] Warning: Last turn reached, but LLM wants to call {len(message.tool_calls)} tool(s)")
+                print(f"[Agent] Forcing final answer generation...")
                 
-                print(f"[Agent] Decided to call {len(message.tool_calls)} tool(s)")
-                print(f"[Agent] Consecutive tool-only turns: {consecutive_tool_turns}")
-                
-                # Reset empty response counter (we got tool calls)
-                consecutive_empty_responses = 0
-                
-                # Add tool_calls to assistant message
-                # Fix: Ensure content is empty string instead of None to avoid API errors
-                if assistant_message["content"] is None:
-                    assistant_message["content"] = ""
-                
-                assistant_message["tool_calls"] = [
-                    {
-                        "id": tc.id,
-                        "type": "function",
-                        "function": {
-                            "name": tc.function.name,
-                            "arguments": tc.function.arguments
-                        }
-                    }
-                    for tc in message.tool_calls
-                ]
-                messages.append(assistant_message)
-                
-                # Execute each tool call
-                for tool_call in message.tool_calls:
-                    function_name = tool_call.function.name
-                    function_args = json.loads(tool_call.function.arguments)
-                    
-                    print(f"[Agent] Calling tool: '{function_name}'")
-                    print(f"[Agent] Arguments: {function_args}")
-                    
-                    # Track this tool call
-                    all_tool_calls.append({
-                        "id": tool_call.id,
-                        "function": function_name,
-                        "arguments": function_args
-                    })
-                    
-                    # Execute the tool
-                    try:
-                        if function_name == "web_search":
-                            query = function_args.get("query", "")
-                            tool_result = web_search(query)
-                            
-                            # Format the result for display
-                            result_str = json.dumps(tool_result, ensure_ascii=False, indent=2)
-                            print(f"[System] Tool Output: {result_str[:200]}..." if len(result_str) > 200 else f"[System] Tool Output: {result_str}")
-                            
-                            # Add tool result to conversation history
-                            messages.append({
-                                "role": "tool",
-                                "tool_call_id": tool_call.id,
-                                "content": result_str
-                            })
-                            
-                        elif function_name == "read_page":
-                            url = function_args.get("url", "")
-                            tool_result = read_page(url)
-                            
-                            # Format the result for display
-                            result_str = json.dumps(tool_result, ensure_ascii=False, indent=2)
-                            print(f"[System] Tool Output (read_page):")
-                            print(f"[System]   URL: {tool_result.get('url', 'N/A')}")
-                            print(f"[System]   Title: {tool_result.get('title', 'N/A')}")
-                            print(f"[System]   Content length: {tool_result.get('length', 0)} characters")
-                            print(f"[System]   Preview: {tool_result.get('content', '')[:150]}...")
-                            
-                            # Add tool result to conversation history
-                            messages.append({
-                                "role": "tool",
-                                "tool_call_id": tool_call.id,
-                                "content": result_str
-                            })
-                            
-                        else:
-                            error_msg = f"Unknown tool: {function_name}"
-                            print(f"[System] Error: {error_msg}")
-                            messages.append({
-                                "role": "tool",
-                                "tool_call_id": tool_call.id,
-                                "content": json.dumps({"error": error_msg})
-                            })
-                    
-                    except Exception as e:
-                        error_msg = f"Tool execution failed: {str(e)}"
-                        print(f"[System] Error: {error_msg}")
-                        messages.append({
-                            "role": "tool",
-                            "tool_call_id": tool_call.id,
-                            "content": json.dumps({"error": error_msg})
-                        })
+                # Add a system message to force answer generation
+                messages.append({
+                    "role": "system",
+                    "content": "这是最后一轮对话。请基于已获取的信息生成最终答案，不要再调用工具。如果信息不足，请说明并给出部分答案。"
+                })
                 
-                # Continue to next turn to let LLM process the tool results
-                continue
-            
-            # No tool calls - check if we have a final answer
-            elif message.content:
-                # LLM has provided final answer with content
-                messages.append(assistant_message)
+                # Call LLM again without tools to force text generation
+                final_message = await complete_chat(
+                    emit,
+                    model="gpt-5",
+                    messages=messages,
+                    tools=None,  # Disable tools
+                    temperature=0.7
+                )
                 
-                # Reset counters
-                consecutive_empty_responses = 0
-                consecutive_tool_turns = 0
+                final_answer = final_message.content or "抱歉，我无法生成完整的回答。请尝试简化您的问题。"
                 
-                final_answer = message.content
-                print(f"[Agent] Final Answer: {final_answer}")
+                print(f"[Agent] Forced Final Answer: {final_answer}")
                 print(f"{'='*60}\n")
                 
-                # DEBUG: Print complete message history before returning
+                # Add final message to history
+                messages.append({
+                    "role": "assistant",
+                    "content": final_answer
+                })
+                
                 print_message_history(messages)
                 
                 return ChatResponse(
@@ -623,85 +998,185 @@ async def chat(request: ChatRequest):
                     tool_calls=all_tool_calls if all_tool_calls else None
                 )
             
-            else:
-                # No tool calls AND no content - this is unusual
-                # This might happen if the LLM returns an empty response
-                
-                consecutive_empty_responses += 1
+            print(f"[Agent] Decided to call {len(message.tool_calls)} tool(s)")
+            print(f"[Agent] Consecutive tool-only turns: {consecutive_tool_turns}")
+            
+            # Reset empty response counter (we got tool calls)
+            consecutive_empty_responses = 0
+            
+            # Add tool_calls to assistant message
+            # Fix: Ensure content is empty string instead of None to avoid API errors
+            if assistant_message["content"] is None:
+                assistant_message["content"] = ""
+            
+            assistant_message["tool_calls"] = [
+                {
+                    "id": tc.id,
+                    "type": "function",
+                    "function": {
+                        "name": tc.function.name,
+                        "arguments": tc.function.arguments
+                    }
+                }
+                for tc in message.tool_calls
+            ]
+            messages.append(assistant_message)
+            
+            # Track the tool calls of this turn
+            turn_calls = []
+            for tool_call in message.tool_calls:
+                function_name = tool_call.function.name
+                try:
+                    function_args = json.loads(tool_call.function.arguments)
+                except json.JSONDecodeError:
+                    function_args = {}
                 
-                print(f"[Agent] Warning: Received response with no tool calls and no content")
-                print(f"[Agent] Consecutive empty responses: {consecutive_empty_responses}")
-                print(f"[Agent] Turn {turn + 1}/{max_turns}: Attempting to recover...")
+                all_tool_calls.append({
+                    "id": tool_call.id,
+                    "function": function_name,
+                    "arguments": function_args
+                })
+                turn_calls.append((tool_call.id, function_name, function_args))
                 
-                # If we've had 2+ consecutive empty responses, force a final answer
-                if consecutive_empty_responses >= 2 or turn == max_turns - 1:
-                    print(f"[Agent] Too many empty responses or last turn - forcing final answer...")
-                    
-                    # Add a strong directive to generate an answer
-                    messages.append({
-                        "role": "system",
-                        "content": "你必须立即生成一个回答。请基于之前获取的任何信息回答用户的问题。如果没有足够信息，请诚实地告诉用户你无法获取准确信息，但尽量提供一些相关建议。不要返回空响应。"
+                if emit:
+                    await emit({
+                        "type": "tool_call",
+                        "id": tool_call.id,
+                        "function": function_name,
+                        "arguments": function_args
                     })
-                    
-                    # Call LLM one more time without tools to force text generation
-                    try:
-                        final_response = client.chat.completions.create(
-                            model="gpt-5",
-                            messages=messages,
-                            tools=None,  # Disable tools
-                            temperature=0.7
-                        )
-                        
-                        final_message = final_response.choices[0].message
-                        final_answer = final_message.content or "抱歉，我在处理您的问题时遇到了困难。我已经尝试搜索相关信息，但无法生成完整的回答。请尝试重新表述您的问题，或将其分解成更简单的部分。"
-                        
-                        print(f"[Agent] Forced Final Answer: {final_answer}")
-                        print(f"{'='*60}\n")
-                        
-                        messages.append({
-                            "role": "assistant",
-                            "content": final_answer
-                        })
-                        
-                        print_message_history(messages)
-                        
-                        return ChatResponse(
-                            content=final_answer,
-                            tool_calls=all_tool_calls if all_tool_calls else None
-                        )
-                    except Exception as e:
-                        print(f"[Error] Failed to force final answer: {e}")
-                        final_answer = "抱歉，我在生成回答时遇到了问题。请尝试重新表述您的问题，或将问题分解成更简单的部分。"
-                        
-                        print_message_history(messages)
-                        
-                        return ChatResponse(
-                            content=final_answer,
-                            tool_calls=all_tool_calls if all_tool_calls else None
-                        )
-                
-                # First empty response - add a guidance prompt
+            
+            # Execute the tool calls concurrently, keep results in call order
+            results = await execute_tool_calls(turn_calls, emit)
+            
+            for tool_call, result_str in zip(message.tool_calls, results):
+                # Add tool result to conversation history
                 messages.append({
-                    "role": "system",
-                    "content": "请基于已获取的搜索结果，生成一个完整的回答。如果搜索结果中包含相关信息，请提取并总结。如果信息不足，请说明并给出部分答案。"
+                    "role": "tool",
+                    "tool_call_id": tool_call.id,
+                    "content": result_str
                 })
-                
-                print(f"[Agent] Added guidance prompt, retrying...")
-                
-                # Continue to next turn with the guidance
-                continue
+            
+            # Continue to next turn to let LLM process the tool results
+            continue
         
-        # Max turns reached without final answer
-        print(f"[System] Max turns ({max_turns}) reached")
-        print(f"{'='*60}\n")
+        # No tool calls - check if we have a final answer
+        elif message.content:
+            # LLM has provided final answer with content
+            messages.append(assistant_message)
+            
+            # Reset counters
+            consecutive_empty_responses = 0
+            consecutive_tool_turns = 0
+            
+            final_answer = message.content
+            print(f"[Agent] Final Answer: {final_answer}")
+            print(f"{'='*60}\n")
+            
+            # DEBUG: Print complete message history before returning
+            print_message_history(messages)
+            
+            return ChatResponse(
+                content=final_answer,
+                tool_calls=all_tool_calls if all_tool_calls else None
+            )
         
-        # DEBUG: Print complete message history before returning
-        print_message_history(messages)
+        else:
+            # No tool calls AND no content - this is unusual
+            # This might happen if the LLM returns an empty response
+            
+            consecutive_empty_responses += 1
+            
+            print(f"[Agent] Warning: Received response with no tool calls and no content")
+            print(f"[Agent] Consecutive empty responses: {consecutive_empty_responses}")
+            print(f"[Agent] Turn {turn + 1}/{max_turns}: Attempting to recover...")
+            
+            # If we've had 2+ consecutive empty responses, force a final answer
+            if consecutive_empty_responses >= 2 or turn == max_turns - 1:
+                print(f"[Agent] Too many empty responses or last turn - forcing final answer...")
+                
+                # Add a strong directive to generate an answer
+                messages.append({
+                    "role": "system",
+                    "content": "你必须立即生成一个回答。请基于之前获取的任何信息回答用户的问题。如果没有足够信息，请诚实地告诉用户你无法获取准确信息，但尽量提供一些相关建议。不要返回空响应。"
+                })
+                
+                # Call LLM one more time without tools to force text generation
+                try:
+                    final_message = await complete_chat(
+                        emit,
+                        model="gpt-5",
+                        messages=messages,
+                        tools=None,  # Disable tools
+                        temperature=0.7
+                    )
+                    
+                    final_answer = final_message.content or "抱歉，我在处理您的问题时遇到了困难。我已经尝试搜索相关信息，但无法生成完整的回答。请尝试重新表述您的问题，或将其分解成更简单的部分。"
+                    
+                    print(f"[Agent] Forced Final Answer: {final_answer}")
+                    print(f"{'='*60}\n")
+                    
+                    messages.append({
+                        "role": "assistant",
+                        "content": final_answer
+                    })
+                    
+                    print_message_history(messages)
+                    
+                    return ChatResponse(
+                        content=final_answer,
+                        tool_calls=all_tool_calls if all_tool_calls else None
+                    )
+                except Exception as e:
+                    print(f"[Error] Failed to force final answer: {e}")
+                    final_answer = "抱歉，我在生成回答时遇到了问题。请尝试重新表述您的问题，或将问题分解成更简单的部分。"
+                    
+                    print_message_history(messages)
+                    
+                    return ChatResponse(
+                        content=final_answer,
+                        tool_calls=all_tool_calls if all_tool_calls else None
+                    )
+            
+            # First empty response - add a guidance prompt
+            messages.append({
+                "role": "system",
+                "content": "请基于已获取的搜索结果，生成一个完整的回答。如果搜索结果中包含相关信息，请提取并总结。如果信息不足，请说明并给出部分答案。"
+            })
+            
+            print(f"[Agent] Added guidance prompt, retrying...")
+            
+            # Continue to next turn with the guidance
+            continue
+    
+    # Max turns reached without final answer
+    print(f"[System] Max turns ({max_turns}) reached")
+    print(f"{'='*60}\n")
+    
+    # DEBUG: Print complete message history before returning
+    print_message_history(messages)
+    
+    return ChatResponse(
+        content="I apologize, but I've reached the maximum number of steps. Please try rephrasing your question.",
+        tool_calls=all_tool_calls if all_tool_calls else None
+    )
+    
+
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest):
+    """
+    Chat endpoint with full Agentic Loop implementation.
+    The LLM can call tools, receive results, and iterate up to max_turns times.
+    
+    Args:
+        request: ChatRequest containing user_message field
         
-        return ChatResponse(
-            content="I apologize, but I've reached the maximum number of steps. Please try rephrasing your question.",
-            tool_calls=all_tool_calls if all_tool_calls else None
-        )
+    Returns:
+        ChatResponse containing the assistant's final response and tool call history
+    """
+    try:
+        return await run_agent(request.user_message)
         
     except ValueError as e:
         # Handle missing API key
@@ -719,11 +1194,144 @@ async def chat(request: ChatRequest):
         )
 
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Streaming variant of /chat using server-sent events.
+    
+    Each event is a JSON object with a "type" field:
+    turn_start, tool_call, tool_result, delta (answer text chunk),
+    and finally done (full answer and tool calls) or error.
+    
+    Args:
+        request: ChatRequest containing user_message field
+        
+    Returns:
+        StreamingResponse with media type text/event-stream
+    """
+    events = asyncio.Queue()
+    
+    async def run():
+        try:
+            result = await run_agent(request.user_message, emit=events.put)
+            await events.put({
+                "type": "done",
+                "content": result.content,
+                "tool_calls": result.tool_calls
+            })
+        except Exception as e:
+            print(f"[Error] {str(e)}")
+            await events.put({"type": "error", "detail": str(e)})
+    
+    async def event_source():
+        task = asyncio.create_task(run())
+        try:
+            while True:
+                event = await events.get()
+                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+                if event["type"] in ("done", "error"):
+                    break
+        finally:
+            # Client went away: stop the agent loop
+            if not task.done():
+                task.cancel()
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 # ============================================================
 # Focus Catcher Endpoints
 # ============================================================
 
-def detect_topic_shift(new_text: str, recent_captures: list, db: Session) -> tuple[bool, str]:
+def get_recent_captures(db: Session, session_id: int, before_capture_id: int = None, limit: int = 5) -> list:
+    """Get the most recent captures of a session, optionally only those before a capture."""
+    query = db.query(Capture).filter(Capture.session_id == session_id)
+    if before_capture_id is not None:
+        query = query.filter(Capture.id < before_capture_id)
+    return query.order_by(Capture.timestamp.desc()).limit(limit).all()
+
+
+def detect_topic_shift(new_text: str, session_id: int, db: Session, before_capture_id: int = None) -> tuple[bool, str]:
+    """
+    Detect if the new capture represents a topic shift.
+    
+    Depending on TOPIC_DETECTION_MODE this compares the text with the session's
+    incrementally maintained topic centroid ("local"), asks Gemini ("llm"), or
+    uses the centroid with a Gemini fallback for scores in the uncertain band
+    ("hybrid").
+    
+    Args:
+        new_text: The newly captured text
+        session_id: The session the capture would join
+        db: Database session
+        before_capture_id: Only use captures before this one as LLM context
+    
+    Returns:
+        (topic_shifted: bool, new_topic: str)
+    """
+    topic = get_session_topic(db, session_id)
+    decision, new_topic = local_topic_decision(new_text, topic)
+    
+    if decision == "llm":
+        recent_captures = get_recent_captures(db, session_id, before_capture_id)
+        return detect_topic_shift_llm(new_text, recent_captures, db)
+    
+    return decision == "shift", new_topic
+
+
+async def detect_topic_shift_async(new_text: str, session_id: int, db: AsyncSession) -> tuple[bool, str]:
+    """
+    detect_topic_shift for the async endpoints.
+    
+    The Gemini call (if one is needed) runs in the threadpool with no
+    connection held, so other requests keep using the database meanwhile.
+    """
+    topic = await db.run_sync(get_session_topic, session_id)
+    decision, new_topic = local_topic_decision(new_text, topic)
+    
+    if decision == "llm":
+        recent_captures = await db.run_sync(get_recent_captures, session_id)
+        # Nothing is pending yet; ending the read transaction returns the connection to the pool
+        await db.commit()
+        return await run_in_threadpool(detect_topic_shift_llm, new_text, recent_captures, None)
+    
+    return decision == "shift", new_topic
+
+
+def local_topic_decision(new_text: str, topic: SessionTopic | None) -> tuple[str, str]:
+    """
+    The part of topic detection that needs no LLM call.
+    
+    Returns:
+        (decision, new_topic) where decision is "same", "shift", or "llm"
+        when Gemini has to decide
+    """
+    if topic is None or (topic.vector_count or 0) < TOPIC_MIN_CAPTURES:
+        # Not enough data to determine topic shift
+        return "same", ""
+    
+    if TOPIC_DETECTION_MODE == "llm":
+        return "llm", ""
+    
+    score, verdict = classify_vector(text_vector(new_text), topic_centroid(topic))
+    print(f"[Topic Detection] Local similarity: {score:.3f} → {verdict}")
+    
+    if verdict == "shift":
+        new_topic = topic_label(new_text)
+        print(f"[Topic Detection] 🔄 Topic shift detected: {new_topic}")
+        return "shift", new_topic
+    
+    if verdict == "uncertain" and TOPIC_DETECTION_MODE == "hybrid":
+        return "llm", ""
+    
+    return "same", ""
+
+
+def detect_topic_shift_llm(new_text: str, recent_captures: list, db: Session) -> tuple[bool, str]:
     """
     Use AI to detect if the new capture represents a topic shift.
     
@@ -772,8 +1380,8 @@ def detect_topic_shift(new_text: str, recent_captures: list, db: Session) -> tup
 }}"""
 
         # Call Gemini for fast analysis
-        gemini_model = get_gemini_model()
-        response = gemini_model.generate_content(
+        response_text = llm_gateway.generate(
+            "topic_detection",
             prompt,
             generation_config={
                 "temperature": 0.3,
@@ -781,7 +1389,7 @@ def detect_topic_shift(new_text: str, recent_captures: list, db: Session) -> tup
             }
         )
         
-        result = json.loads(response.text)
+        result = json.loads(response_text)
         
         is_related = result.get("related", True)
         new_topic = result.get("new_topic", "")
@@ -803,21 +1411,48 @@ def detect_topic_shift(new_text: str, recent_captures: list, db: Session) -> tup
         return False, ""
 
 
-def get_or_create_active_session(db: Session, new_capture_text: str = None) -> tuple[DBSession, bool, str]:
+async def decide_topic_shift(db: AsyncSession, new_capture_text: str) -> tuple[int | None, bool, str]:
+    """
+    Run topic detection for a new capture against the latest active session.
+    
+    Called before capture_lock is taken, so a Gemini call (llm and hybrid
+    modes) does not hold up other captures; get_or_create_active_session
+    applies the decision under the lock if that session is still the
+    active one.
+    
+    Args:
+        db: Database session
+        new_capture_text: The text being captured
+    
+    Returns:
+        (session_id the decision was made against or None, topic_shifted, new_topic)
+    """
+    latest_session = await get_latest_active_session(db)
+    if latest_session is None:
+        decision = None, False, ""
+    else:
+        topic_shifted, new_topic = await detect_topic_shift_async(new_capture_text, latest_session.id, db)
+        decision = latest_session.id, topic_shifted, new_topic
+    return decision
+
+
+async def get_or_create_active_session(db: AsyncSession, new_capture_text: str = None,
+                                       decision: tuple[int | None, bool, str] = None) -> tuple[DBSession, bool, str]:
     """
     Get the current active session or create a new one based on topic detection.
     
     Args:
         db: Database session
         new_capture_text: The text being captured (for topic detection)
+        decision: Result of decide_topic_shift for the text; if the active
+            session has changed since, only the local rules are applied
+            (an uncertain score stays in the session)
     
     Returns:
         (session, topic_shifted, new_topic)
     """
     # Find the most recent active session
-    latest_session = db.query(DBSession).filter(
-        DBSession.status == "active"
-    ).order_by(DBSession.start_time.desc()).first()
+    latest_session = await get_latest_active_session(db)
     
     # If no active session exists, create one
     if not latest_session:
@@ -827,26 +1462,35 @@ def get_or_create_active_session(db: Session, new_capture_text: str = None) -> t
             core_goal="新学习会话"
         )
         db.add(new_session)
-        db.commit()
-        db.refresh(new_session)
+        await db.commit()
+        await db.refresh(new_session)
         print(f"[Focus Catcher] Created first session: {new_session.id}")
         return new_session, False, ""
     
     # If we have a new capture text, check for topic shift
     if new_capture_text:
-        # Get recent captures from the current session
-        recent_captures = db.query(Capture).filter(
-            Capture.session_id == latest_session.id
-        ).order_by(Capture.timestamp.desc()).limit(5).all()
-        
-        # Detect topic shift
-        topic_shifted, new_topic = detect_topic_shift(new_capture_text, recent_captures, db)
+        if decision is not None and decision[0] == latest_session.id:
+            _, topic_shifted, new_topic = decision
+        else:
+            # Another capture changed the active session meanwhile; no LLM call while holding capture_lock
+            topic = await db.run_sync(get_session_topic, latest_session.id)
+            verdict, new_topic = local_topic_decision(new_capture_text, topic)
+            topic_shifted = verdict == "shift"
         
         if topic_shifted:
             # Mark current session as completed
             latest_session.status = "completed"
             latest_session.end_time = datetime.utcnow()
-            db.commit()
+            
+            # Return to an earlier session if the capture matches its topic
+            matched_session = await db.run_sync(find_matching_session, new_capture_text, {latest_session.id})
+            if matched_session:
+                await db.commit()
+                await db.refresh(matched_session)
+                print(f"[Focus Catcher] 🔄 Topic shift! Back to session #{matched_session.id}: {matched_session.core_goal}")
+                return matched_session, True, matched_session.core_goal or new_topic
+            
+            await db.commit()
             
             # Create new session for the new topic
             new_session = DBSession(
@@ -855,8 +1499,8 @@ def get_or_create_active_session(db: Session, new_capture_text: str = None) -> t
                 core_goal=new_topic
             )
             db.add(new_session)
-            db.commit()
-            db.refresh(new_session)
+            await db.commit()
+            await db.refresh(new_session)
             
             print(f"[Focus Catcher] 🔄 Topic shift! Created new session #{new_session.id}: {new_topic}")
             return new_session, True, new_topic
@@ -865,98 +1509,700 @@ def get_or_create_active_session(db: Session, new_capture_text: str = None) -> t
     return latest_session, False, ""
 
 
+def find_matching_session(db: Session, text: str, exclude: set[int],
+                          pending: dict[int, dict[str, float]] = None) -> DBSession | None:
+    """
+    Find a recent session whose topic matches the text and reactivate it.
+    
+    Uses the in-memory nearest-session index, so the lookup does not scan
+    sessions or captures.
+    
+    Args:
+        db: Database session
+        text: The newly captured text
+        exclude: Session IDs that must not be returned (the one being left)
+        pending: Centroids changed in the current, uncommitted transaction;
+            the index only holds committed ones, so these are scored here
+    
+    Returns:
+        The matched session, now marked active, or None
+    """
+    vector = text_vector(text)
+    pending = {sid: centroid for sid, centroid in (pending or {}).items() if sid not in exclude}
+    session_id, score = session_index.nearest(vector, exclude=exclude | set(pending))
+    for candidate_id, centroid in pending.items():
+        candidate_score = cosine(vector, centroid)
+        if candidate_score > score:
+            session_id, score = candidate_id, candidate_score
+    if session_id is None or score < SESSION_ROUTING_THRESHOLD:
+        return None
+    
+    session = db.query(DBSession).filter(DBSession.id == session_id).first()
+    if session is None:
+        session_index.remove(session_id)
+        return None
+    
+    print(f"[Topic Detection] Nearest session #{session_id} (similarity {score:.3f})")
+    session.status = "active"
+    session.end_time = None
+    return session
+
+
+async def get_latest_active_session(db: AsyncSession) -> DBSession | None:
+    """Most recently started active session, or None."""
+    result = await db.execute(
+        select(DBSession).where(DBSession.status == "active").order_by(DBSession.start_time.desc()).limit(1)
+    )
+    return result.scalars().first()
+
+
+async def get_provisional_session(db: AsyncSession) -> DBSession:
+    """
+    Get the latest active session without running topic detection.
+    Used by deferred captures; the placement worker fixes the session later.
+    """
+    latest_session = await get_latest_active_session(db)
+    
+    if latest_session:
+        return latest_session
+    
+    session, _, _ = await get_or_create_active_session(db)
+    return session
+
+
+def place_capture(db: Session, capture_id: int):
+    """
+    Run topic detection for a deferred capture and move it to its final session.
+    
+    If a topic shift is confirmed, the provisional session is completed and the
+    capture, together with every later capture already queued into that session,
+    is moved into a newly created session.
+    
+    Args:
+        db: Database session
+        capture_id: ID of the capture with placement_status == "pending"
+    """
+    capture = db.query(Capture).filter(Capture.id == capture_id).first()
+    if not capture or capture.placement_status != "pending":
+        return
+    
+    session = db.query(DBSession).filter(DBSession.id == capture.session_id).first()
+    
+    # The provisional session may have been closed by a shift after this capture was stored
+    if session and session.status != "active" and session.end_time and capture.timestamp >= session.end_time:
+        active_session = db.query(DBSession).filter(
+            DBSession.status == "active"
+        ).order_by(DBSession.start_time.desc()).first()
+        if active_session:
+            record_captures(db, capture.session_id, -1)
+            record_captures(db, active_session.id, 1)
+            session = active_session
+            capture.session_id = session.id
+            db.flush()
+    
+    # Only captures that came before this one count as context
+    topic_shifted, new_topic = detect_topic_shift(
+        capture.selected_text, capture.session_id, db, before_capture_id=capture.id
+    )
+    final_session_id = capture.session_id
+    
+    if topic_shifted and session:
+        session.status = "completed"
+        session.end_time = capture.timestamp
+        
+        # Prefer an earlier session on the same topic over a new one
+        target_session = find_matching_session(db, capture.selected_text, exclude={session.id})
+        if target_session is None:
+            target_session = DBSession(
+                start_time=capture.timestamp,
+                status="active",
+                core_goal=new_topic
+            )
+            db.add(target_session)
+            db.flush()
+        
+        moved_query = db.query(Capture).filter(
+            Capture.session_id == session.id,
+            Capture.id >= capture.id
+        )
+        already_placed = moved_query.filter(Capture.placement_status == "placed").count()
+        moved = moved_query.update({Capture.session_id: target_session.id}, synchronize_session=False)
+        final_session_id = target_session.id
+        
+        if already_placed:
+            # Synchronous captures were interleaved; their vectors have to move too
+            rebuild_session_topic(db, session.id)
+            rebuild_session_topic(db, target_session.id)
+        else:
+            record_captures(db, session.id, -moved)
+            record_captures(db, target_session.id, moved)
+        
+        print(f"[Placement] 🔄 Topic shift! Moved {moved} capture(s) to session #{target_session.id}: {target_session.core_goal}")
+    
+    db.query(Capture).filter(Capture.id == capture_id).update(
+        {Capture.placement_status: "placed"}, synchronize_session=False
+    )
+    merge_capture_text(db, final_session_id, capture.selected_text)
+    db.commit()
+    print(f"[Placement] Capture #{capture_id} placed")
+
+
+placement_worker = CapturePlacementWorker(place_capture)
+
+# Captures are placed one at a time, so two concurrent captures cannot both
+# open a new session for the same topic shift (other endpoints are not blocked);
+# topic detection runs before the lock is taken
+capture_lock = asyncio.Lock()
+
+
+def segment_capture_batch(db: Session, texts: list[str], timestamps: list[datetime]) -> list[DBSession]:
+    """
+    Assign every capture of a batch to a session in a single pass.
+    
+    Walks the captures in order, keeping the current session's centroid in
+    memory, and applies the local similarity rules of detect_topic_shift to
+    each one. Uncertain scores stay in the current session instead of asking
+    the LLM, so large imports never wait on per-capture LLM calls.
+    
+    Args:
+        db: Database session
+        texts: Capture texts in capture order
+        timestamps: Capture times, parallel to texts
+    
+    Returns:
+        The session of each capture; new sessions are flushed (they have IDs)
+    """
+    def topic_state(session):
+        topic = get_session_topic(db, session.id)
+        if topic is None:
+            return Counter(), 0
+        return Counter(json.loads(topic.vector_sum or "{}")), topic.vector_count or 0
+    
+    def open_session(start_time, core_goal):
+        session = DBSession(start_time=start_time, status="active", core_goal=core_goal)
+        db.add(session)
+        db.flush()
+        return session
+    
+    current = db.query(DBSession).filter(
+        DBSession.status == "active"
+    ).order_by(DBSession.start_time.desc()).first()
+    vector_sum, vector_count = topic_state(current) if current else (Counter(), 0)
+    
+    # Centroids of sessions left during this batch (not stored until commit)
+    left_states = {}
+    assignments = []
+    for text, timestamp in zip(texts, timestamps):
+        vector = text_vector(text)
+        
+        if current is None:
+            current = open_session(timestamp, "新学习会话")
+        elif vector_count >= TOPIC_MIN_CAPTURES and classify_vector(vector, vector_sum)[1] == "shift":
+            current.status = "completed"
+            current.end_time = timestamp
+            # Let later captures of this batch route back to the session we leave
+            after_commit(db, lambda sid=current.id, centroid=dict(vector_sum): session_index.update(sid, centroid))
+            left_states[current.id] = (vector_sum, vector_count)
+            
+            pending = {session_id: dict(state[0]) for session_id, state in left_states.items()}
+            matched = find_matching_session(db, text, exclude={current.id}, pending=pending)
+            if matched is not None:
+                current = matched
+                vector_sum, vector_count = left_states.pop(current.id, None) or topic_state(current)
+            else:
+                current = open_session(timestamp, topic_label(text))
+                vector_sum, vector_count = Counter(), 0
+        
+        assignments.append(current)
+        vector_sum.update(vector)
+        vector_count += 1
+    
+    return assignments
+
+
+def find_duplicate(db: Session, new: Candidate) -> tuple[Candidate, str] | None:
+    """
+    Look up a duplicate of a new capture in the active session (read only).
+    
+    Returns:
+        (the existing capture's candidate, kind of duplicate), or None
+    """
+    session = db.query(DBSession).filter(
+        DBSession.status == "active"
+    ).order_by(DBSession.start_time.desc()).first()
+    if session is None:
+        return None
+    return DuplicateFinder(db).find(session.id, new)
+
+
+def merge_into_duplicate(db: Session, new: Candidate) -> tuple[Capture, str] | None:
+    """
+    Merge a new capture into a duplicate in the active session, if there is one.
+    
+    Returns:
+        (the existing capture, kind of duplicate), or None if the capture is new
+    """
+    match = find_duplicate(db, new)
+    if match is None:
+        return None
+    
+    existing, kind = match
+    old_text = merge_duplicate(db, existing, new, kind)
+    capture = db.query(Capture).filter(Capture.id == existing.capture_id).first()
+    if old_text is not None:
+        update_for_replaced_text(db, capture.session_id, capture.id, old_text, existing.text)
+    return capture, kind
+
+
+def update_for_replaced_text(db: Session, session_id: int, capture_id: int, old_text: str, new_text: str):
+    """
+    Keep what was derived from a capture's text in step after a merge replaced it.
+    
+    The topic summary swaps the old text for the new one (a pending capture
+    is not in it yet), and a stored analysis that already covered the
+    capture is dropped, so the session shows as stale and the next analysis
+    starts over.
+    """
+    placement_status = db.query(Capture.placement_status).filter(Capture.id == capture_id).scalar()
+    if placement_status != "pending":
+        replace_capture_text(db, session_id, old_text, new_text)
+    db.query(DBSession).filter(
+        DBSession.id == session_id,
+        DBSession.analyzed_through_capture_id >= capture_id
+    ).update({
+        DBSession.analysis: None,
+        DBSession.analyzed_capture_count: 0,
+        DBSession.analyzed_through_capture_id: 0
+    }, synchronize_session=False)
+
+
+def get_analysis_state(session: DBSession) -> tuple[bool, bool]:
+    """
+    Whether a session's analysis is out of date, and whether analyzing it now is recommended.
+    
+    Returns:
+        (analysis_stale, analysis_recommended)
+    """
+    capture_count = session.capture_count or 0
+    stale = session.analyzed_at is None or capture_count > (session.analyzed_capture_count or 0)
+    return stale, stale and capture_count >= ANALYSIS_THRESHOLD
+
+
+async def build_duplicate_response(db: AsyncSession, capture: Capture, kind: str) -> CaptureResponse:
+    """Response for a capture that was merged into an existing one."""
+    await db.refresh(capture)
+    session = await db.get(DBSession, capture.session_id)
+    analysis_stale, analysis_recommended = get_analysis_state(session)
+    
+    print(f"[Focus Catcher] ♻️ {kind} duplicate of capture #{capture.id} (hit {capture.hit_count})")
+    
+    return CaptureResponse(
+        success=True,
+        capture_id=capture.id,
+        session_id=session.id,
+        message=f"♻️ 重复捕捉，已合并到捕捉 #{capture.id}（第 {capture.hit_count} 次）",
+        placement=capture.placement_status or "placed",
+        capture_count=session.capture_count or 0,
+        analysis_stale=analysis_stale,
+        analysis_recommended=analysis_recommended,
+        duplicate=kind,
+        hit_count=capture.hit_count
+    )
+
+
 @app.post("/api/focus/capture", response_model=CaptureResponse)
-async def capture_focus(request: CaptureRequest, db: Session = Depends(get_db)):
+async def capture_focus(request: CaptureRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Capture a learning focus point with intelligent topic detection.
     This endpoint uses AI to detect topic shifts and automatically create new sessions.
     
     Args:
-        request: CaptureRequest containing selected_text, page_url, page_title
+        request: CaptureRequest containing selected_text, page_url, page_title
+        db: Database session
+    
+    Returns:
+        CaptureResponse with success status, IDs, and topic shift information
+    """
+    try:
+        start_time = datetime.utcnow()
+        
+        signature = Candidate.from_text(request.selected_text, request.page_url)
+        
+        # Topic detection may call the LLM, so it runs before taking the lock
+        # (a likely duplicate skips it; the lock re-checks both)
+        decision = None
+        if not request.deferred and not (CAPTURE_DEDUP and await db.run_sync(find_duplicate, signature)):
+            decision = await decide_topic_shift(db, request.selected_text)
+        # End the read transaction; the writes run in a fresh one under the lock
+        await db.commit()
+        
+        async with capture_lock:
+            # A repeat of a stored capture is only counted, before any topic detection
+            duplicate = await db.run_sync(merge_into_duplicate, signature) if CAPTURE_DEDUP else None
+            if duplicate is not None:
+                await db.commit()
+                return await build_duplicate_response(db, *duplicate)
+            
+            if request.deferred:
+                # Store now, let the placement worker decide the final session
+                session = await get_provisional_session(db)
+                topic_shifted, new_topic = False, ""
+            else:
+                # Get or create active session with topic detection
+                session, topic_shifted, new_topic = await get_or_create_active_session(
+                    db, request.selected_text, decision
+                )
+            
+            # A shift into a session that already has captures returns to an earlier topic
+            returned_to_session = topic_shifted and (session.capture_count or 0) > 0
+            
+            # Create capture record
+            capture = Capture(
+                session_id=session.id,
+                selected_text=request.selected_text,
+                page_url=request.page_url,
+                page_title=request.page_title,
+                timestamp=datetime.utcnow(),
+                placement_status="pending" if request.deferred else "placed",
+                content_hash=signature.content_hash,
+                simhash=signature.simhash,
+                hit_count=1
+            )
+            
+            db.add(capture)
+            
+            # Update the session's counter and topic summary in the same transaction
+            await db.run_sync(record_captures, session.id)
+            if not request.deferred:
+                await db.run_sync(merge_capture_text, session.id, request.selected_text)
+            
+            await db.commit()
+        
+        if request.deferred:
+            placement_worker.submit(capture.id)
+        
+        await db.refresh(session)
+        capture_count = session.capture_count
+        analysis_stale, analysis_recommended = get_analysis_state(session)
+        
+        # Calculate response time
+        response_time = (datetime.utcnow() - start_time).total_seconds() * 1000
+        
+        # Build response message
+        if returned_to_session:
+            message = f"🔄 回到之前的主题：{new_topic}，已捕捉到会话 #{session.id}"
+        elif topic_shifted:
+            message = f"🔄 检测到新主题：{new_topic}，已创建新会话 #{session.id}"
+        elif request.deferred:
+            message = f"✅ 已捕捉到会话 #{session.id}（主题归类中）"
+        else:
+            message = f"✅ 已捕捉到会话 #{session.id}"
+        
+        print(f"[Focus Catcher] Captured focus point #{capture.id} in session #{session.id}")
+        print(f"[Focus Catcher] Response time: {response_time:.2f}ms")
+        print(f"[Focus Catcher] Text preview: {request.selected_text[:100]}...")
+        
+        # Check if we should trigger batch analysis (5-10 captures)
+        if analysis_recommended:
+            print(f"[Focus Catcher] 🎯 Session has {capture_count} captures - ready for AI analysis")
+        
+        return CaptureResponse(
+            success=True,
+            capture_id=capture.id,
+            session_id=session.id,
+            message=message,
+            placement=capture.placement_status,
+            capture_count=capture_count,
+            analysis_stale=analysis_stale,
+            analysis_recommended=analysis_recommended
+        )
+        
+    except Exception as e:
+        print(f"[Focus Catcher] Error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to capture: {str(e)}"
+        )
+
+
+@app.post("/api/focus/captures:batch", response_model=CaptureBatchResponse)
+def capture_focus_batch(request: CaptureBatchRequest, db: Session = Depends(get_db)):
+    """
+    Store an ordered batch of captures in one transaction.
+    
+    Used by the extension to flush its offline queue and for bulk imports.
+    Topic segmentation runs over the whole batch in one pass (see
+    segment_capture_batch), the rows are inserted with a single executemany,
+    and counters and topic summaries are updated once per session.
+    
+    Args:
+        request: CaptureBatchRequest with captures in capture order
         db: Database session
     
     Returns:
-        CaptureResponse with success status, IDs, and topic shift information
+        CaptureBatchResponse with one result per capture and the state of every touched session
     """
+    if len(request.captures) > CAPTURE_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(request.captures)} captures (max {CAPTURE_BATCH_MAX_SIZE})"
+        )
+    
     try:
         start_time = datetime.utcnow()
-        
-        # Get or create active session with topic detection
-        session, topic_shifted, new_topic = get_or_create_active_session(db, request.selected_text)
-        
-        # Create capture record
-        capture = Capture(
-            session_id=session.id,
-            selected_text=request.selected_text,
-            page_url=request.page_url,
-            page_title=request.page_title,
-            timestamp=datetime.utcnow()
+        results = [None] * len(request.captures)
+        
+        # Captures whose idempotency key is already stored (on a capture, or
+        # for an item merged into one) are not inserted again
+        keys = {item.idempotency_key for item in request.captures if item.idempotency_key}
+        stored = {}
+        if keys:
+            rows = db.query(Capture.idempotency_key, Capture.id, Capture.session_id).filter(
+                Capture.idempotency_key.in_(keys)
+            ).all()
+            rows += db.query(CaptureKey.idempotency_key, Capture.id, Capture.session_id).join(
+                Capture, Capture.id == CaptureKey.capture_id
+            ).filter(CaptureKey.idempotency_key.in_(keys)).all()
+            stored = {key: (capture_id, session_id) for key, capture_id, session_id in rows}
+        
+        new_items = []
+        repeated = []  # (index, key) repeating a key earlier in this batch
+        batch_keys = set()
+        for index, item in enumerate(request.captures):
+            key = item.idempotency_key
+            if key in stored:
+                capture_id, session_id = stored[key]
+                results[index] = BatchCaptureResult(index=index, capture_id=capture_id, session_id=session_id, status="duplicate")
+            elif key and key in batch_keys:
+                repeated.append((index, key))
+            else:
+                if key:
+                    batch_keys.add(key)
+                timestamp = item.timestamp or start_time
+                if timestamp.tzinfo:
+                    timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+                new_items.append((index, item, timestamp))
+        
+        # Repeats of a capture in the active session or of an earlier capture in
+        # this batch are merged into it before segmentation, so they neither
+        # count towards a topic shift nor get stored twice
+        active = db.query(DBSession).filter(
+            DBSession.status == "active"
+        ).order_by(DBSession.start_time.desc()).first()
+        active_id = active.id if active else None   # None: only the batch itself is checked
+        finder = DuplicateFinder(db) if CAPTURE_DEDUP else None
+        kept = []    # (index, item, timestamp, signature)
+        merged = []  # (index, item, signature of the capture it was merged into)
+        for index, item, timestamp in new_items:
+            signature = Candidate.from_text(item.selected_text, item.page_url)
+            match = finder.find(active_id, signature) if finder else None
+            if match is not None:
+                existing, kind = match
+                old_text = merge_duplicate(db, existing, signature, kind)
+                if old_text is not None:
+                    update_for_replaced_text(db, active_id, existing.capture_id, old_text, existing.text)
+                merged.append((index, item, existing))
+                continue
+            if finder:
+                finder.add(active_id, signature)
+            kept.append((index, item, timestamp, signature))
+        
+        sessions = segment_capture_batch(
+            db,
+            [signature.text for _, _, _, signature in kept],
+            [timestamp for _, _, timestamp, _ in kept]
         )
+        kept = [(*entry, session) for entry, session in zip(kept, sessions)]
         
-        db.add(capture)
-        db.commit()
-        db.refresh(capture)
+        # A merged item belongs to the session of the capture it was merged into
+        session_of = {id(signature): session.id for _, _, _, signature, session in kept}
+        merged = [
+            (index, item, existing, active_id if existing.capture_id is not None else session_of[id(existing)])
+            for index, item, existing in merged
+        ]
         
-        # Update session capture count
-        capture_count = db.query(Capture).filter(
-            Capture.session_id == session.id
-        ).count()
+        created_ids = []
+        if kept:
+            created_ids = db.scalars(
+                insert(Capture).returning(Capture.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "session_id": session.id,
+                        "selected_text": signature.text,
+                        "page_url": item.page_url,
+                        "page_title": item.page_title,
+                        "timestamp": timestamp,
+                        "placement_status": "placed",
+                        "idempotency_key": item.idempotency_key,
+                        "content_hash": signature.content_hash,
+                        "simhash": signature.simhash,
+                        "hit_count": 1 + signature.extra_hits
+                    }
+                    for _, item, timestamp, signature, session in kept
+                ]
+            ).all()
+        for (_, _, _, signature, _), capture_id in zip(kept, created_ids):
+            signature.capture_id = capture_id
+        
+        # Merged items have no row of their own; their keys point at the capture
+        # they were merged into, so a retry is answered as a duplicate
+        merged_keys = [
+            {"idempotency_key": item.idempotency_key, "capture_id": existing.capture_id}
+            for _, item, existing, _ in merged if item.idempotency_key
+        ]
+        if merged_keys:
+            db.execute(insert(CaptureKey), merged_keys)
         
-        # Calculate response time
-        response_time = (datetime.utcnow() - start_time).total_seconds() * 1000
+        # One counter update and one summary merge per session
+        texts_by_session = {}
+        for _, _, _, signature, session in kept:
+            texts_by_session.setdefault(session.id, []).append(signature.text)
+        for session_id, texts in texts_by_session.items():
+            record_captures(db, session_id, len(texts))
+            merge_capture_texts(db, session_id, texts)
         
-        # Build response message
-        if topic_shifted:
-            message = f"🔄 检测到新主题：{new_topic}，已创建新会话 #{session.id}"
-        else:
-            message = f"✅ 已捕捉到会话 #{session.id}"
+        db.commit()
         
-        print(f"[Focus Catcher] Captured focus point #{capture.id} in session #{session.id}")
-        print(f"[Focus Catcher] Response time: {response_time:.2f}ms")
-        print(f"[Focus Catcher] Text preview: {request.selected_text[:100]}...")
+        created_by_key = {}
+        for index, item, _, signature, session in kept:
+            results[index] = BatchCaptureResult(index=index, capture_id=signature.capture_id, session_id=session.id, status="created")
+            if item.idempotency_key:
+                created_by_key[item.idempotency_key] = results[index]
+        for index, item, existing, session_id in merged:
+            results[index] = BatchCaptureResult(index=index, capture_id=existing.capture_id, session_id=session_id, status="merged")
+            if item.idempotency_key:
+                created_by_key[item.idempotency_key] = results[index]
+        for index, key in repeated:
+            original = created_by_key[key]
+            results[index] = BatchCaptureResult(index=index, capture_id=original.capture_id, session_id=original.session_id, status="duplicate")
+        
+        session_states = []
+        for session_id in texts_by_session:
+            session = db.query(DBSession).filter(DBSession.id == session_id).first()
+            analysis_stale, analysis_recommended = get_analysis_state(session)
+            session_states.append(SessionStatusResponse(
+                session_id=session.id,
+                status=session.status,
+                capture_count=session.capture_count or 0,
+                last_analyzed_at=session.analyzed_at,
+                analysis_stale=analysis_stale,
+                analysis_recommended=analysis_recommended
+            ))
         
-        # Check if we should trigger batch analysis (5-10 captures)
-        if capture_count >= 5:
-            print(f"[Focus Catcher] 🎯 Session has {capture_count} captures - ready for AI analysis")
+        response_time = (datetime.utcnow() - start_time).total_seconds() * 1000
+        duplicates = len(request.captures) - len(created_ids) - len(merged)
+        print(f"[Focus Catcher] Batch: {len(created_ids)} created, {duplicates} duplicate(s), {len(merged)} merged, "
+              f"{len(texts_by_session)} session(s), {response_time:.2f}ms")
         
-        return CaptureResponse(
+        return CaptureBatchResponse(
             success=True,
-            capture_id=capture.id,
-            session_id=session.id,
-            message=message
+            created=len(created_ids),
+            duplicates=duplicates,
+            merged=len(merged),
+            results=results,
+            sessions=session_states
         )
         
+    except IntegrityError:
+        # Another request stored one of the idempotency keys first; retrying is safe
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Concurrent upload of the same captures, please retry")
     except Exception as e:
-        print(f"[Focus Catcher] Error: {str(e)}")
+        db.rollback()
+        print(f"[Focus Catcher] Batch capture error: {str(e)}")
         import traceback
         traceback.print_exc()
         raise HTTPException(
             status_code=500,
-            detail=f"Failed to capture: {str(e)}"
+            detail=f"Failed to capture batch: {str(e)}"
         )
 
 
+def encode_session_cursor(session: DBSession) -> str:
+    """Build an opaque keyset cursor from the last session of a page."""
+    return f"{session.start_time.isoformat()}|{session.id}"
+
+
+def encode_capture_cursor(timestamp: datetime, capture_id: int) -> str:
+    """Build an opaque keyset cursor from the last capture of a page."""
+    return f"{timestamp.isoformat()}|{capture_id}"
+
+
+def decode_keyset_cursor(cursor: str) -> tuple[datetime, int]:
+    """Parse a cursor produced by encode_session_cursor or encode_capture_cursor."""
+    try:
+        start_time, row_id = cursor.rsplit("|", 1)
+        return datetime.fromisoformat(start_time), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+
+
 @app.get("/api/focus/sessions")
-async def get_sessions(db: Session = Depends(get_db)):
+async def get_sessions(
+    limit: int = 50,
+    cursor: str | None = None,
+    status: str | None = None,
+    since: datetime | None = None,
+    db: AsyncSession = Depends(get_async_db)
+):
     """
-    Get all learning sessions with capture counts.
+    Get learning sessions with capture counts, newest first.
+    
+    Args:
+        limit: Page size (1-200)
+        cursor: next_cursor from the previous page
+        status: Only sessions with this status (active, completed, ...)
+        since: Only sessions started at or after this time
+        db: Database session
+    
+    Returns:
+        A page of sessions and the cursor for the next page (None on the last page)
     """
     try:
-        sessions = db.query(DBSession).order_by(DBSession.start_time.desc()).all()
+        limit = max(1, min(limit, 200))
+        
+        query = select(DBSession)
+        if status:
+            query = query.where(DBSession.status == status)
+        if since:
+            if since.tzinfo:
+                since = since.astimezone(timezone.utc).replace(tzinfo=None)
+            query = query.where(DBSession.start_time >= since)
+        if cursor:
+            cursor_time, cursor_id = decode_keyset_cursor(cursor)
+            query = query.where(or_(
+                DBSession.start_time < cursor_time,
+                and_(DBSession.start_time == cursor_time, DBSession.id < cursor_id)
+            ))
+        
+        # Fetch one extra row to know whether another page exists
+        result = await db.execute(query.order_by(
+            DBSession.start_time.desc(), DBSession.id.desc()
+        ).limit(limit + 1))
+        sessions = result.scalars().all()
+        
+        has_more = len(sessions) > limit
+        sessions = sessions[:limit]
         
         result = []
         for session in sessions:
-            capture_count = db.query(Capture).filter(Capture.session_id == session.id).count()
             result.append({
                 "id": session.id,
                 "start_time": session.start_time.isoformat(),
                 "end_time": session.end_time.isoformat() if session.end_time else None,
                 "status": session.status,
-                "capture_count": capture_count
+                "capture_count": session.capture_count or 0
             })
         
-        return {"sessions": result}
+        return {
+            "sessions": result,
+            "next_cursor": encode_session_cursor(sessions[-1]) if has_more else None
+        }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -964,30 +2210,137 @@ async def get_sessions(db: Session = Depends(get_db)):
         )
 
 
+@app.get("/api/focus/sessions/{session_id}/status", response_model=SessionStatusResponse)
+async def get_session_status(session_id: int, db: AsyncSession = Depends(get_async_db)):
+    """
+    Get a single session's capture count and analysis state.
+    Lets clients decide on auto-analysis without downloading the session list.
+    """
+    session = await get_session_or_404(db, session_id)
+    
+    analysis_stale, analysis_recommended = get_analysis_state(session)
+    
+    return SessionStatusResponse(
+        session_id=session.id,
+        status=session.status,
+        capture_count=session.capture_count or 0,
+        last_analyzed_at=session.analyzed_at,
+        analysis_stale=analysis_stale,
+        analysis_recommended=analysis_recommended
+    )
+
+
+def parse_capture_fields(fields: str | None) -> list[str]:
+    """Validate a comma-separated fields= projection (default: CAPTURE_DEFAULT_FIELDS)."""
+    if not fields:
+        return CAPTURE_DEFAULT_FIELDS
+    selected = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in selected if name not in CAPTURE_FIELDS]
+    if unknown or not selected:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown capture field(s): {', '.join(unknown) or fields}. Available: {', '.join(CAPTURE_FIELDS)}"
+        )
+    return selected
+
+
+def capture_row_to_dict(row, fields: list[str]) -> dict:
+    """Serialize a projected capture row (no ORM object involved)."""
+    values = row._mapping
+    item = {}
+    for name in fields:
+        value = values[name]
+        item[name] = value.isoformat() if isinstance(value, datetime) else value
+    return item
+
+
+async def stream_capture_rows(query, fields: list[str]):
+    """
+    Yield captures as NDJSON lines from a server-side cursor.
+    
+    Uses its own database session: the request's session is closed before a
+    streaming response body is sent.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=CAPTURE_STREAM_BATCH))
+        async for rows in result.partitions():
+            yield "".join(json.dumps(capture_row_to_dict(row, fields), ensure_ascii=False) + "\n" for row in rows)
+
+
 @app.get("/api/focus/captures/{session_id}")
-async def get_captures(session_id: int, db: Session = Depends(get_db)):
+async def get_captures(
+    session_id: int,
+    limit: int = 100,
+    cursor: str | None = None,
+    order: str = "asc",
+    fields: str | None = None,
+    format: str = "json",
+    db: AsyncSession = Depends(get_async_db)
+):
     """
-    Get all captures for a specific session.
+    Get the captures of a session, ordered by (timestamp, id).
+    
+    Args:
+        session_id: The session ID
+        limit: Page size (1-1000); for format=ndjson 0 streams every remaining capture
+        cursor: next_cursor from the previous page
+        order: "asc" (oldest first) or "desc" (newest first)
+        fields: Comma-separated columns to return, e.g. "id,timestamp,page_title"
+        format: "json" for one page, "ndjson" to stream one capture per line
+        db: Database session
+    
+    Returns:
+        A page of captures and the cursor for the next page (None on the last page),
+        or an NDJSON stream
     """
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail=f"Invalid order: {order}")
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail=f"Invalid format: {format}")
+    
+    selected = parse_capture_fields(fields)
+    
+    # id and timestamp are always read because the cursor is built from them
+    columns = [CAPTURE_FIELDS[name] for name in dict.fromkeys(["id", "timestamp", *selected])]
+    query = select(*columns).where(Capture.session_id == session_id)
+    
+    if cursor:
+        cursor_time, cursor_id = decode_keyset_cursor(cursor)
+        if order == "asc":
+            query = query.where(or_(
+                Capture.timestamp > cursor_time,
+                and_(Capture.timestamp == cursor_time, Capture.id > cursor_id)
+            ))
+        else:
+            query = query.where(or_(
+                Capture.timestamp < cursor_time,
+                and_(Capture.timestamp == cursor_time, Capture.id < cursor_id)
+            ))
+    
+    if order == "asc":
+        query = query.order_by(Capture.timestamp.asc(), Capture.id.asc())
+    else:
+        query = query.order_by(Capture.timestamp.desc(), Capture.id.desc())
+    
+    if format == "ndjson":
+        if limit > 0:
+            query = query.limit(limit)
+        return StreamingResponse(stream_capture_rows(query, selected), media_type="application/x-ndjson")
+    
     try:
-        captures = db.query(Capture).filter(
-            Capture.session_id == session_id
-        ).order_by(Capture.timestamp.asc()).all()
+        limit = max(1, min(limit, 1000))
         
-        result = []
-        for capture in captures:
-            result.append({
-                "id": capture.id,
-                "selected_text": capture.selected_text,
-                "page_url": capture.page_url,
-                "page_title": capture.page_title,
-                "timestamp": capture.timestamp.isoformat(),
-                "focus_point": capture.focus_point,
-                "content_type": capture.content_type,
-                "suggested_action": capture.suggested_action
-            })
+        # Fetch one extra row to know whether another page exists
+        result = await db.execute(query.limit(limit + 1))
+        rows = result.all()
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
         
-        return {"captures": result}
+        return {
+            "captures": [capture_row_to_dict(row, selected) for row in rows],
+            "next_cursor": encode_capture_cursor(rows[-1].timestamp, rows[-1].id) if has_more else None
+        }
         
     except Exception as e:
         raise HTTPException(
@@ -996,8 +2349,173 @@ async def get_captures(session_id: int, db: Session = Depends(get_db)):
         )
 
 
+@app.get("/api/focus/search")
+async def search_captures(
+    q: str,
+    limit: int = 20,
+    offset: int = 0,
+    session_id: int | None = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Full-text search over capture text and page titles, best matches first.
+    
+    Args:
+        q: Search terms separated by spaces; every term must match
+        limit: Page size (1-100)
+        offset: next_offset from the previous page
+        session_id: Only search this session
+        db: Database session
+    
+    Returns:
+        Ranked results with highlighted snippets and the offset of the next page
+        (None on the last page)
+    """
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Query must not be empty")
+    
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    offset = max(0, offset)
+    
+    try:
+        start_time = datetime.utcnow()
+        sql, params, mode = build_search_query(q, session_id, limit, offset)
+        result = await db.execute(text(sql).columns(timestamp=DateTime), params)
+        rows = result.mappings().all()
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        indexed, short = split_terms(q)
+        results = []
+        for row in rows:
+            results.append({
+                "capture_id": row["id"],
+                "session_id": row["session_id"],
+                "snippet": row["snippet"] if mode == "fts" else make_snippet(row["selected_text"], indexed + short),
+                "page_url": row["page_url"],
+                "page_title": row["page_title"],
+                "timestamp": row["timestamp"].isoformat() if row["timestamp"] else None,
+                # bm25() is lower for better matches; flip it so higher is better
+                "score": round(-row["score"], 6) if row["score"] is not None else None
+            })
+        
+        return {
+            "query": q,
+            "mode": mode,
+            "results": results,
+            "next_offset": offset + limit if has_more else None,
+            "took_ms": round((datetime.utcnow() - start_time).total_seconds() * 1000, 2)
+        }
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to search captures: {str(e)}"
+        )
+
+
+@app.get("/api/focus/export")
+async def export_data(gzip: bool = False):
+    """
+    Stream every session and capture as NDJSON.
+    
+    The first line is a header, the last a footer with row counts and
+    throughput; rows are read in batches, so memory does not grow with
+    the database. The output can be uploaded to /api/focus/import.
+    
+    Args:
+        gzip: Compress the stream with gzip
+    
+    Returns:
+        StreamingResponse with the NDJSON (or gzipped NDJSON) export
+    """
+    filename = f"focus-catcher-{datetime.utcnow():%Y%m%d-%H%M%S}.ndjson" + (".gz" if gzip else "")
+    return StreamingResponse(
+        export_lines(compress=gzip),
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+def backfill_imported_topics():
+    """Build topic summaries and capture counts for imported sessions."""
+    db = SessionLocal()
+    try:
+        backfilled = backfill_session_topics(db)
+        print(f"[Import] Built topic summaries for {backfilled} session(s)")
+    finally:
+        db.close()
+
+
+@app.post("/api/focus/import")
+async def import_data(request: Request, background_tasks: BackgroundTasks):
+    """
+    Import an export from /api/focus/export sent as the raw request body.
+    
+    The body is read as it arrives (plain or gzipped NDJSON) and written in
+    large transactions. Imported sessions get new IDs; captures whose
+    idempotency key already exists are skipped. Topic summaries of the new
+    sessions are built in the background after the response.
+    
+    Args:
+        request: The upload, streamed from the request body
+        background_tasks: Runs the topic summary backfill
+    
+    Returns:
+        Imported and skipped row counts and throughput
+    """
+    try:
+        stats = await import_lines(request.stream())
+    except ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid export: {str(e)}")
+    except Exception as e:
+        print(f"[Focus Catcher] Error importing data: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to import data: {str(e)}"
+        )
+    
+    session_ids = stats.pop("session_ids")
+    if session_ids:
+        background_tasks.add_task(backfill_imported_topics)
+    
+    return {"success": True, **stats}
+
+
+@app.get("/api/focus/captures/{capture_id}/placement")
+async def get_capture_placement(capture_id: int, wait: float = 0, db: AsyncSession = Depends(get_async_db)):
+    """
+    Get the final session placement of a capture.
+    
+    Args:
+        capture_id: The capture ID returned by /api/focus/capture
+        wait: Seconds to long-poll for a pending placement (max 30)
+        db: Database session
+    
+    Returns:
+        Placement status and the session the capture currently belongs to
+    """
+    if wait > 0:
+        await placement_worker.wait_async(capture_id, min(wait, 30))
+    
+    capture = await db.get(Capture, capture_id)
+    if not capture:
+        raise HTTPException(status_code=404, detail=f"Capture {capture_id} not found")
+    
+    session = await db.get(DBSession, capture.session_id)
+    
+    return {
+        "capture_id": capture.id,
+        "session_id": capture.session_id,
+        "status": capture.placement_status or "placed",
+        "session_status": session.status if session else None,
+        "topic": session.core_goal if session else None
+    }
+
+
 @app.delete("/api/focus/sessions/{session_id}")
-async def delete_session(session_id: int, db: Session = Depends(get_db)):
+async def delete_session(session_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Delete a learning session and all its captures.
     
@@ -1010,19 +2528,22 @@ async def delete_session(session_id: int, db: Session = Depends(get_db)):
     """
     try:
         # Check if session exists
-        session = db.query(DBSession).filter(DBSession.id == session_id).first()
-        if not session:
-            raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+        session = await get_session_or_404(db, session_id)
         
-        # Get capture count before deletion
-        capture_count = db.query(Capture).filter(Capture.session_id == session_id).count()
+        capture_count = session.capture_count or 0
         
-        # Delete all captures for this session
-        db.query(Capture).filter(Capture.session_id == session_id).delete()
+        # Delete all captures for this session (and the keys of items merged into them)
+        await db.execute(delete(CaptureKey).where(
+            CaptureKey.capture_id.in_(select(Capture.id).where(Capture.session_id == session_id))
+        ))
+        await db.execute(delete(Capture).where(Capture.session_id == session_id))
+        await db.execute(delete(SessionTopic).where(SessionTopic.session_id == session_id))
+        await db.execute(delete(AnalysisJob).where(AnalysisJob.session_id == session_id))
         
         # Delete the session
-        db.delete(session)
-        db.commit()
+        await db.delete(session)
+        await db.commit()
+        session_index.remove(session_id)
         
         print(f"[Focus Catcher] 🗑️ Deleted session #{session_id} with {capture_count} captures")
         
@@ -1034,7 +2555,7 @@ async def delete_session(session_id: int, db: Session = Depends(get_db)):
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"[Focus Catcher] Error deleting session: {str(e)}")
         raise HTTPException(
             status_code=500,
@@ -1042,15 +2563,49 @@ async def delete_session(session_id: int, db: Session = Depends(get_db)):
         )
 
 
-@app.post("/api/focus/analyze/{session_id}")
-def analyze_session(session_id: int, db: Session = Depends(get_db)):
+# Fields of the structured session analysis returned by the LLM
+ANALYSIS_FIELDS = {
+    "core_goal": "",
+    "main_thread": [],
+    "branches": [],
+    "understood": [],
+    "unclear": [],
+    "action_guide": [],
+    "learning_pattern": ""
+}
+
+
+def build_analysis_response(session_id: int, analysis: dict, learning_guide: str, capture_count: int, mode: str) -> dict:
+    """
+    Build the analyze endpoint's response body.
+    
+    Args:
+        mode: "full", "incremental" (merged new captures into the stored
+              analysis) or "stored" (session unchanged, no LLM call)
+    """
+    return {
+        "success": True,
+        "session_id": session_id,
+        "analysis": {field: analysis.get(field, default) for field, default in ANALYSIS_FIELDS.items()},
+        "learning_guide": learning_guide,
+        "capture_count": capture_count,
+        "mode": mode
+    }
+
+
+def run_session_analysis(db: Session, session_id: int) -> dict:
     """
     Analyze a learning session using AI.
     Generate insights about learning goals, main threads, branches, and action guide.
+    Runs on an analysis worker thread; see analysis_queue.
+    
+    The structured analysis is stored with the highest capture ID it covers.
+    Later runs only send the stored analysis plus the newer captures to the
+    LLM, and a session without new captures is answered from storage.
     
     Args:
-        session_id: The session ID to analyze
         db: Database session
+        session_id: The session ID to analyze
     
     Returns:
         Analysis results including core goal, main thread, branches, and action guide
@@ -1069,9 +2624,25 @@ def analyze_session(session_id: int, db: Session = Depends(get_db)):
         if len(captures) == 0:
             raise HTTPException(status_code=400, detail="Session has no captures to analyze")
         
+        # Captures up to the high-water mark are already covered by the stored analysis
+        previous_analysis = json.loads(session.analysis) if session.analysis else None
+        high_water_mark = session.analyzed_through_capture_id or 0
+        new_captures = [c for c in captures if c.id > high_water_mark]
+        if previous_analysis is not None and len(captures) - len(new_captures) != (session.analyzed_capture_count or 0):
+            # Captures were moved out of the session since then; start over
+            previous_analysis = None
+        if previous_analysis is None:
+            new_captures = captures
+        
+        if previous_analysis is not None and not new_captures:
+            print(f"[Focus Catcher] ♻️ Session #{session_id} unchanged since last analysis, returning stored result")
+            return build_analysis_response(session_id, previous_analysis, session.action_guide, len(captures), "stored")
+        
+        mode = "incremental" if previous_analysis is not None else "full"
+        
         print(f"\n{'='*60}")
-        print(f"[Focus Catcher] 🤖 Starting AI analysis for session #{session_id}")
-        print(f"[Focus Catcher] Captures to analyze: {len(captures)}")
+        print(f"[Focus Catcher] 🤖 Starting AI analysis for session #{session_id} ({mode})")
+        print(f"[Focus Catcher] Captures to analyze: {len(new_captures)} of {len(captures)}")
         print(f"{'='*60}\n")
         
         # Format captures for analysis
@@ -1085,16 +2656,6 @@ def analyze_session(session_id: int, db: Session = Depends(get_db)):
                 'page_url': capture.page_url
             })
         
-        captures_text = format_captures_for_analysis(captures_data)
-        
-        # Prepare analysis prompt
-        analysis_prompt = SESSION_ANALYSIS_PROMPT.format(
-            session_id=session_id,
-            start_time=session.start_time.isoformat(),
-            capture_count=len(captures),
-            captures_list=captures_text
-        )
-        
         # Call LLM for analysis
         USE_MOCK_DATA = False  # 使用 Google Gemini API
         
@@ -1137,17 +2698,57 @@ def analyze_session(session_id: int, db: Session = Depends(get_db)):
             
         else:
             # 使用 Google Gemini API
-            model = get_gemini_model()
-            
             print("[Focus Catcher] 🧠 Calling Gemini for deep analysis...")
             
-            # 准备捕捉内容摘要
-            captures_summary = "\n".join([
-                f"{idx+1}. {c['selected_text'][:200]}" 
-                for idx, c in enumerate(captures_data)
-            ])
+            # 会话高频关键词（来自增量维护的主题摘要）
+            keywords = topic_keywords(get_session_topic(db, session_id))
             
-            user_prompt = f"""你是一个学习路径分析专家。请分析以下 {len(captures_data)} 条学习捕捉记录，识别用户的学习目标和模式。
+            def generate(prompt):
+                return llm_gateway.generate("analysis_chunk", prompt)
+            
+            if previous_analysis is not None:
+                # 增量分析：只发送上一次的分析结果和新增的捕捉
+                previous_count = len(captures) - len(new_captures)
+                new_texts = [c.selected_text for c in new_captures]
+                if fits_in_prompt(new_texts):
+                    new_captures_summary = "\n".join([
+                        f"{previous_count+idx+1}. {c.selected_text[:200]}"
+                        for idx, c in enumerate(new_captures)
+                    ])
+                else:
+                    # 新增内容过多时先分块摘要
+                    new_captures_summary = format_chunk_summaries(
+                        reduce_chunk_summaries(db, summarize_in_chunks(db, new_texts, generate), generate)
+                    )
+                user_prompt = SESSION_MERGE_PROMPT.format(
+                    previous_count=previous_count,
+                    new_count=len(new_captures),
+                    total_count=len(captures),
+                    previous_analysis=json.dumps(previous_analysis, ensure_ascii=False, indent=2),
+                    keywords=', '.join(keywords) if keywords else '无',
+                    new_captures=new_captures_summary
+                )
+            elif not fits_in_prompt([c['selected_text'] for c in captures_data]):
+                # 大会话：先并发摘要各片段（map），再汇总为完整分析（reduce）
+                chunk_summaries = summarize_in_chunks(db, [c['selected_text'] for c in captures_data], generate)
+                # 片段摘要也放不下时逐层合并，直到汇总 Prompt 在预算内
+                chunk_summaries = reduce_chunk_summaries(db, chunk_summaries, generate)
+                user_prompt = SESSION_REDUCE_PROMPT.format(
+                    capture_count=len(captures_data),
+                    chunk_count=len(chunk_summaries),
+                    keywords=', '.join(keywords) if keywords else '无',
+                    chunk_summaries=format_chunk_summaries(chunk_summaries)
+                )
+            else:
+                # 准备捕捉内容摘要
+                captures_summary = "\n".join([
+                    f"{idx+1}. {c['selected_text'][:200]}" 
+                    for idx, c in enumerate(captures_data)
+                ])
+                
+                user_prompt = f"""你是一个学习路径分析专家。请分析以下 {len(captures_data)} 条学习捕捉记录，识别用户的学习目标和模式。
+
+高频关键词：{', '.join(keywords) if keywords else '无'}
 
 学习捕捉记录：
 {captures_summary}
@@ -1166,8 +2767,7 @@ def analyze_session(session_id: int, db: Session = Depends(get_db)):
             print(f"[Focus Catcher] Prompt length: {len(user_prompt)} chars")
             
             try:
-                response = model.generate_content(user_prompt)
-                analysis_result = response.text
+                analysis_result = llm_gateway.generate("session_analysis", user_prompt)
                 
                 print(f"[Focus Catcher] ✅ Gemini response received")
                 print(f"[Focus Catcher] Response length: {len(analysis_result)} chars")
@@ -1366,6 +2966,13 @@ def analyze_session(session_id: int, db: Session = Depends(get_db)):
         session.branches = json.dumps(analysis_json.get('branches', []), ensure_ascii=False)
         session.action_guide = learning_guide
         session.status = 'completed'  # Mark session as analyzed
+        session.analyzed_at = datetime.utcnow()
+        session.analyzed_capture_count = len(captures)
+        session.analysis = json.dumps(
+            {field: analysis_json.get(field, default) for field, default in ANALYSIS_FIELDS.items()},
+            ensure_ascii=False
+        )
+        session.analyzed_through_capture_id = max(c.id for c in captures)
         
         db.commit()
         
@@ -1373,21 +2980,7 @@ def analyze_session(session_id: int, db: Session = Depends(get_db)):
         print(f"{'='*60}\n")
         
         # Return results
-        return {
-            "success": True,
-            "session_id": session_id,
-            "analysis": {
-                "core_goal": analysis_json.get('core_goal', ''),
-                "main_thread": analysis_json.get('main_thread', []),
-                "branches": analysis_json.get('branches', []),
-                "understood": analysis_json.get('understood', []),
-                "unclear": analysis_json.get('unclear', []),
-                "action_guide": analysis_json.get('action_guide', []),
-                "learning_pattern": analysis_json.get('learning_pattern', '')
-            },
-            "learning_guide": learning_guide,
-            "capture_count": len(captures)
-        }
+        return build_analysis_response(session_id, analysis_json, learning_guide, len(captures), mode)
         
     except HTTPException:
         raise
@@ -1399,6 +2992,169 @@ def analyze_session(session_id: int, db: Session = Depends(get_db)):
         )
 
 
+analysis_queue = AnalysisJobQueue(run_session_analysis)
+
+
+def remove_from_session_index(session_ids: list[int]):
+    """Stop routing captures to sessions that are about to be deleted."""
+    for session_id in session_ids:
+        session_index.remove(session_id)
+
+
+def restore_session_index(session_ids: list[int]):
+    """Route captures to sessions again that a deletion run ended up keeping."""
+    db = SessionLocal()
+    try:
+        for topic in db.query(SessionTopic).filter(SessionTopic.session_id.in_(session_ids)).all():
+            session_index.update(topic.session_id, json.loads(topic.vector_sum or "{}"), topic.updated_at)
+    finally:
+        db.close()
+
+
+retention_worker = RetentionWorker(
+    retention_policy(),
+    on_delete=remove_from_session_index,
+    on_keep=restore_session_index
+)
+
+
+def serialize_analysis_job(job: AnalysisJob) -> dict:
+    """Convert an analysis job row to its API representation."""
+    return {
+        "job_id": job.id,
+        "session_id": job.session_id,
+        "status": job.status,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error
+    }
+
+
+async def get_session_or_404(db: AsyncSession, session_id: int) -> DBSession:
+    session = await db.get(DBSession, session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    return session
+
+
+@app.post("/api/focus/sessions:delete")
+async def delete_sessions_bulk(request: SessionBulkDeleteRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Delete every session matching the filters, with its captures.
+    
+    Deletion runs in short transactions of at most DELETE_BATCH_ROWS
+    captures so concurrent captures are not locked out, and the freed
+    pages are returned to the file system with an incremental vacuum.
+    
+    Args:
+        request: Filters (at least one is required) and dry_run
+        db: Database session (for the dry-run count)
+    
+    Returns:
+        Deleted (or, for a dry run, matching) session and capture counts
+    """
+    criteria = SessionCriteria(
+        statuses=request.status,
+        older_than_days=request.older_than_days,
+        captures_below=request.captures_below
+    )
+    if criteria.is_empty():
+        raise HTTPException(
+            status_code=400,
+            detail="At least one filter (status, older_than_days, captures_below) is required"
+        )
+    
+    if request.dry_run:
+        sessions, captures = await db.run_sync(count_sessions, criteria)
+        return {"success": True, "dry_run": True, "sessions": sessions, "captures": captures}
+    
+    # Release the connection; the deletion uses its own sessions in a worker thread
+    await db.close()
+    try:
+        stats = await run_in_threadpool(
+            purge_sessions, criteria, remove_from_session_index, restore_session_index
+        )
+    except Exception as e:
+        print(f"[Focus Catcher] Error deleting sessions: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to delete sessions: {str(e)}"
+        )
+    
+    print(f"[Focus Catcher] 🗑️ Deleted {stats['sessions']} session(s) with {stats['captures']} captures")
+    
+    return {"success": True, "dry_run": False, **stats}
+
+
+@app.post("/api/focus/analyze/{session_id}")
+async def analyze_session(session_id: int, db: AsyncSession = Depends(get_async_db)):
+    """
+    Analyze a learning session and wait for the result.
+    
+    The analysis runs on the bounded worker pool, and a request arriving while
+    the session is already being analyzed waits for that same job.
+    
+    Args:
+        session_id: The session ID to analyze
+        db: Database session
+    
+    Returns:
+        Analysis results including core goal, main thread, branches, and action guide
+    """
+    await get_session_or_404(db, session_id)
+    # Don't hold a pooled connection while the analysis runs
+    await db.close()
+    job = await run_in_threadpool(analysis_queue.submit, session_id)
+    
+    if not await analysis_queue.wait_async(job.id, ANALYSIS_WAIT_TIMEOUT):
+        raise HTTPException(
+            status_code=504,
+            detail=f"Analysis is still running; poll /api/focus/analyze/jobs/{job.id}"
+        )
+    
+    job = await db.get(AnalysisJob, job.id)
+    if job.status == "failed":
+        raise HTTPException(status_code=job.error_status or 500, detail=job.error)
+    return json.loads(job.result)
+
+
+@app.post("/api/focus/analyze/{session_id}/jobs", status_code=202)
+async def enqueue_analysis(session_id: int, db: AsyncSession = Depends(get_async_db)):
+    """
+    Queue a background analysis of a session and return immediately.
+    
+    Returns the session's existing job if one is already queued or running.
+    Poll GET /api/focus/analyze/jobs/{job_id} for the result.
+    """
+    await get_session_or_404(db, session_id)
+    job = await run_in_threadpool(analysis_queue.submit, session_id)
+    return serialize_analysis_job(job)
+
+
+@app.get("/api/focus/analyze/jobs/{job_id}")
+async def get_analysis_job(job_id: int, wait: float = 0, db: AsyncSession = Depends(get_async_db)):
+    """
+    Get the state of an analysis job.
+    
+    Args:
+        job_id: The job ID returned when the analysis was queued
+        wait: Seconds to wait for the job to finish before answering (max 30),
+              so clients get the completion without tight polling
+    """
+    job = await db.get(AnalysisJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Analysis job {job_id} not found")
+    
+    if wait > 0 and job.status in ("queued", "running"):
+        await db.close()
+        await analysis_queue.wait_async(job_id, min(wait, 30))
+        job = await db.get(AnalysisJob, job_id)
+    
+    return serialize_analysis_job(job)
+
+
 # Mount static files (CSS, JS) - must be done after all routes are defined
 app.mount("/", StaticFiles(directory="frontend", html=True), name="frontend")
 
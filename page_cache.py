@@ -0,0 +1,239 @@
+"""
+Focus Catcher - Page Content Cache
+read_page 的内容缓存：按 URL 归一化、内存 LRU（按大小限制）+ 可选 SQLite 磁盘层、TTL 与条件请求重新验证
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# 缓存有效期（秒），过期后通过 ETag / Last-Modified 重新验证
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "3600"))
+
+# 内存层的容量上限（按提取后的文本大小计算）
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# 磁盘层路径，留空则只使用内存缓存
+PAGE_CACHE_SQLITE = os.getenv("PAGE_CACHE_SQLITE", "")
+
+# 磁盘层的容量上限，超出后淘汰最久未写入或读取的条目
+PAGE_CACHE_DISK_MAX_BYTES = int(os.getenv("PAGE_CACHE_DISK_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# 不影响页面内容的跟踪参数
+_TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "ref", "spm"}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a URL so equivalent addresses share one cache entry.
+
+    Lowercases scheme and host, drops default ports, fragments and tracking
+    parameters, and sorts the query string.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in _TRACKING_PARAMS
+    ]
+    path = parts.path or "/"
+    return urlunsplit((scheme, host, path, urlencode(sorted(query)), ""))
+
+
+@dataclass
+class CachedPage:
+    """A cached read_page result plus its HTTP validators."""
+    result: dict
+    etag: str | None
+    last_modified: str | None
+    expires_at: float
+    size: int
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    def validator_headers(self) -> dict:
+        """Headers for a conditional request revalidating this entry."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class PageCache:
+    """
+    Two-tier cache for extracted page content.
+
+    The memory tier is an LRU bounded by total content size; the optional
+    SQLite tier survives restarts, is consulted on memory misses, and is
+    bounded by disk_max_bytes (least recently stored or loaded rows go
+    first). Disk access runs in a worker thread so it never blocks the
+    event loop.
+    """
+
+    def __init__(
+        self,
+        ttl: float = PAGE_CACHE_TTL,
+        max_bytes: int = PAGE_CACHE_MAX_BYTES,
+        sqlite_path: str = PAGE_CACHE_SQLITE,
+        disk_max_bytes: int = PAGE_CACHE_DISK_MAX_BYTES
+    ):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._disk_bytes = 0
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "stale": 0,
+            "revalidated": 0,
+            "disk_hits": 0,
+            "evictions": 0,
+            "disk_evictions": 0
+        }
+
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS page_cache ("
+                "url TEXT PRIMARY KEY, result TEXT, etag TEXT, last_modified TEXT, expires_at REAL, "
+                "size INTEGER, last_used REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS ix_page_cache_last_used ON page_cache (last_used)")
+            self._db.commit()
+            self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM page_cache").fetchone()[0]
+            if self._disk_bytes > self.disk_max_bytes:
+                self._evict_from_disk()
+                self._db.commit()
+
+    async def get(self, url: str) -> CachedPage | None:
+        """
+        Look up a normalized URL.
+
+        Returns the entry even if it is stale so the caller can revalidate it;
+        check CachedPage.fresh before using it directly.
+        """
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+
+        if entry is None and self._db is not None:
+            entry = await asyncio.to_thread(self._load_from_disk, url)
+            if entry is not None:
+                with self._lock:
+                    self.stats["disk_hits"] += 1
+                    self._insert(url, entry)
+
+        with self._lock:
+            if entry is None:
+                self.stats["misses"] += 1
+            elif entry.fresh:
+                self.stats["hits"] += 1
+            else:
+                self.stats["stale"] += 1
+        return entry
+
+    async def put(self, url: str, result: dict, etag: str | None = None, last_modified: str | None = None):
+        """Store a freshly fetched result."""
+        size = len(result.get("content", "")) + len(result.get("title") or "")
+        entry = CachedPage(result, etag, last_modified, time.time() + self.ttl, size)
+        with self._lock:
+            self._insert(url, entry)
+        if self._db is not None:
+            await asyncio.to_thread(self._save_to_disk, url, entry)
+
+    async def refresh(self, url: str, entry: CachedPage):
+        """Extend an entry's lifetime after a 304 Not Modified."""
+        entry.expires_at = time.time() + self.ttl
+        with self._lock:
+            self.stats["revalidated"] += 1
+        if self._db is not None:
+            await asyncio.to_thread(self._save_to_disk, url, entry)
+
+    def snapshot(self) -> dict:
+        """Counters and current size, for tuning."""
+        with self._lock:
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "disk_bytes": self._disk_bytes
+            }
+
+    def _insert(self, url: str, entry: CachedPage):
+        old = self._entries.pop(url, None)
+        if old is not None:
+            self._bytes -= old.size
+        if entry.size > self.max_bytes:
+            return
+        self._entries[url] = entry
+        self._bytes += entry.size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self.stats["evictions"] += 1
+
+    def _load_from_disk(self, url: str) -> CachedPage | None:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT result, etag, last_modified, expires_at FROM page_cache WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE page_cache SET last_used = ? WHERE url = ?", (time.time(), url))
+            self._db.commit()
+        result = json.loads(row[0])
+        size = len(result.get("content", "")) + len(result.get("title") or "")
+        return CachedPage(result, row[1], row[2], row[3], size)
+
+    def _save_to_disk(self, url: str, entry: CachedPage):
+        data = json.dumps(entry.result, ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        with self._db_lock:
+            old = self._db.execute("SELECT size FROM page_cache WHERE url = ?", (url,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO page_cache (url, result, etag, last_modified, expires_at, size, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, data, entry.etag, entry.last_modified, entry.expires_at, size, time.time())
+            )
+            self._disk_bytes += size - ((old[0] or 0) if old else 0)
+            if self._disk_bytes > self.disk_max_bytes:
+                self._evict_from_disk()
+            self._db.commit()
+
+    def _evict_from_disk(self):
+        # Least recently stored or loaded rows first, down to 90% of the limit
+        rows = self._db.execute("SELECT url, size FROM page_cache ORDER BY last_used ASC").fetchall()
+        removed = 0
+        for url, size in rows:
+            if self._disk_bytes <= self.disk_max_bytes * 0.9:
+                break
+            self._db.execute("DELETE FROM page_cache WHERE url = ?", (url,))
+            self._disk_bytes -= size or 0
+            removed += 1
+        with self._lock:
+            self.stats["disk_evictions"] += removed
+
+
+# 全局共享实例
+page_cache = PageCache()
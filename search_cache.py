@@ -0,0 +1,148 @@
+"""
+Focus Catcher - Search Result Cache
+web_search 的结果缓存：查询归一化、TTL、失败结果的短期缓存，以及相同查询的并发合并（single-flight）
+"""
+
+import asyncio
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+
+# 成功结果的缓存时间（秒）
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "900"))
+
+# 失败结果的缓存时间（秒），避免故障期间反复请求上游
+SEARCH_CACHE_NEGATIVE_TTL = float(os.getenv("SEARCH_CACHE_NEGATIVE_TTL", "30"))
+
+# 最多缓存的查询数
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1000"))
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def is_cacheable_error(error: Exception) -> bool:
+    """
+    Whether a failure may be negatively cached.
+
+    Configuration and authentication errors (ValueError, e.g. a missing API
+    key, and PermissionError) are not: fixing them must take effect at once.
+    """
+    return not isinstance(error, (ValueError, PermissionError))
+
+
+def _raise_copy(error_type: type, message: str):
+    """Raise a new exception for a stored failure, so no instance is shared between callers."""
+    try:
+        error = error_type(message)
+    except Exception:
+        error = Exception(message)
+    raise error
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a search query: width, case, whitespace and trailing punctuation."""
+    query = unicodedata.normalize("NFKC", query).lower()
+    query = _SPACE_RE.sub(" ", query).strip()
+    return query.strip("?？!！.。,，;；")
+
+
+class SearchCache:
+    """
+    TTL cache for search results with request coalescing.
+
+    Concurrent calls for the same normalized query share one upstream call,
+    and failures are remembered for a short window.
+    """
+
+    def __init__(
+        self,
+        ttl: float = SEARCH_CACHE_TTL,
+        negative_ttl: float = SEARCH_CACHE_NEGATIVE_TTL,
+        max_entries: int = SEARCH_CACHE_MAX_ENTRIES
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, result, (error type, message) or None)
+        self._inflight = {}
+        self.stats = {
+            "hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0
+        }
+
+    async def get_or_fetch(self, query: str, fetch) -> dict:
+        """
+        Return the cached result for a query, or fetch it once.
+
+        Args:
+            query: The raw search query
+            fetch: Coroutine function (query) -> dict calling the upstream API
+
+        Raises:
+            Exception: A copy of the upstream error (possibly a cached one)
+        """
+        key = normalize_query(query)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, result, error = entry
+            if time.time() < expires_at:
+                self._entries.move_to_end(key)
+                if error is not None:
+                    self.stats["negative_hits"] += 1
+                    _raise_copy(*error)
+                self.stats["hits"] += 1
+                return result
+            del self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["misses"] += 1
+            # The upstream call runs as its own task so a cancelled caller
+            # does not cancel it for everyone else waiting on it
+            task = asyncio.ensure_future(fetch(query))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._store(key, done))
+
+        # asyncio.wait neither cancels the shared task when this caller is
+        # cancelled nor re-raises its exception instance into every waiter
+        await asyncio.wait({task})
+        if task.cancelled():
+            raise asyncio.CancelledError()
+        error = task.exception()
+        if error is not None:
+            _raise_copy(type(error), str(error))
+        return task.result()
+
+    def snapshot(self) -> dict:
+        """Counters and current size, for tuning."""
+        return {**self.stats, "entries": len(self._entries), "inflight": len(self._inflight)}
+
+    def _store(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if task.cancelled():
+            return
+
+        error = task.exception()
+        if error is not None:
+            if not is_cacheable_error(error):
+                return
+            self._entries[key] = (time.time() + self.negative_ttl, None, (type(error), str(error)))
+        else:
+            self._entries[key] = (time.time() + self.ttl, task.result(), None)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+
+# 全局共享实例
+search_cache = SearchCache()
@@ -0,0 +1,151 @@
+"""
+Focus Catcher - Nearest Session Index
+内存中的会话主题向量索引：把新捕捉路由回最相近的近期会话
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from database import SessionTopic
+from topic_detection import TOPIC_SAME_THRESHOLD, normalize
+
+# 只考虑最近活跃过的会话（小时）
+SESSION_ROUTING_WINDOW_HOURS = float(os.getenv("SESSION_ROUTING_WINDOW_HOURS", "72"))
+
+# 索引中最多保留的会话数
+SESSION_ROUTING_MAX_SESSIONS = int(os.getenv("SESSION_ROUTING_MAX_SESSIONS", "200"))
+
+# 相似度达到该值才路由回旧会话
+SESSION_ROUTING_THRESHOLD = float(os.getenv("SESSION_ROUTING_THRESHOLD", str(TOPIC_SAME_THRESHOLD)))
+
+
+class SessionTopicIndex:
+    """
+    Inverted index over the unit-length topic centroids of recent sessions.
+
+    A query only scores sessions sharing at least one term with it, so
+    lookups stay well under a millisecond for a few hundred sessions.
+    """
+
+    def __init__(self, window_hours: float = SESSION_ROUTING_WINDOW_HOURS, max_sessions: int = SESSION_ROUTING_MAX_SESSIONS):
+        self.window = timedelta(hours=window_hours)
+        self.max_sessions = max_sessions
+        self._vectors = {}       # session_id -> {term: weight}
+        self._last_active = {}   # session_id -> datetime
+        self._postings = {}      # term -> set(session_id)
+        self._lock = threading.Lock()
+
+    def build(self, db: Session) -> int:
+        """Load the most recently updated session summaries."""
+        since = datetime.utcnow() - self.window
+        topics = db.query(SessionTopic).filter(
+            SessionTopic.updated_at >= since,
+            SessionTopic.vector_count > 0
+        ).order_by(SessionTopic.updated_at.desc()).limit(self.max_sessions).all()
+
+        with self._lock:
+            self._vectors.clear()
+            self._last_active.clear()
+            self._postings.clear()
+        for topic in topics:
+            # Cosine ignores scale, so the vector sum serves as the centroid
+            self.update(topic.session_id, json.loads(topic.vector_sum or "{}"), topic.updated_at)
+        return len(topics)
+
+    def update(self, session_id: int, centroid: dict[str, float], last_active: datetime = None):
+        """Insert or replace a session's centroid."""
+        vector = normalize(centroid)
+        with self._lock:
+            self._remove(session_id)
+            if not vector:
+                return
+            self._vectors[session_id] = vector
+            self._last_active[session_id] = last_active or datetime.utcnow()
+            for term in vector:
+                self._postings.setdefault(term, set()).add(session_id)
+
+            if len(self._vectors) > self.max_sessions:
+                oldest = min(self._last_active, key=self._last_active.get)
+                self._remove(oldest)
+
+    def remove(self, session_id: int):
+        """Drop a session from the index (e.g. after it was deleted)."""
+        with self._lock:
+            self._remove(session_id)
+
+    def nearest(self, vector: dict[str, float], exclude: set[int] = None) -> tuple[int | None, float]:
+        """
+        Find the recent session whose centroid is most similar to a vector.
+
+        Args:
+            vector: Unit-length text vector of the new capture
+            exclude: Session IDs not to return
+
+        Returns:
+            (session_id, cosine similarity), or (None, 0.0) if nothing matches
+        """
+        exclude = exclude or set()
+        since = datetime.utcnow() - self.window
+        scores = {}
+
+        with self._lock:
+            for term, weight in vector.items():
+                for session_id in self._postings.get(term, ()):
+                    if session_id in exclude or self._last_active[session_id] < since:
+                        continue
+                    scores[session_id] = scores.get(session_id, 0.0) + weight * self._vectors[session_id][term]
+
+        if not scores:
+            return None, 0.0
+        best = max(scores, key=scores.get)
+        return best, scores[best]
+
+    def __len__(self):
+        return len(self._vectors)
+
+    def _remove(self, session_id: int):
+        vector = self._vectors.pop(session_id, None)
+        self._last_active.pop(session_id, None)
+        for term in vector or ():
+            sessions = self._postings.get(term)
+            if sessions is not None:
+                sessions.discard(session_id)
+                if not sessions:
+                    del self._postings[term]
+
+
+# 索引只反映已提交的数据：更新先挂在数据库会话上，事务提交后才应用，回滚时丢弃
+_PENDING_UPDATES = "session_index_pending"
+
+
+def after_commit(db: Session, action):
+    """
+    Run an index update once the database transaction commits.
+
+    Args:
+        db: The (sync) database session whose transaction makes the change
+        action: Callable applying the update; dropped if the transaction rolls back
+    """
+    db.info.setdefault(_PENDING_UPDATES, []).append(action)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending_updates(db: Session):
+    for action in db.info.pop(_PENDING_UPDATES, []):
+        action()
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_pending_updates(db: Session, transaction):
+    # Runs after after_commit, so only updates of a rolled back (or closed) transaction are left
+    if transaction.parent is None:
+        db.info.pop(_PENDING_UPDATES, None)
+
+
+# 全局共享实例（启动时构建，每次捕捉后更新）
+session_index = SessionTopicIndex()
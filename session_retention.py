@@ -0,0 +1,321 @@
+"""
+Focus Catcher - Session Retention
+会话批量删除和保留策略：按状态、开始时间、捕捉数筛选会话，分批删除（每批一个短事务，批间让出写锁），删除后合并全文索引段并用增量 vacuum 归还空闲页
+"""
+
+import os
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from capture_search import merge_search_index
+from database import (
+    DATABASE_URL,
+    AnalysisJob,
+    Capture,
+    CaptureKey,
+    Session as DBSession,
+    SessionLocal,
+    SessionTopic,
+    engine
+)
+from session_topics import rebuild_session_topic
+
+# 每个删除事务最多删除的捕捉数，以及每次选出的会话数
+DELETE_BATCH_ROWS = int(os.getenv("DELETE_BATCH_ROWS", "2000"))
+DELETE_BATCH_SESSIONS = int(os.getenv("DELETE_BATCH_SESSIONS", "200"))
+
+# 两批之间的停顿（毫秒），让等待写锁的捕捉写入先执行（SQLite 等锁时最长间隔 100ms 重试一次，停顿更短会被错过）
+DELETE_BATCH_PAUSE_MS = int(os.getenv("DELETE_BATCH_PAUSE_MS", "100"))
+
+# 删除后压缩数据库时每步处理的页数（全文索引段合并和增量 vacuum，每步一个短事务）
+VACUUM_STEP_PAGES = int(os.getenv("VACUUM_STEP_PAGES", "2000"))
+
+# 保留策略：每隔多少秒执行一次（0 为关闭），以及删除哪些会话（条件同时满足才删除，年龄和捕捉数至少配置一个）
+RETENTION_INTERVAL_S = float(os.getenv("RETENTION_INTERVAL_S", "3600"))
+RETENTION_MAX_AGE_DAYS = os.getenv("RETENTION_MAX_AGE_DAYS", "")          # 开始时间早于该天数的会话
+RETENTION_CAPTURES_BELOW = os.getenv("RETENTION_CAPTURES_BELOW", "")      # 捕捉数少于该值的会话
+RETENTION_STATUSES = os.getenv("RETENTION_STATUSES", "completed,abandoned")
+
+
+@dataclass
+class SessionCriteria:
+    """
+    Which sessions to delete; all given conditions must hold.
+
+    Active sessions are only matched when "active" is listed in statuses,
+    so a filter without statuses never deletes the session being captured into.
+    """
+
+    statuses: list[str] | None = None
+    older_than_days: float | None = None
+    captures_below: int | None = None
+
+    def is_empty(self) -> bool:
+        return not self.statuses and self.older_than_days is None and self.captures_below is None
+
+    def apply(self, query):
+        """Add the conditions to a select() over sessions."""
+        if self.statuses:
+            query = query.where(DBSession.status.in_(self.statuses))
+        else:
+            query = query.where(DBSession.status != "active")
+        if self.older_than_days is not None:
+            query = query.where(DBSession.start_time < datetime.utcnow() - timedelta(days=self.older_than_days))
+        if self.captures_below is not None:
+            query = query.where(DBSession.capture_count < self.captures_below)
+        return query
+
+
+def retention_policy() -> SessionCriteria | None:
+    """The configured retention policy, or None if no age or capture limit is set."""
+    if not RETENTION_MAX_AGE_DAYS and not RETENTION_CAPTURES_BELOW:
+        return None
+    return SessionCriteria(
+        statuses=[status.strip() for status in RETENTION_STATUSES.split(",") if status.strip()] or None,
+        older_than_days=float(RETENTION_MAX_AGE_DAYS) if RETENTION_MAX_AGE_DAYS else None,
+        captures_below=int(RETENTION_CAPTURES_BELOW) if RETENTION_CAPTURES_BELOW else None
+    )
+
+
+def count_sessions(db: Session, criteria: SessionCriteria) -> tuple[int, int]:
+    """
+    Returns:
+        (matching sessions, their captures according to capture_count)
+    """
+    query = criteria.apply(select(func.count(DBSession.id), func.coalesce(func.sum(DBSession.capture_count), 0)))
+    sessions, captures = db.execute(query).one()
+    return sessions, captures
+
+
+def repair_kept_sessions(db: Session, session_ids: list[int]) -> list[int]:
+    """
+    Bring sessions that a deletion run kept back in line with the captures
+    they still have: those that lost captures to earlier batches get their
+    capture count and topic summary recomputed and their analysis dropped.
+
+    Returns:
+        IDs of the repaired sessions
+    """
+    if not session_ids:
+        return []
+    counts = dict(db.execute(
+        select(Capture.session_id, func.count(Capture.id))
+        .where(Capture.session_id.in_(session_ids))
+        .group_by(Capture.session_id)
+    ).all())
+    recorded = db.execute(
+        select(DBSession.id, DBSession.capture_count).where(DBSession.id.in_(session_ids))
+    ).all()
+
+    repaired = [session_id for session_id, capture_count in recorded if counts.get(session_id, 0) != (capture_count or 0)]
+    for session_id in repaired:
+        rebuild_session_topic(db, session_id)
+    if repaired:
+        db.query(DBSession).filter(DBSession.id.in_(repaired)).update({
+            DBSession.analysis: None,
+            DBSession.analyzed_capture_count: 0,
+            DBSession.analyzed_through_capture_id: 0
+        }, synchronize_session=False)
+    return repaired
+
+
+def delete_sessions(db: Session, criteria: SessionCriteria, on_delete=None,
+                    batch_rows: int = DELETE_BATCH_ROWS, on_keep=None) -> dict:
+    """
+    Delete every session matching the criteria, with its captures (and the
+    idempotency keys of items merged into them), topic summary and analysis
+    jobs.
+
+    Sessions are taken DELETE_BATCH_SESSIONS at a time; their captures are
+    deleted at most batch_rows per transaction, and each transaction is
+    followed by a short pause so capture writes waiting for the SQLite
+    write lock are not held up for the whole run. Every transaction
+    re-checks the criteria, so a session that stops matching during the
+    run (e.g. a new capture reactivated it) is kept with its remaining
+    captures, and repaired (see repair_kept_sessions) in the same
+    transaction before on_keep is called.
+
+    Args:
+        db: Database session
+        criteria: Which sessions to delete (must not be empty)
+        on_delete: Optional callable (session_ids) called before a batch is deleted
+        batch_rows: Maximum captures deleted per transaction
+        on_keep: Optional callable (session_ids) called with the sessions of a
+            batch that no longer matched and were kept
+
+    Returns:
+        Deleted session and capture counts and the elapsed time
+    """
+    if criteria.is_empty():
+        raise ValueError("Refusing to delete sessions without any filter")
+
+    started = time.perf_counter()
+    stats = {"sessions": 0, "captures": 0, "transactions": 0}
+
+    def commit():
+        db.commit()
+        stats["transactions"] += 1
+        if DELETE_BATCH_PAUSE_MS:
+            time.sleep(DELETE_BATCH_PAUSE_MS / 1000)
+
+    def delete_captures(session_ids, limit=None):
+        # The criteria are evaluated inside the deletes, which hold the write lock
+        batch = select(Capture.id).where(Capture.session_id.in_(criteria.apply(select(DBSession.id)).where(
+            DBSession.id.in_(session_ids)
+        ))).order_by(Capture.id)
+        if limit is not None:
+            batch = batch.limit(limit)
+        db.query(CaptureKey).filter(CaptureKey.capture_id.in_(batch)).delete(synchronize_session=False)
+        return db.query(Capture).filter(Capture.id.in_(batch)).delete(synchronize_session=False)
+
+    while True:
+        session_ids = db.execute(
+            criteria.apply(select(DBSession.id)).order_by(DBSession.id).limit(DELETE_BATCH_SESSIONS)
+        ).scalars().all()
+        # End the read transaction so each delete starts its own write transaction
+        db.rollback()
+        if not session_ids:
+            break
+        if on_delete:
+            on_delete(session_ids)
+
+        while True:
+            deleted = delete_captures(session_ids, batch_rows)
+            if not deleted:
+                break
+            stats["captures"] += deleted
+            commit()
+
+        # Captures added since the last batch go with their session; the first
+        # statement takes the write lock, so the re-check below cannot go stale
+        stats["captures"] += delete_captures(session_ids)
+        matching = db.execute(
+            criteria.apply(select(DBSession.id)).where(DBSession.id.in_(session_ids))
+        ).scalars().all()
+        db.query(SessionTopic).filter(SessionTopic.session_id.in_(matching)).delete(synchronize_session=False)
+        db.query(AnalysisJob).filter(AnalysisJob.session_id.in_(matching)).delete(synchronize_session=False)
+        stats["sessions"] += db.query(DBSession).filter(DBSession.id.in_(matching)).delete(synchronize_session=False)
+        kept = sorted(set(session_ids) - set(matching))
+        repair_kept_sessions(db, kept)
+        commit()
+
+        if kept and on_keep:
+            on_keep(kept)
+
+    stats["elapsed_s"] = round(time.perf_counter() - started, 3)
+    return stats
+
+
+def compact_database(step_pages: int = VACUUM_STEP_PAGES) -> int:
+    """
+    Reclaim the space of deleted rows in short transactions: merge the
+    search index segments (dropping its delete markers), then return the
+    free pages to the file system with incremental vacuum (if auto_vacuum
+    is INCREMENTAL, see database.enable_incremental_vacuum).
+
+    Returns:
+        Number of pages released
+    """
+    if not DATABASE_URL.startswith("sqlite"):
+        return 0
+
+    def pause():
+        if DELETE_BATCH_PAUSE_MS:
+            time.sleep(DELETE_BATCH_PAUSE_MS / 1000)
+
+    released = 0
+    raw = engine.raw_connection()
+    try:
+        conn = raw.driver_connection
+        force = True
+        while merge_search_index(conn, step_pages, force):
+            force = False
+            pause()
+
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return 0
+        while True:
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if not free:
+                break
+            # sqlite3's execute() steps the pragma once (one page); executescript() runs it to the end
+            conn.executescript(f"PRAGMA incremental_vacuum({step_pages})")
+            released += min(free, step_pages)
+            pause()
+        # The file is truncated when the WAL is checkpointed
+        conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+    finally:
+        raw.close()
+    return released
+
+
+def purge_sessions(criteria: SessionCriteria, on_delete=None, on_keep=None) -> dict:
+    """Delete matching sessions (see delete_sessions), then compact the database."""
+    db = SessionLocal()
+    try:
+        stats = delete_sessions(db, criteria, on_delete, on_keep=on_keep)
+    finally:
+        db.close()
+    stats["vacuumed_pages"] = compact_database() if stats["sessions"] else 0
+    return stats
+
+
+class RetentionWorker:
+    """Background thread applying the retention policy every RETENTION_INTERVAL_S seconds."""
+
+    def __init__(self, policy: SessionCriteria | None, interval: float = RETENTION_INTERVAL_S,
+                 on_delete=None, on_keep=None):
+        """
+        Args:
+            policy: Sessions to delete on each run (None disables the worker)
+            interval: Seconds between runs (0 disables the worker)
+            on_delete: Passed to delete_sessions
+            on_keep: Passed to delete_sessions
+        """
+        self.policy = policy
+        self._interval = interval
+        self._on_delete = on_delete
+        self._on_keep = on_keep
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the worker thread (no-op if disabled or already running)."""
+        if self.policy is None or self._interval <= 0:
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="session-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Ask the worker to exit after its current run."""
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def run_once(self) -> dict:
+        """Apply the policy now."""
+        stats = purge_sessions(self.policy, self._on_delete, self._on_keep)
+        if stats["sessions"]:
+            print(f"[Retention] 🗑️ Deleted {stats['sessions']} session(s) with {stats['captures']} capture(s) "
+                  f"in {stats['elapsed_s']}s, released {stats['vacuumed_pages']} page(s)")
+        return stats
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"[Retention] ❌ Retention run failed: {str(e)}")
+                traceback.print_exc()
+            self._stop.wait(self._interval)
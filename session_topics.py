@@ -0,0 +1,161 @@
+"""
+Focus Catcher - Session Topic Summaries
+会话主题摘要：词频、质心和关键词随每条捕捉增量更新
+"""
+
+import json
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session, object_session
+
+from database import Capture, Session as DBSession, SessionTopic
+from session_index import after_commit, session_index
+from topic_detection import extract_terms, text_vector
+
+# 每个会话最多保留的词条数，保证摘要大小恒定
+MAX_TOPIC_TERMS = 300
+
+# 摘要中保存的关键词数量
+TOPIC_KEYWORD_COUNT = 10
+
+
+def get_session_topic(db: Session, session_id: int, create: bool = False) -> SessionTopic | None:
+    """
+    Load the topic summary of a session.
+
+    Args:
+        db: Database session
+        session_id: Session ID
+        create: Create an empty summary if none exists yet
+    """
+    topic = db.query(SessionTopic).filter(SessionTopic.session_id == session_id).first()
+    if topic is None and create:
+        topic = SessionTopic(
+            session_id=session_id,
+            vector_count=0,
+            term_counts="{}",
+            vector_sum="{}",
+            keywords="[]"
+        )
+        db.add(topic)
+        db.flush()
+    return topic
+
+
+def record_captures(db: Session, session_id: int, count: int = 1):
+    """Adjust the denormalized capture counter of a session (negative count to remove)."""
+    # Increment in SQL so concurrent writers don't lose updates
+    db.query(DBSession).filter(DBSession.id == session_id).update(
+        {DBSession.capture_count: func.coalesce(DBSession.capture_count, 0) + count},
+        synchronize_session=False
+    )
+
+
+def merge_capture_text(db: Session, session_id: int, text: str) -> SessionTopic:
+    """Fold a capture's text into the session's term counts and centroid."""
+    return merge_capture_texts(db, session_id, [text])
+
+
+def merge_capture_texts(db: Session, session_id: int, texts: list[str]) -> SessionTopic:
+    """Fold several captures into the summary with a single load and store."""
+    topic = get_session_topic(db, session_id, create=True)
+
+    term_counts = Counter(json.loads(topic.term_counts or "{}"))
+    vector_sum = Counter(json.loads(topic.vector_sum or "{}"))
+    for text in texts:
+        term_counts.update(extract_terms(text))
+        vector_sum.update(text_vector(text))
+
+    _store(topic, term_counts, vector_sum, (topic.vector_count or 0) + len(texts))
+    return topic
+
+
+def replace_capture_text(db: Session, session_id: int, old_text: str, new_text: str) -> SessionTopic:
+    """Swap one capture's text in the summary (its text was changed in place)."""
+    topic = get_session_topic(db, session_id, create=True)
+
+    term_counts = Counter(json.loads(topic.term_counts or "{}"))
+    vector_sum = Counter(json.loads(topic.vector_sum or "{}"))
+    term_counts.subtract(extract_terms(old_text))
+    vector_sum.subtract(text_vector(old_text))
+    term_counts.update(extract_terms(new_text))
+    vector_sum.update(text_vector(new_text))
+    # Drop terms that are gone (stored weights are rounded, so subtraction leaves residue)
+    term_counts = Counter({term: count for term, count in term_counts.items() if count > 0})
+    vector_sum = Counter({term: weight for term, weight in vector_sum.items() if weight > 1e-5})
+
+    _store(topic, term_counts, vector_sum, topic.vector_count or 0)
+    return topic
+
+
+def rebuild_session_topic(db: Session, session_id: int) -> SessionTopic:
+    """Recompute a session's summary from its captures (used after captures move)."""
+    topic = get_session_topic(db, session_id, create=True)
+
+    captures = db.query(Capture.selected_text, Capture.placement_status).filter(
+        Capture.session_id == session_id
+    ).all()
+
+    term_counts = Counter()
+    vector_sum = Counter()
+    vector_count = 0
+    for selected_text, placement_status in captures:
+        if placement_status == "pending":
+            # Pending captures are merged once the placement worker handles them
+            continue
+        term_counts.update(extract_terms(selected_text))
+        vector_sum.update(text_vector(selected_text))
+        vector_count += 1
+
+    db.query(DBSession).filter(DBSession.id == session_id).update(
+        {DBSession.capture_count: len(captures)}, synchronize_session=False
+    )
+    _store(topic, term_counts, vector_sum, vector_count)
+    return topic
+
+
+def backfill_session_topics(db: Session) -> int:
+    """Build summaries for sessions created before summaries existed."""
+    missing = db.query(DBSession.id).outerjoin(
+        SessionTopic, SessionTopic.session_id == DBSession.id
+    ).filter(SessionTopic.session_id.is_(None)).all()
+
+    for (session_id,) in missing:
+        rebuild_session_topic(db, session_id)
+    db.commit()
+    return len(missing)
+
+
+def topic_centroid(topic: SessionTopic | None) -> dict[str, float]:
+    """Centroid vector of a session's captures."""
+    if topic is None or not topic.vector_count:
+        return {}
+    vector_sum = json.loads(topic.vector_sum or "{}")
+    return {term: value / topic.vector_count for term, value in vector_sum.items()}
+
+
+def topic_keywords(topic: SessionTopic | None) -> list[str]:
+    """Top keywords of a session."""
+    if topic is None:
+        return []
+    return json.loads(topic.keywords or "[]")
+
+
+def _store(topic: SessionTopic, term_counts: Counter, vector_sum: Counter, vector_count: int):
+    """Prune to MAX_TOPIC_TERMS and serialize back into the summary row."""
+    top_terms = term_counts.most_common(MAX_TOPIC_TERMS)
+    top_vector = vector_sum.most_common(MAX_TOPIC_TERMS)
+
+    topic.term_counts = json.dumps(dict(top_terms), ensure_ascii=False)
+    topic.vector_sum = json.dumps({term: round(value, 6) for term, value in top_vector}, ensure_ascii=False)
+    topic.keywords = json.dumps(
+        [term for term, _ in top_terms[:TOPIC_KEYWORD_COUNT]], ensure_ascii=False
+    )
+    topic.vector_count = vector_count
+    topic.updated_at = datetime.utcnow()
+
+    # Keep the nearest-session index in step with the stored centroid, once it is committed
+    session_id, centroid, updated_at = topic.session_id, dict(top_vector), topic.updated_at
+    after_commit(object_session(topic), lambda: session_index.update(session_id, centroid, updated_at))
@@ -0,0 +1,145 @@
+"""
+Focus Catcher - Test Configuration
+测试配置：使用临时 SQLite 数据库和离线模拟的 LLM，不访问网络
+"""
+
+import os
+import sys
+import tempfile
+
+# Must be set before database / main are imported
+_TEST_DIR = tempfile.mkdtemp(prefix="focus-tests-")
+os.environ["FOCUS_DATABASE_URL"] = f"sqlite:///{os.path.join(_TEST_DIR, 'focus_catcher.db')}"
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ["LLM_CACHE_PATH"] = ""
+os.environ["TOPIC_DETECTION_MODE"] = "local"
+os.environ["PAGE_CACHE_SQLITE"] = ""
+os.environ["RETENTION_INTERVAL_S"] = "0"
+os.environ["DELETE_BATCH_PAUSE_MS"] = "0"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class StandInServer:
+    """
+    Local HTTP server answering from per-path scripts.
+
+    script(path, *responses) queues (status, headers, body, delay) tuples;
+    each request to the path takes the next one (the last one repeats).
+    Every request is recorded as (method, path, headers, client port).
+    """
+
+    def __init__(self):
+        self.scripts = {}
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def script(self, path: str, *responses):
+        defaults = (200, {}, b"", 0)
+        self.scripts[path] = [tuple(response) + defaults[len(response):] for response in responses]
+
+    def url(self, path: str) -> str:
+        return self.base_url + path
+
+    def hits(self, path: str) -> list:
+        return [request for request in self.requests if request[1] == path]
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"   # keep-alive
+
+            def log_message(self, *args):
+                pass
+
+            def _respond(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                with server._lock:
+                    server.requests.append((self.command, self.path, dict(self.headers), self.client_address[1]))
+                    script = server.scripts.get(self.path) or [(404, {}, b"", 0)]
+                    status, headers, body, delay = script.pop(0) if len(script) > 1 else script[0]
+                    server.active += 1
+                    server.max_active = max(server.max_active, server.active)
+                try:
+                    if delay:
+                        time.sleep(delay)
+                    self.send_response(status)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    if body and status != 304:
+                        self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with server._lock:
+                        server.active -= 1
+
+            do_GET = do_POST = _respond
+
+        return Handler
+
+
+@pytest.fixture
+def http_server():
+    server = StandInServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture(scope="session")
+def database():
+    import database
+    database.init_db()
+    return database
+
+
+def _clear(database):
+    from session_index import session_index
+    with database.engine.begin() as conn:
+        for table in reversed(database.Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    db = database.SessionLocal()
+    try:
+        session_index.build(db)
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def db(database):
+    """A sync database session on empty tables."""
+    _clear(database)
+    session = database.SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(database):
+    """TestClient for the app (startup hooks run) on empty tables."""
+    from fastapi.testclient import TestClient
+    import main
+    _clear(database)
+    with TestClient(main.app) as test_client:
+        yield test_client
@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+from analysis_chunks import (
+    estimate_tokens,
+    evict_chunk_summaries,
+    format_chunk_summaries,
+    group_summaries,
+    reduce_chunk_summaries,
+    summarize_in_chunks
+)
+from database import ChunkSummary
+
+
+class FakeLLM:
+    def __init__(self):
+        self.prompts = []
+
+    def __call__(self, prompt):
+        self.prompts.append(prompt)
+        return f"1. summary {len(self.prompts)}"
+
+
+def test_group_summaries_always_makes_progress():
+    long = ["x" * 10000] * 5
+    groups = group_summaries(long, budget=100)
+    assert [len(group) for group in groups] == [2, 2, 1]
+
+
+def test_reduce_fits_the_budget(db):
+    summaries = [f"1. point {i} " + "detail " * 200 for i in range(40)]
+    llm = FakeLLM()
+
+    reduced = reduce_chunk_summaries(db, summaries, llm, budget=2000)
+
+    assert estimate_tokens(format_chunk_summaries(reduced)) <= 2000
+    assert 1 <= len(reduced) < len(summaries)
+    assert llm.prompts
+
+
+def test_reduce_leaves_fitting_summaries_alone(db):
+    llm = FakeLLM()
+    assert reduce_chunk_summaries(db, ["1. a", "1. b"], llm, budget=2000) == ["1. a", "1. b"]
+    assert llm.prompts == []
+
+
+def test_merged_summaries_are_cached(db):
+    summaries = [f"1. point {i} " + "detail " * 200 for i in range(20)]
+    first = FakeLLM()
+    reduced = reduce_chunk_summaries(db, summaries, first, budget=2000)
+
+    again = FakeLLM()
+    assert reduce_chunk_summaries(db, summaries, again, budget=2000) == reduced
+    assert again.prompts == []
+
+
+def test_map_then_reduce(db):
+    texts = [f"capture {i} " + "lorem ipsum " * 30 for i in range(200)]
+    llm = FakeLLM()
+    summaries = reduce_chunk_summaries(db, summarize_in_chunks(db, texts, llm), llm, budget=20)
+    assert len(summaries) == 1
+
+
+def test_evicts_least_recently_used(db):
+    now = datetime.utcnow()
+    db.add_all(
+        ChunkSummary(content_hash=f"h{i}", summary="s", last_used_at=now - timedelta(minutes=i))
+        for i in range(5)
+    )
+    db.commit()
+
+    assert evict_chunk_summaries(db, max_rows=3) == 2
+    db.commit()
+    assert {row.content_hash for row in db.query(ChunkSummary)} == {"h0", "h1", "h2"}
+    assert evict_chunk_summaries(db, max_rows=3) == 0
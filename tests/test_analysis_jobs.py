@@ -0,0 +1,106 @@
+import json
+import threading
+
+from fastapi import HTTPException
+
+from analysis_jobs import AnalysisJobQueue
+from database import AnalysisJob, Session as DBSession
+
+
+def make_session(db):
+    session = DBSession(status="completed")
+    db.add(session)
+    db.commit()
+    return session.id
+
+
+def test_repeated_requests_for_a_session_share_one_job(db):
+    session_id = make_session(db)
+    other_id = make_session(db)
+    jobs = AnalysisJobQueue(lambda job_db, sid: {"session": sid})
+
+    first = jobs.enqueue(db, session_id)
+    second = jobs.enqueue(db, session_id)
+    other = jobs.enqueue(db, other_id)
+
+    assert second.id == first.id
+    assert other.id != first.id
+    assert db.query(AnalysisJob).count() == 2
+    assert jobs.pending_count() == 2
+
+
+def test_finished_job_does_not_absorb_a_new_request(db):
+    session_id = make_session(db)
+    jobs = AnalysisJobQueue(lambda job_db, sid: {"session": sid})
+    jobs.start()
+    try:
+        first = jobs.enqueue(db, session_id)
+        assert jobs.wait(first.id, 5)
+        second = jobs.enqueue(db, session_id)
+        assert jobs.wait(second.id, 5)
+    finally:
+        jobs.stop()
+
+    assert second.id != first.id
+    db.expire_all()
+    job = db.get(AnalysisJob, second.id)
+    assert job.status == "done"
+    assert json.loads(job.result) == {"session": session_id}
+    assert job.started_at is not None and job.finished_at is not None
+
+
+def test_recover_requeues_jobs_left_running(db):
+    session_id = make_session(db)
+    db.add_all([
+        AnalysisJob(session_id=session_id, status="running"),
+        AnalysisJob(session_id=session_id, status="queued"),
+        AnalysisJob(session_id=session_id, status="done", result="{}"),
+    ])
+    db.commit()
+    seen = []
+    jobs = AnalysisJobQueue(lambda job_db, sid: seen.append(sid) or {"ok": True})
+
+    assert jobs.recover(db) == 2
+    assert jobs.pending_count() == 2
+    statuses = [job.status for job in db.query(AnalysisJob).order_by(AnalysisJob.id)]
+    assert statuses == ["queued", "queued", "done"]
+
+    jobs.start()
+    try:
+        for job in db.query(AnalysisJob).filter(AnalysisJob.status == "queued").all():
+            assert jobs.wait(job.id, 5)
+    finally:
+        jobs.stop()
+
+    db.expire_all()
+    assert [job.status for job in db.query(AnalysisJob).order_by(AnalysisJob.id)] == ["done"] * 3
+    assert seen == [session_id, session_id]
+    assert jobs.pending_count() == 0
+
+
+def test_failed_handler_records_status_and_frees_the_session(db):
+    session_id = make_session(db)
+    calls = threading.Event()
+
+    def handler(job_db, sid):
+        if not calls.is_set():
+            calls.set()
+            raise HTTPException(status_code=503, detail="LLM unavailable")
+        raise RuntimeError("boom")
+
+    jobs = AnalysisJobQueue(handler)
+    jobs.start()
+    try:
+        first = jobs.enqueue(db, session_id)
+        assert jobs.wait(first.id, 5)
+        second = jobs.enqueue(db, session_id)
+        assert jobs.wait(second.id, 5)
+    finally:
+        jobs.stop()
+
+    db.expire_all()
+    first, second = db.get(AnalysisJob, first.id), db.get(AnalysisJob, second.id)
+    assert (first.status, first.error_status, first.error) == ("failed", 503, "LLM unavailable")
+    assert (second.status, second.error_status, second.error) == ("failed", 500, "boom")
+    assert first.result is None and first.finished_at is not None
+    assert jobs.pending_count() == 0
@@ -0,0 +1,61 @@
+import main
+
+
+def capture(client, text, **fields):
+    response = client.post("/api/focus/capture", json={"selected_text": text, "page_url": "https://example.com", **fields})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_topic_decision_runs_outside_capture_lock(client, monkeypatch):
+    calls = []
+    decide = main.decide_topic_shift
+
+    async def spy(db, text):
+        calls.append(main.capture_lock.locked())
+        return await decide(db, text)
+
+    monkeypatch.setattr(main, "decide_topic_shift", spy)
+    capture(client, "rust ownership and borrowing")
+    capture(client, "rust borrow checker")
+    assert calls == [False, False]
+
+
+def test_decision_is_applied_to_the_session_it_was_made_for(client, monkeypatch):
+    first = capture(client, "rust ownership and borrowing")
+
+    async def shift(db, text):
+        return first["session_id"], True, "Cooking"
+
+    monkeypatch.setattr(main, "decide_topic_shift", shift)
+    second = capture(client, "how to bake sourdough bread")
+    assert second["session_id"] != first["session_id"]
+    assert "Cooking" in second["message"]
+
+
+def test_stale_decision_falls_back_to_local_rules(client, monkeypatch):
+    first = capture(client, "rust ownership and borrowing")
+
+    async def stale(db, text):
+        # Made against a session that is no longer the active one
+        return first["session_id"] + 1000, True, "Cooking"
+
+    monkeypatch.setattr(main, "decide_topic_shift", stale)
+    second = capture(client, "how to bake sourdough bread")
+    # Too few captures for the local rules to call a shift
+    assert second["session_id"] == first["session_id"]
+
+
+def test_duplicate_skips_topic_detection(client, monkeypatch):
+    capture(client, "rust ownership and borrowing")
+    calls = []
+    decide = main.decide_topic_shift
+
+    async def spy(db, text):
+        calls.append(text)
+        return await decide(db, text)
+
+    monkeypatch.setattr(main, "decide_topic_shift", spy)
+    repeat = capture(client, "Rust  ownership and borrowing")
+    assert repeat["duplicate"] == "exact"
+    assert calls == []
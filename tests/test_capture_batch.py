@@ -0,0 +1,79 @@
+from datetime import datetime
+
+import main
+from database import Capture, SessionLocal
+
+
+def item(text, key=None, **fields):
+    return {"selected_text": text, "page_url": "https://example.com", "idempotency_key": key, **fields}
+
+
+def upload(client, *items):
+    return client.post("/api/focus/captures:batch", json={"captures": list(items)})
+
+
+def stored_captures():
+    db = SessionLocal()
+    try:
+        return db.query(Capture).order_by(Capture.id).all()
+    finally:
+        db.close()
+
+
+TEXTS = ["rust ownership and borrowing", "python asyncio event loop", "sourdough bread hydration"]
+
+
+def test_retried_batch_is_not_stored_twice(client):
+    items = [item(text, f"k{i}") for i, text in enumerate(TEXTS)]
+
+    first = upload(client, *items).json()
+    retry = upload(client, *items).json()
+
+    assert first["created"] == 3 and first["duplicates"] == 0
+    assert retry["created"] == 0 and retry["duplicates"] == 3
+    assert [r["capture_id"] for r in retry["results"]] == [r["capture_id"] for r in first["results"]]
+    assert {r["status"] for r in retry["results"]} == {"duplicate"}
+    assert len(stored_captures()) == 3
+
+
+def test_partially_delivered_batch(client):
+    upload(client, item(TEXTS[0], "k0"))
+    body = upload(client, item(TEXTS[0], "k0"), item(TEXTS[1], "k1")).json()
+
+    assert [r["status"] for r in body["results"]] == ["duplicate", "created"]
+    assert len(stored_captures()) == 2
+
+
+def test_repeated_key_within_a_batch(client):
+    body = upload(client, item(TEXTS[0], "same"), item(TEXTS[1], "same")).json()
+
+    first, repeat = body["results"]
+    assert (first["status"], repeat["status"]) == ("created", "duplicate")
+    assert repeat["capture_id"] == first["capture_id"]
+    assert len(stored_captures()) == 1
+
+
+def test_results_follow_request_order_and_report_sessions(client):
+    body = upload(client, *[item(text) for text in TEXTS]).json()
+
+    assert [r["index"] for r in body["results"]] == [0, 1, 2]
+    assert [c.selected_text for c in stored_captures()] == TEXTS
+    session_counts = {s["session_id"]: s["capture_count"] for s in body["sessions"]}
+    assert sum(session_counts.values()) == 3
+
+
+def test_client_timestamps_are_stored_as_utc(client):
+    upload(client, item(TEXTS[0], timestamp="2026-03-01T09:30:00+08:00"))
+    assert stored_captures()[0].timestamp == datetime(2026, 3, 1, 1, 30)
+
+
+def test_rejects_oversized_batch(client, monkeypatch):
+    monkeypatch.setattr(main, "CAPTURE_BATCH_MAX_SIZE", 2)
+    assert upload(client, *[item(text) for text in TEXTS]).status_code == 413
+    assert stored_captures() == []
+
+
+def test_invalid_item_is_reported_by_index(client):
+    response = upload(client, item(TEXTS[0]), {"selected_text": None, "page_url": "u"})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"][:3] == ["body", "captures", 1]
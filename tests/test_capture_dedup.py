@@ -0,0 +1,108 @@
+import json
+
+from database import Capture, Session as DBSession, SessionLocal, SessionTopic
+from session_topics import rebuild_session_topic, replace_capture_text
+
+RUST = [
+    "rust ownership and borrowing rules",
+    "rust borrow checker and lifetimes",
+    "rust ownership moves and references",
+]
+
+
+def upload(client, *items):
+    captures = [
+        {"page_url": "https://example.com/rust", **item} if isinstance(item, dict)
+        else {"selected_text": item, "page_url": "https://example.com/rust"}
+        for item in items
+    ]
+    response = client.post("/api/focus/captures:batch", json={"captures": captures})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def load(query):
+    db = SessionLocal()
+    try:
+        return query(db)
+    finally:
+        db.close()
+
+
+def test_retried_merged_item_is_a_duplicate(client):
+    upload(client, RUST[0])
+    item = {"selected_text": RUST[0], "idempotency_key": "k1"}
+
+    first = upload(client, item)
+    retry = upload(client, item)
+
+    assert first["results"][0]["status"] == "merged"
+    assert retry["results"][0]["status"] == "duplicate"
+    assert retry["results"][0]["capture_id"] == first["results"][0]["capture_id"]
+    assert load(lambda db: db.query(Capture.hit_count).scalar()) == 2
+
+
+def test_merged_into_new_capture_of_same_batch(client):
+    first = upload(client, {"selected_text": RUST[0], "idempotency_key": "a"}, {"selected_text": RUST[0], "idempotency_key": "b"})
+    retry = upload(client, {"selected_text": RUST[0], "idempotency_key": "b"})
+
+    assert [result["status"] for result in first["results"]] == ["created", "merged"]
+    assert retry["results"][0] == {**first["results"][1], "index": 0, "status": "duplicate"}
+    assert load(lambda db: db.query(Capture.hit_count).scalar()) == 2
+
+
+def test_duplicates_are_merged_before_segmentation(client):
+    stored = upload(client, *RUST)
+    rust_session = stored["results"][0]["session_id"]
+
+    batch = upload(
+        client,
+        "sourdough bread baking with wild yeast",
+        "sourdough starter feeding and bread hydration",
+        RUST[1]
+    )
+
+    statuses = [(result["status"], result["session_id"]) for result in batch["results"]]
+    assert statuses[0][1] != rust_session
+    assert statuses[2] == ("merged", rust_session)
+    assert load(lambda db: db.query(Capture).filter(Capture.session_id == rust_session).count()) == 3
+
+
+def test_overlap_replacement_updates_topic_and_analysis(client):
+    upload(client, *RUST)
+
+    def mark_analyzed(db):
+        session = db.query(DBSession).one()
+        session.analysis = json.dumps({"core_goal": "rust"})
+        session.analyzed_capture_count = 3
+        session.analyzed_through_capture_id = max(capture.id for capture in db.query(Capture))
+        db.commit()
+    load(mark_analyzed)
+
+    longer = RUST[0] + " explained with smart pointers"
+    result = upload(client, longer)["results"][0]
+    assert result["status"] == "merged"
+
+    session = load(lambda db: db.query(DBSession).one())
+    assert session.analysis is None
+    assert session.analyzed_through_capture_id == 0
+    assert "pointers" in json.loads(load(lambda db: db.query(SessionTopic).one()).term_counts)
+
+    assert client.get(f"/api/focus/sessions/{session.id}/status").json()["analysis_stale"] is True
+
+
+def test_replace_capture_text_matches_rebuild(db):
+    session = DBSession(status="completed")
+    db.add(session)
+    db.flush()
+    captures = [Capture(session_id=session.id, selected_text=text, page_url="u") for text in RUST]
+    db.add_all(captures)
+    rebuild_session_topic(db, session.id)
+    db.flush()
+
+    replace_capture_text(db, session.id, RUST[0], "python generators and iterators")
+    captures[0].selected_text = "python generators and iterators"
+    db.flush()
+    replaced = json.loads(db.query(SessionTopic).one().term_counts)
+    rebuilt = json.loads(rebuild_session_topic(db, session.id).term_counts)
+    assert replaced == rebuilt
@@ -0,0 +1,73 @@
+import json
+from datetime import datetime, timedelta
+
+from database import Capture, Session as DBSession
+
+START = datetime(2026, 3, 1, 12, 0, 0)
+
+
+def add_session(db, count, tied=3):
+    """A session whose first `tied` captures share one timestamp."""
+    session = DBSession(status="completed", capture_count=count)
+    db.add(session)
+    db.flush()
+    captures = [
+        Capture(
+            session_id=session.id,
+            selected_text=f"capture {i}",
+            page_url="u",
+            timestamp=START + timedelta(seconds=max(0, i - tied + 1))
+        )
+        for i in range(count)
+    ]
+    db.add_all(captures)
+    db.commit()
+    return session.id, [capture.id for capture in captures]
+
+
+def list_all(client, session_id, **params):
+    listed, cursor = [], None
+    while True:
+        query = {**params, **({"cursor": cursor} if cursor else {})}
+        body = client.get(f"/api/focus/captures/{session_id}", params=query).json()
+        listed += body["captures"]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return listed
+
+
+def test_pages_in_both_orders(client, db):
+    session_id, ids = add_session(db, 8)
+
+    ascending = [capture["id"] for capture in list_all(client, session_id, limit=3)]
+    descending = [capture["id"] for capture in list_all(client, session_id, limit=3, order="desc")]
+
+    assert ascending == ids
+    assert descending == ids[::-1]
+
+
+def test_fields_projection(client, db):
+    session_id, ids = add_session(db, 2)
+
+    body = client.get(f"/api/focus/captures/{session_id}", params={"fields": "id,page_url"}).json()
+    assert body["captures"] == [{"id": ids[0], "page_url": "u"}, {"id": ids[1], "page_url": "u"}]
+
+    assert client.get(f"/api/focus/captures/{session_id}", params={"fields": "id,password"}).status_code == 400
+    assert client.get(f"/api/focus/captures/{session_id}", params={"order": "sideways"}).status_code == 400
+
+
+def test_ndjson_stream(client, db):
+    session_id, ids = add_session(db, 5)
+
+    response = client.get(f"/api/focus/captures/{session_id}", params={"format": "ndjson", "limit": 0, "fields": "id"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in response.text.splitlines()] == [{"id": capture_id} for capture_id in ids]
+
+    limited = client.get(f"/api/focus/captures/{session_id}", params={"format": "ndjson", "limit": 2, "fields": "id"})
+    assert len(limited.text.splitlines()) == 2
+
+
+def test_other_sessions_are_not_listed(client, db):
+    session_id, ids = add_session(db, 2)
+    add_session(db, 3)
+    assert [capture["id"] for capture in list_all(client, session_id)] == ids
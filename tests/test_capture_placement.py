@@ -0,0 +1,94 @@
+import time
+from datetime import datetime, timedelta
+
+import main
+from capture_worker import CapturePlacementWorker
+from database import Capture, Session as DBSession
+from session_topics import get_session_topic, merge_capture_texts
+
+RUST = [
+    "rust ownership and borrowing rules",
+    "rust borrow checker and lifetimes",
+    "rust ownership moves and references",
+]
+BREAD = [
+    "sourdough bread baking with wild yeast",
+    "sourdough starter feeding and bread hydration",
+]
+START = datetime(2026, 3, 1, 12, 0, 0)
+
+
+def rust_session(db):
+    session = DBSession(status="active", start_time=START, capture_count=len(RUST))
+    db.add(session)
+    db.flush()
+    db.add_all(
+        Capture(session_id=session.id, selected_text=text, page_url="u", timestamp=START + timedelta(seconds=i))
+        for i, text in enumerate(RUST)
+    )
+    merge_capture_texts(db, session.id, RUST)
+    db.commit()
+    return session
+
+
+def add_pending(db, session, texts, offset=10):
+    captures = [
+        Capture(session_id=session.id, selected_text=text, page_url="u", placement_status="pending",
+                timestamp=START + timedelta(seconds=offset + i))
+        for i, text in enumerate(texts)
+    ]
+    db.add_all(captures)
+    session.capture_count += len(texts)
+    db.commit()
+    return [capture.id for capture in captures]
+
+
+def test_capture_on_topic_stays_in_its_session(db):
+    session = rust_session(db)
+    (capture_id,) = add_pending(db, session, ["rust borrow checker errors explained"])
+
+    main.place_capture(db, capture_id)
+
+    capture = db.get(Capture, capture_id)
+    assert (capture.session_id, capture.placement_status) == (session.id, "placed")
+    assert get_session_topic(db, session.id).vector_count == len(RUST) + 1
+
+
+def test_shift_moves_the_capture_and_later_ones_to_a_new_session(db):
+    session = rust_session(db)
+    first, second = add_pending(db, session, BREAD)
+
+    main.place_capture(db, first)
+
+    db.expire_all()
+    moved = db.get(Capture, first).session_id
+    assert moved != session.id
+    assert db.get(Capture, second).session_id == moved
+    assert db.get(Capture, second).placement_status == "pending"
+    old, new = db.get(DBSession, session.id), db.get(DBSession, moved)
+    assert old.status == "completed" and new.status == "active"
+    assert (old.capture_count, new.capture_count) == (len(RUST), 2)
+
+    main.place_capture(db, second)
+    db.expire_all()
+    assert db.get(Capture, second).session_id == moved
+    assert get_session_topic(db, moved).vector_count == 2
+
+
+def test_long_poll_times_out_while_pending(client, monkeypatch):
+    # A worker that is never started leaves the capture pending
+    monkeypatch.setattr(main, "placement_worker", CapturePlacementWorker(main.place_capture))
+    body = client.post("/api/focus/capture", json={"selected_text": RUST[0], "page_url": "u", "deferred": True}).json()
+    assert body["placement"] == "pending"
+
+    started = time.monotonic()
+    placement = client.get(f"/api/focus/captures/{body['capture_id']}/placement", params={"wait": 0.5}).json()
+
+    assert time.monotonic() - started >= 0.5
+    assert placement["status"] == "pending"
+
+
+def test_long_poll_returns_once_placed(client):
+    body = client.post("/api/focus/capture", json={"selected_text": RUST[0], "page_url": "u", "deferred": True}).json()
+    placement = client.get(f"/api/focus/captures/{body['capture_id']}/placement", params={"wait": 5}).json()
+    assert placement["status"] == "placed"
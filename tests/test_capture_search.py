@@ -0,0 +1,75 @@
+from database import Capture, Session as DBSession
+
+
+def add_captures(db, *texts, title=None):
+    session = DBSession(status="completed")
+    db.add(session)
+    db.flush()
+    captures = [Capture(session_id=session.id, selected_text=text, page_url="u", page_title=title) for text in texts]
+    db.add_all(captures)
+    db.commit()
+    return session.id, [capture.id for capture in captures]
+
+
+def search(client, q, **params):
+    response = client.get("/api/focus/search", params={"q": q, **params})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def found(client, q, **params):
+    return [result["capture_id"] for result in search(client, q, **params)["results"]]
+
+
+def test_index_follows_inserts_updates_and_deletes(client, db):
+    _, (capture_id,) = add_captures(db, "rust ownership and borrowing")
+    assert found(client, "ownership") == [capture_id]
+
+    db.get(Capture, capture_id).selected_text = "python generators"
+    db.commit()
+    assert found(client, "ownership") == []
+    assert found(client, "generators") == [capture_id]
+
+    db.delete(db.get(Capture, capture_id))
+    db.commit()
+    assert found(client, "generators") == []
+
+
+def test_all_terms_must_match_and_titles_are_searched(client, db):
+    _, (both, only_rust) = add_captures(db, "rust borrow checker", "rust macros")
+    _, (titled,) = add_captures(db, "some text", title="Borrow checker guide")
+
+    assert found(client, "rust borrow") == [both]
+    assert sorted(found(client, "borrow")) == sorted([both, titled])
+
+
+def test_snippet_and_mode(client, db):
+    add_captures(db, "the async runtime schedules futures cooperatively")
+    body = search(client, "runtime")
+    assert body["mode"] == "fts"
+    assert "【runtime】" in body["results"][0]["snippet"]
+
+
+def test_cjk_and_short_terms(client, db):
+    _, (chinese,) = add_captures(db, "学习异步编程的事件循环")
+    _, (short,) = add_captures(db, "go channels and select")
+
+    assert found(client, "事件循环") == [chinese]
+    # Terms under three characters are matched with LIKE
+    assert found(client, "go channels") == [short]
+    assert found(client, "go") == [short]
+
+
+def test_session_filter_and_paging(client, db):
+    first, _ = add_captures(db, *[f"kotlin coroutine note {i}" for i in range(5)])
+    add_captures(db, "kotlin coroutine elsewhere")
+
+    assert len(found(client, "coroutine", session_id=first)) == 5
+    page = search(client, "coroutine", limit=4)
+    assert len(page["results"]) == 4 and page["next_offset"] == 4
+    rest = search(client, "coroutine", limit=4, offset=4)
+    assert len(rest["results"]) == 2 and rest["next_offset"] is None
+
+
+def test_empty_query(client):
+    assert client.get("/api/focus/search", params={"q": "  "}).status_code == 400
@@ -0,0 +1,134 @@
+import asyncio
+import json
+
+import pytest
+
+import data_transfer
+from data_transfer import ImportFormatError, export_lines, import_lines
+from database import Capture, Session as DBSession
+
+
+async def collect(stream) -> bytes:
+    return b"".join([chunk async for chunk in stream])
+
+
+async def chunked(data: bytes, size: int = 100):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def run_import(lines: list[dict]) -> dict:
+    data = "".join(json.dumps(line) + "\n" for line in lines).encode()
+    return asyncio.run(import_lines(chunked(data)))
+
+
+def fts_rowids(db) -> set[int]:
+    return {row[0] for row in db.connection().exec_driver_sql("SELECT rowid FROM captures_fts")}
+
+
+def insert_trigger_exists(db) -> bool:
+    return db.connection().exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'captures_fts_insert'"
+    ).first() is not None
+
+
+HEADER = {"type": "header", "format": data_transfer.EXPORT_FORMAT, "version": data_transfer.EXPORT_VERSION}
+
+
+def session_and_captures(session_id: int, count: int) -> list[dict]:
+    lines = [{"type": "session", "id": session_id, "status": "active", "start_time": "2026-01-01T00:00:00"}]
+    lines += [
+        {"type": "capture", "session_id": session_id, "selected_text": f"capture {session_id}-{i}", "page_url": "u"}
+        for i in range(count)
+    ]
+    return lines
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_round_trip(db, compress):
+    session = DBSession(status="completed")
+    db.add(session)
+    db.flush()
+    db.add_all(Capture(session_id=session.id, selected_text=f"text {i}", page_url="u") for i in range(5))
+    db.commit()
+
+    data = asyncio.run(collect(export_lines(compress=compress)))
+    stats = asyncio.run(import_lines(chunked(data)))
+
+    assert (stats["sessions"], stats["captures"], stats["skipped"]) == (1, 5, 0)
+    new_id = stats["session_ids"][0]
+    assert db.query(Capture).filter(Capture.session_id == new_id).count() == 5
+    assert len(fts_rowids(db)) == 10
+    assert insert_trigger_exists(db)
+
+
+def test_transactions_index_their_captures(db, monkeypatch):
+    monkeypatch.setattr(data_transfer, "IMPORT_TRANSACTION_ROWS", 4)
+    monkeypatch.setattr(data_transfer, "IMPORT_BATCH_ROWS", 3)
+
+    stats = run_import([HEADER] + session_and_captures(1, 5) + session_and_captures(2, 6))
+
+    assert (stats["sessions"], stats["captures"]) == (2, 11)
+    assert fts_rowids(db) == {capture.id for capture in db.query(Capture)}
+    assert db.query(DBSession).filter(DBSession.status == "active").count() == 0
+    assert insert_trigger_exists(db)
+
+
+def test_failed_import_keeps_committed_rows_and_trigger(db, monkeypatch):
+    monkeypatch.setattr(data_transfer, "IMPORT_TRANSACTION_ROWS", 4)
+    bad = {"type": "capture", "session_id": 2, "selected_text": "bad", "page_title": {"not": "text"}}
+
+    with pytest.raises(Exception):
+        run_import([HEADER] + session_and_captures(1, 3) + session_and_captures(2, 2) + [bad])
+
+    # The first transaction (session 1 and its captures) stays, indexed; the failed one is rolled back
+    assert db.query(DBSession).count() == 1
+    assert fts_rowids(db) == {capture.id for capture in db.query(Capture)} != set()
+    assert insert_trigger_exists(db)
+
+    session = db.query(DBSession).first()
+    db.add(Capture(session_id=session.id, selected_text="written later", page_url="u"))
+    db.commit()
+    assert len(fts_rowids(db)) == 4
+
+
+def test_rejects_missing_header(db):
+    with pytest.raises(ImportFormatError):
+        run_import(session_and_captures(1, 1))
+
+
+def test_rejects_invalid_timestamp_with_line_number(db):
+    lines = [HEADER] + session_and_captures(1, 2)
+    lines[2]["timestamp"] = "yesterday"
+
+    with pytest.raises(ImportFormatError, match="Line 3"):
+        run_import(lines)
+
+
+def test_invalid_timestamp_is_a_bad_request(client):
+    lines = [HEADER, {"type": "session", "id": 1, "start_time": 12345}]
+    body = "".join(json.dumps(line) + "\n" for line in lines)
+
+    response = client.post("/api/focus/import", content=body)
+
+    assert response.status_code == 400
+    assert "Line 2" in response.json()["detail"]
+
+
+def test_imported_sessions_drop_their_analysis_state(db):
+    lines = [HEADER] + session_and_captures(1, 3)
+    lines[1].update({
+        "status": "completed",
+        "core_goal": "rust ownership",
+        "analyzed_at": "2026-01-01T01:00:00",
+        "analyzed_capture_count": 3,
+        "analyzed_through_capture_id": 9999,
+        "analysis": json.dumps({"core_goal": "rust ownership"})
+    })
+
+    stats = run_import(lines)
+
+    session = db.get(DBSession, stats["session_ids"][0])
+    assert session.analysis is None
+    assert (session.analyzed_capture_count, session.analyzed_through_capture_id) == (0, 0)
+    assert session.core_goal == "rust ownership"
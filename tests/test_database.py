@@ -0,0 +1,37 @@
+import sqlite3
+
+from sqlalchemy import create_engine
+
+import database
+
+
+def auto_vacuum(path) -> int:
+    with sqlite3.connect(path) as conn:
+        return conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+
+
+def use_engine(monkeypatch, path):
+    engine = create_engine(f"sqlite:///{path}")
+    monkeypatch.setattr(database, "engine", engine)
+    return engine
+
+
+def test_new_database_gets_incremental_vacuum(tmp_path, monkeypatch):
+    path = tmp_path / "new.db"
+    use_engine(monkeypatch, path)
+
+    assert database.enable_incremental_vacuum(switch_existing=False)
+    assert auto_vacuum(path) == 2
+
+
+def test_existing_database_is_only_switched_on_request(tmp_path, monkeypatch):
+    path = tmp_path / "existing.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE notes (body TEXT)")
+    use_engine(monkeypatch, path)
+
+    assert not database.enable_incremental_vacuum(switch_existing=False)
+    assert auto_vacuum(path) == 0
+
+    assert database.enable_incremental_vacuum(switch_existing=True)
+    assert auto_vacuum(path) == 2
@@ -0,0 +1,110 @@
+import asyncio
+
+import httpx
+import pytest
+
+from http_client import AsyncHTTPClient
+
+
+def run(client: AsyncHTTPClient, coroutine_factory):
+    async def main():
+        try:
+            return await coroutine_factory()
+        finally:
+            await client.close()
+    return asyncio.run(main())
+
+
+def make_client(**kwargs) -> AsyncHTTPClient:
+    options = {"timeout": 2, "max_retries": 2, "backoff_base": 0.01}
+    options.update(kwargs)
+    return AsyncHTTPClient(**options)
+
+
+def test_retries_5xx_then_succeeds(http_server):
+    http_server.script("/flaky", (503,), (502,), (200, {}, b"ok"))
+    client = make_client()
+    response = run(client, lambda: client.get(http_server.url("/flaky")))
+    assert response.status_code == 200
+    assert response.text == "ok"
+    assert len(http_server.hits("/flaky")) == 3
+
+
+def test_429_honours_retry_after(http_server):
+    http_server.script("/limited", (429, {"Retry-After": "1"}), (200, {}, b"ok"))
+    client = make_client()
+
+    async def timed():
+        started = asyncio.get_running_loop().time()
+        response = await client.get(http_server.url("/limited"))
+        return response, asyncio.get_running_loop().time() - started
+
+    response, elapsed = run(client, timed)
+    assert response.status_code == 200
+    # Retry-After: 1 with 0.5-1.5x jitter, instead of the 10 ms backoff
+    assert elapsed >= 0.5
+
+
+def test_gives_up_after_max_retries(http_server):
+    http_server.script("/down", (503,))
+    client = make_client(max_retries=1)
+    with pytest.raises(httpx.HTTPStatusError) as error:
+        run(client, lambda: client.get(http_server.url("/down")))
+    assert error.value.response.status_code == 503
+    assert len(http_server.hits("/down")) == 2
+
+
+def test_client_errors_are_not_retried(http_server):
+    http_server.script("/missing", (404,))
+    client = make_client()
+    with pytest.raises(httpx.HTTPStatusError):
+        run(client, lambda: client.get(http_server.url("/missing")))
+    assert len(http_server.hits("/missing")) == 1
+
+
+def test_timeouts_are_retried_then_raised(http_server):
+    http_server.script("/slow", (200, {}, b"late", 0.5))
+    client = make_client(timeout=0.1, max_retries=1)
+    with pytest.raises(httpx.TimeoutException):
+        run(client, lambda: client.get(http_server.url("/slow")))
+    assert len(http_server.hits("/slow")) == 2
+
+
+def test_timeout_then_success(http_server):
+    http_server.script("/slow-once", (200, {}, b"late", 0.5), (200, {}, b"fast"))
+    client = make_client(timeout=0.2)
+    response = run(client, lambda: client.get(http_server.url("/slow-once")))
+    assert response.text == "fast"
+
+
+def test_304_is_returned_not_raised(http_server):
+    http_server.script("/page", (304, {"ETag": '"v1"'}))
+    client = make_client()
+    response = run(client, lambda: client.get(http_server.url("/page"), headers={"If-None-Match": '"v1"'}))
+    assert response.status_code == 304
+    assert http_server.hits("/page")[0][2]["If-None-Match"] == '"v1"'
+
+
+def test_per_host_concurrency_limit(http_server):
+    http_server.script("/busy", (200, {}, b"ok", 0.1))
+    client = make_client(per_host_limit=2)
+
+    async def burst():
+        return await asyncio.gather(*(client.get(http_server.url("/busy")) for _ in range(6)))
+
+    responses = run(client, burst)
+    assert [response.status_code for response in responses] == [200] * 6
+    assert http_server.max_active == 2
+
+
+def test_connections_are_reused(http_server):
+    http_server.script("/keepalive", (200, {}, b"ok"))
+    client = make_client()
+
+    async def sequential():
+        for _ in range(3):
+            await client.get(http_server.url("/keepalive"))
+
+    run(client, sequential)
+    ports = {request[3] for request in http_server.hits("/keepalive")}
+    assert len(ports) == 1
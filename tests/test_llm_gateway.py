@@ -0,0 +1,88 @@
+import asyncio
+import os
+import time
+
+import main
+from database import DATA_DIR, database_dir
+from fake_llm import FakeGeminiModel, FakeOpenAIClient
+from llm_gateway import LLMGateway, LLMResponseCache, open_response_cache
+
+
+class CountingModel(FakeGeminiModel):
+    calls = 0
+
+    def generate_content(self, prompt, generation_config=None):
+        CountingModel.calls += 1
+        return super().generate_content(prompt, generation_config)
+
+
+def make_gateway(cache):
+    CountingModel.calls = 0
+    gateway = LLMGateway(cache)
+    gateway.use_backend(lambda: CountingModel(latency=0), lambda: FakeOpenAIClient(latency=0), "fake-gemini")
+    return gateway
+
+
+def test_identical_prompt_is_answered_from_cache(tmp_path):
+    gateway = make_gateway(LLMResponseCache(str(tmp_path / "llm_cache.db")))
+
+    first = gateway.generate("session_analysis", "analyze core_goal")
+    second = gateway.generate("session_analysis", "analyze core_goal")
+
+    assert second == first
+    assert CountingModel.calls == 1
+    stats = gateway.snapshot()
+    assert stats["sites"]["session_analysis"]["cache_hits"] == 1
+    assert stats["cache"]["hits"] == 1 and stats["cache"]["entries"] == 1
+
+
+def test_cached_response_expires_after_its_ttl(tmp_path):
+    gateway = make_gateway(LLMResponseCache(str(tmp_path / "llm_cache.db")))
+
+    gateway.generate("session_analysis", "analyze core_goal", ttl=0.05)
+    time.sleep(0.1)
+    gateway.generate("session_analysis", "analyze core_goal", ttl=0.05)
+
+    assert CountingModel.calls == 2
+
+
+def test_without_cache_every_call_reaches_the_backend(tmp_path):
+    gateway = make_gateway(None)
+    gateway.generate("session_analysis", "analyze core_goal")
+    gateway.generate("session_analysis", "analyze core_goal")
+    assert CountingModel.calls == 2
+    assert gateway.snapshot()["cache"] is None
+
+    cached = make_gateway(LLMResponseCache(str(tmp_path / "llm_cache.db")))
+    cached.generate("session_analysis", "analyze core_goal", use_cache=False)
+    cached.generate("session_analysis", "analyze core_goal", use_cache=False)
+    assert CountingModel.calls == 2
+    assert cached.snapshot()["cache"]["entries"] == 0
+
+
+def test_cache_file_lives_in_the_data_dir(tmp_path, monkeypatch):
+    assert database_dir(f"sqlite:///{tmp_path / 'focus.db'}") == str(tmp_path)
+    assert DATA_DIR == os.path.dirname(os.environ["FOCUS_DATABASE_URL"][len("sqlite:///"):])
+
+    monkeypatch.setattr("llm_gateway.LLM_CACHE_PATH", None)
+    cache = open_response_cache(str(tmp_path))
+    assert os.path.exists(tmp_path / "llm_cache.db")
+    assert cache.snapshot()["entries"] == 0
+
+    monkeypatch.setattr("llm_gateway.LLM_CACHE_PATH", "")
+    assert open_response_cache(str(tmp_path)) is None
+
+
+def test_chat_responses_are_not_cached_by_default(tmp_path, monkeypatch):
+    monkeypatch.setattr(main.llm_gateway, "cache", LLMResponseCache(str(tmp_path / "llm_cache.db")))
+    messages = [{"role": "user", "content": "what did I read today?"}]
+
+    async def chat_twice():
+        await main.complete_chat(model="fake", messages=messages)
+        await main.complete_chat(model="fake", messages=messages)
+
+    asyncio.run(chat_twice())
+
+    assert main.LLM_CHAT_CACHE_TTL == 0
+    assert main.llm_gateway.cache.snapshot()["entries"] == 0
+    assert main.llm_gateway.snapshot()["sites"]["chat"]["cache_hits"] == 0
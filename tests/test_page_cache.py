@@ -0,0 +1,109 @@
+import asyncio
+import sqlite3
+
+from page_cache import PageCache, normalize_url
+
+
+def page(size: int) -> dict:
+    return {"title": "t", "content": "x" * size, "length": size}
+
+
+def test_normalize_url_drops_tracking_and_sorts_query():
+    assert normalize_url("HTTPS://Example.com:443/a?utm_source=x&b=2&a=1#frag") == "https://example.com/a?a=1&b=2"
+
+
+def test_memory_tier_is_lru_bounded():
+    cache = PageCache(max_bytes=250, sqlite_path="")
+
+    async def scenario():
+        for name in ("a", "b"):
+            await cache.put(name, page(100))
+        await cache.get("a")                 # "b" is now least recently used
+        await cache.put("c", page(100))
+        return [await cache.get(name) is not None for name in ("a", "b", "c")]
+
+    assert asyncio.run(scenario()) == [True, False, True]
+    assert cache.snapshot()["evictions"] == 1
+
+
+def test_disk_tier_survives_memory_eviction(tmp_path):
+    cache = PageCache(max_bytes=150, sqlite_path=str(tmp_path / "pages.db"))
+
+    async def scenario():
+        await cache.put("a", page(100))
+        await cache.put("b", page(100))      # evicts "a" from memory only
+        return await cache.get("a")
+
+    entry = asyncio.run(scenario())
+    assert entry is not None and entry.result["length"] == 100
+    assert cache.snapshot()["disk_hits"] == 1
+
+
+def test_disk_tier_is_bounded(tmp_path):
+    path = str(tmp_path / "pages.db")
+    cache = PageCache(max_bytes=10_000, sqlite_path=path, disk_max_bytes=1_000)
+
+    async def scenario():
+        for i in range(20):
+            await cache.put(f"page-{i}", page(200))
+
+    asyncio.run(scenario())
+    snapshot = cache.snapshot()
+    assert snapshot["disk_bytes"] <= 1_000
+    assert snapshot["disk_evictions"] > 0
+
+    rows = sqlite3.connect(path).execute("SELECT url, size FROM page_cache").fetchall()
+    assert sum(size for _, size in rows) == snapshot["disk_bytes"]
+    # The newest pages are the ones kept
+    assert "page-19" in {url for url, _ in rows}
+    assert "page-0" not in {url for url, _ in rows}
+
+
+def test_read_page_revalidates_with_etag(http_server, monkeypatch):
+    import main
+
+    html = b"<html><head><title>Doc</title></head><body><p>Hello cache</p></body></html>"
+    http_server.script(
+        "/doc",
+        (200, {"ETag": '"v1"', "Content-Type": "text/html"}, html),
+        (304, {"ETag": '"v1"'})
+    )
+    cache = PageCache(ttl=-1, sqlite_path="")     # every entry is stale at once
+    monkeypatch.setattr(main, "page_cache", cache)
+
+    async def scenario():
+        try:
+            first = await main.read_page(http_server.url("/doc"))
+            second = await main.read_page(http_server.url("/doc"))
+            return first, second
+        finally:
+            await main.http_client.close()
+
+    first, second = asyncio.run(scenario())
+    assert first["title"] == "Doc"
+    assert second["content"] == first["content"]
+    requests = http_server.hits("/doc")
+    assert len(requests) == 2
+    assert requests[1][2].get("If-None-Match") == '"v1"'
+    assert cache.snapshot()["revalidated"] == 1
+
+
+def test_read_page_refetches_unexpected_304(http_server, monkeypatch):
+    import main
+
+    html = b"<html><head><title>Doc</title></head><body><p>Full page</p></body></html>"
+    http_server.script("/doc", (304, {}), (200, {"Content-Type": "text/html"}, html))
+    monkeypatch.setattr(main, "page_cache", PageCache(sqlite_path=""))
+
+    async def scenario():
+        try:
+            return await main.read_page(http_server.url("/doc"))
+        finally:
+            await main.http_client.close()
+
+    page = asyncio.run(scenario())
+    assert page["title"] == "Doc"
+    assert "Full page" in page["content"]
+    requests = http_server.hits("/doc")
+    assert len(requests) == 2
+    assert requests[1][2].get("Cache-Control") == "no-cache"
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from search_cache import SearchCache
+
+
+class Upstream:
+    def __init__(self, error=None, delay=0.0):
+        self.calls = []
+        self.error = error
+        self.delay = delay
+
+    async def __call__(self, query):
+        self.calls.append(query)
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return {"query": query, "call": len(self.calls)}
+
+
+def test_concurrent_queries_share_one_upstream_call():
+    cache = SearchCache()
+    upstream = Upstream(delay=0.05)
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_fetch(q, upstream) for q in ("Rust", "rust?", "  RUST ")))
+
+    results = asyncio.run(scenario())
+    assert len(upstream.calls) == 1
+    assert results == [results[0]] * 3
+    assert cache.snapshot()["coalesced"] == 2
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_call():
+    cache = SearchCache()
+    upstream = Upstream(delay=0.05)
+
+    async def scenario():
+        first = asyncio.ensure_future(cache.get_or_fetch("q", upstream))
+        second = asyncio.ensure_future(cache.get_or_fetch("q", upstream))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario())["call"] == 1
+
+
+def test_failures_are_cached_until_the_negative_ttl_expires():
+    cache = SearchCache(negative_ttl=0.1)
+    upstream = Upstream(error=RuntimeError("upstream down"))
+
+    async def scenario():
+        errors = []
+        for _ in range(2):
+            with pytest.raises(RuntimeError, match="upstream down") as caught:
+                await cache.get_or_fetch("q", upstream)
+            errors.append(caught.value)
+        assert len(upstream.calls) == 1
+        # Every caller gets its own exception instance
+        assert errors[0] is not errors[1] and errors[0] is not upstream.error
+
+        await asyncio.sleep(0.15)
+        upstream.error = None
+        return await cache.get_or_fetch("q", upstream)
+
+    assert asyncio.run(scenario())["call"] == 2
+    assert cache.snapshot()["negative_hits"] == 1
+
+
+@pytest.mark.parametrize("error", [ValueError("API key not set"), PermissionError("bad key")])
+def test_configuration_errors_are_not_cached(error):
+    cache = SearchCache()
+    upstream = Upstream(error=error)
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(type(error)):
+                await cache.get_or_fetch("q", upstream)
+
+    asyncio.run(scenario())
+    assert len(upstream.calls) == 2
+
+
+def test_least_recently_used_query_is_evicted():
+    cache = SearchCache(max_entries=2)
+    upstream = Upstream()
+
+    async def scenario():
+        await cache.get_or_fetch("a", upstream)
+        await cache.get_or_fetch("b", upstream)
+        await cache.get_or_fetch("a", upstream)   # a is now the most recent
+        await cache.get_or_fetch("c", upstream)   # evicts b
+        await cache.get_or_fetch("a", upstream)
+        await cache.get_or_fetch("b", upstream)
+
+    asyncio.run(scenario())
+    assert upstream.calls == ["a", "b", "c", "b"]
+    assert cache.snapshot()["evictions"] == 2
+
+
+def test_results_expire_after_the_ttl():
+    cache = SearchCache(ttl=0.05)
+    upstream = Upstream()
+
+    async def scenario():
+        await cache.get_or_fetch("q", upstream)
+        await asyncio.sleep(0.1)
+        return await cache.get_or_fetch("q", upstream)
+
+    assert asyncio.run(scenario())["call"] == 2
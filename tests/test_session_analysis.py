@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import main
+from database import Capture, Session as DBSession
+
+START = datetime(2026, 3, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def prompts(monkeypatch):
+    """Prompts of the session_analysis calls, answered by the fake backend."""
+    sent = []
+    generate = main.llm_gateway.generate
+
+    def recording(site, prompt, *args, **kwargs):
+        if site == "session_analysis":
+            sent.append(prompt)
+        return generate(site, prompt, *args, **kwargs)
+
+    monkeypatch.setattr(main.llm_gateway, "generate", recording)
+    return sent
+
+
+def make_session(db, texts):
+    session = DBSession(status="active", start_time=START, capture_count=0)
+    db.add(session)
+    db.flush()
+    add_captures(db, session, texts)
+    return session
+
+
+def add_captures(db, session, texts):
+    offset = session.capture_count
+    captures = [
+        Capture(session_id=session.id, selected_text=text, page_url="u", timestamp=START + timedelta(seconds=offset + i))
+        for i, text in enumerate(texts)
+    ]
+    db.add_all(captures)
+    session.capture_count += len(texts)
+    db.commit()
+    return captures
+
+
+def captures_of(db, session):
+    return db.query(Capture).filter(Capture.session_id == session.id).order_by(Capture.id).all()
+
+
+def test_second_analysis_only_sends_new_captures(db, prompts):
+    session = make_session(db, ["first capture about rust", "second capture about rust"])
+    first = main.run_session_analysis(db, session.id)
+    assert first["mode"] == "full"
+    assert session.analyzed_through_capture_id == max(c.id for c in captures_of(db, session))
+
+    (new,) = add_captures(db, session, ["third capture about lifetimes"])
+    second = main.run_session_analysis(db, session.id)
+
+    assert second["mode"] == "incremental"
+    assert second["capture_count"] == 3
+    prompt = prompts[-1]
+    assert "third capture about lifetimes" in prompt
+    assert "first capture about rust" not in prompt and "second capture about rust" not in prompt
+    # The stored analysis stands in for the older captures
+    assert first["analysis"]["core_goal"] in prompt
+    assert session.analyzed_through_capture_id == new.id
+    assert session.analyzed_capture_count == 3
+
+
+def test_unchanged_session_returns_the_stored_analysis(db, prompts):
+    session = make_session(db, ["first capture about rust", "second capture about rust"])
+    first = main.run_session_analysis(db, session.id)
+
+    again = main.run_session_analysis(db, session.id)
+
+    assert len(prompts) == 1
+    assert again["mode"] == "stored"
+    assert again["analysis"] == first["analysis"]
+    assert again["learning_guide"] == first["learning_guide"]
+
+
+def test_moved_capture_resets_the_mark(db, prompts):
+    session = make_session(db, ["first capture about rust", "second capture about rust", "bread baking"])
+    other = make_session(db, [])
+    main.run_session_analysis(db, session.id)
+
+    moved = captures_of(db, session)[-1]
+    moved.session_id = other.id
+    session.capture_count -= 1
+    db.commit()
+    add_captures(db, session, ["third capture about lifetimes"])
+    result = main.run_session_analysis(db, session.id)
+
+    assert result["mode"] == "full"
+    assert "first capture about rust" in prompts[-1] and "bread baking" not in prompts[-1]
+    assert session.analyzed_capture_count == 3
+
+
+def test_deleted_capture_resets_the_mark(db, prompts):
+    session = make_session(db, ["first capture about rust", "second capture about rust"])
+    main.run_session_analysis(db, session.id)
+
+    db.delete(captures_of(db, session)[0])
+    session.capture_count -= 1
+    db.commit()
+    add_captures(db, session, ["third capture about lifetimes"])
+    result = main.run_session_analysis(db, session.id)
+
+    assert result["mode"] == "full"
+    assert "second capture about rust" in prompts[-1] and "first capture about rust" not in prompts[-1]
+    assert session.analyzed_capture_count == 2
@@ -0,0 +1,51 @@
+from database import Capture, Session as DBSession
+from session_index import after_commit, session_index
+from session_topics import merge_capture_texts
+from topic_detection import text_vector
+
+
+def add_session(db, texts):
+    session = DBSession(status="completed", capture_count=len(texts))
+    db.add(session)
+    db.flush()
+    db.add_all(Capture(session_id=session.id, selected_text=text, page_url="u") for text in texts)
+    merge_capture_texts(db, session.id, texts)
+    return session.id
+
+
+TEXTS = ["rust ownership and borrowing", "rust borrow checker lifetimes", "rust ownership rules"]
+
+
+def test_index_is_updated_on_commit(db):
+    session_id = add_session(db, TEXTS)
+    assert session_index.nearest(text_vector("rust ownership"))[0] is None
+    db.commit()
+    assert session_index.nearest(text_vector("rust ownership"))[0] == session_id
+
+
+def test_index_ignores_rolled_back_changes(db):
+    add_session(db, TEXTS)
+    db.rollback()
+    assert session_index.nearest(text_vector("rust ownership")) == (None, 0.0)
+
+    # A later commit must not apply updates queued before the rollback
+    db.add(DBSession(status="active"))
+    db.commit()
+    assert len(session_index) == 0
+
+
+def test_after_commit_actions_run_in_order(db):
+    applied = []
+    after_commit(db, lambda: applied.append(1))
+    after_commit(db, lambda: applied.append(2))
+    db.add(DBSession(status="active"))
+    assert applied == []
+    db.commit()
+    assert applied == [1, 2]
+
+
+def test_closing_without_commit_discards_updates(database):
+    db = database.SessionLocal()
+    add_session(db, TEXTS)
+    db.close()
+    assert len(session_index) == 0
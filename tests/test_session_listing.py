@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+from database import Session as DBSession
+
+START = datetime(2026, 3, 1, 12, 0, 0)
+
+
+def add_sessions(db, count, status="completed", capture_count=0, start=START, step=timedelta(0)):
+    sessions = [
+        DBSession(status=status, capture_count=capture_count, start_time=start + step * i)
+        for i in range(count)
+    ]
+    db.add_all(sessions)
+    db.commit()
+    return [session.id for session in sessions]
+
+
+def list_all(client, **params):
+    pages, cursor = [], None
+    while True:
+        body = client.get("/api/focus/sessions", params={**params, **({"cursor": cursor} if cursor else {})}).json()
+        pages.append(body["sessions"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_pages_cover_every_session_once_despite_equal_start_times(client, db):
+    ids = add_sessions(db, 7)  # all with the same start_time
+    ids += add_sessions(db, 5, start=START - timedelta(hours=1), step=timedelta(minutes=1))
+
+    pages = list_all(client, limit=3)
+
+    listed = [session["id"] for page in pages for session in page]
+    assert sorted(listed) == sorted(ids)
+    assert len(listed) == len(set(listed))
+    assert [len(page) for page in pages] == [3, 3, 3, 3]
+    keys = [(session["start_time"], session["id"]) for page in pages for session in page]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_reports_capture_counts_and_filters(client, db):
+    add_sessions(db, 2, status="completed", capture_count=4, start=START - timedelta(days=3))
+    active = add_sessions(db, 1, status="active", capture_count=9)
+
+    body = client.get("/api/focus/sessions", params={"status": "active"}).json()
+    assert [(session["id"], session["capture_count"]) for session in body["sessions"]] == [(active[0], 9)]
+
+    recent = client.get("/api/focus/sessions", params={"since": (START - timedelta(days=1)).isoformat()}).json()
+    assert [session["id"] for session in recent["sessions"]] == active
+
+    utc = client.get("/api/focus/sessions", params={"since": "2026-02-28T12:00:00+00:00"}).json()
+    assert [session["id"] for session in utc["sessions"]] == active
+
+
+def test_limit_is_clamped(client, db):
+    add_sessions(db, 3, step=timedelta(minutes=1))
+    body = client.get("/api/focus/sessions", params={"limit": 0}).json()
+    assert len(body["sessions"]) == 1 and body["next_cursor"]
+
+
+def test_invalid_cursor(client):
+    assert client.get("/api/focus/sessions", params={"cursor": "nonsense"}).status_code == 400
@@ -0,0 +1,142 @@
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import session_retention
+from database import Capture, CaptureKey, Session as DBSession, SessionLocal
+from session_retention import SessionCriteria, delete_sessions
+
+
+def add_session(db, status, captures, days_ago=0):
+    session = DBSession(status=status, capture_count=captures,
+                        start_time=datetime.utcnow() - timedelta(days=days_ago))
+    db.add(session)
+    db.flush()
+    db.add_all(Capture(session_id=session.id, selected_text=f"text {i}", page_url="u") for i in range(captures))
+    db.commit()
+    return session.id
+
+
+def capture_count(db, session_id):
+    return db.query(Capture).filter(Capture.session_id == session_id).count()
+
+
+def test_deletes_only_matching_sessions(db):
+    old = add_session(db, "completed", 5, days_ago=10)
+    recent = add_session(db, "completed", 5, days_ago=1)
+    active = add_session(db, "active", 5, days_ago=10)
+
+    stats = delete_sessions(db, SessionCriteria(older_than_days=7), batch_rows=2)
+
+    assert stats["sessions"] == 1
+    assert stats["captures"] == 5
+    assert stats["transactions"] == 4  # three capture batches and the session delete
+    assert db.get(DBSession, old) is None
+    assert capture_count(db, old) == 0
+    assert capture_count(db, recent) == 5
+    assert capture_count(db, active) == 5
+
+
+def test_requires_a_filter(db):
+    with pytest.raises(ValueError):
+        delete_sessions(db, SessionCriteria())
+
+
+def test_keeps_session_reactivated_during_run(db):
+    stale = add_session(db, "completed", 4)
+    other = add_session(db, "completed", 4)
+    kept = []
+
+    def reactivate(session_ids):
+        # A capture routed back to the session after the run selected it
+        assert stale in session_ids
+        writer = SessionLocal()
+        try:
+            writer.get(DBSession, stale).status = "active"
+            writer.commit()
+        finally:
+            writer.close()
+
+    stats = delete_sessions(db, SessionCriteria(statuses=["completed"]), on_delete=reactivate, on_keep=kept.extend)
+
+    assert stats["sessions"] == 1
+    assert db.get(DBSession, other) is None
+    assert db.get(DBSession, stale).status == "active"
+    assert capture_count(db, stale) == 4
+    assert kept == [stale]
+
+
+def test_session_delete_takes_late_captures(db):
+    session_id = add_session(db, "completed", 2, days_ago=10)
+
+    def late_capture(session_ids):
+        writer = SessionLocal()
+        try:
+            writer.add(Capture(session_id=session_id, selected_text="late", page_url="u"))
+            writer.commit()
+        finally:
+            writer.close()
+
+    stats = delete_sessions(db, SessionCriteria(older_than_days=7), on_delete=late_capture)
+
+    assert stats == {**stats, "sessions": 1, "captures": 3}
+    assert capture_count(db, session_id) == 0
+
+
+def test_deletes_keys_of_merged_items(db):
+    session_id = add_session(db, "completed", 3, days_ago=10)
+    capture = db.query(Capture).filter(Capture.session_id == session_id).first()
+    db.add(CaptureKey(idempotency_key="merged", capture_id=capture.id))
+    db.commit()
+
+    delete_sessions(db, SessionCriteria(older_than_days=7), batch_rows=1)
+
+    assert db.query(CaptureKey).count() == 0
+
+
+def test_kept_session_is_repaired_after_losing_captures(db, monkeypatch):
+    stale = add_session(db, "completed", 5)
+    writer = SessionLocal()
+    try:
+        session = writer.get(DBSession, stale)
+        session.analysis = '{"core_goal": "old"}'
+        session.analyzed_capture_count = 5
+        session.analyzed_through_capture_id = 10**6
+        writer.commit()
+    finally:
+        writer.close()
+    kept = []
+
+    def reactivate_after_first_batch(seconds):
+        # The session stops matching once its first captures are gone
+        if not kept and capture_count(db, stale) < 5:
+            writer = SessionLocal()
+            try:
+                writer.get(DBSession, stale).status = "active"
+                writer.commit()
+            finally:
+                writer.close()
+
+    monkeypatch.setattr(session_retention, "DELETE_BATCH_PAUSE_MS", 1)
+    monkeypatch.setattr(session_retention, "time", SimpleNamespace(
+        sleep=reactivate_after_first_batch, perf_counter=time.perf_counter
+    ))
+
+    def on_keep(session_ids):
+        # Repaired before the callback sees it
+        reader = SessionLocal()
+        try:
+            session = reader.get(DBSession, stale)
+            kept.append((session_ids, session.capture_count, session.analysis))
+        finally:
+            reader.close()
+
+    stats = delete_sessions(db, SessionCriteria(statuses=["completed"]), batch_rows=2, on_keep=on_keep)
+
+    assert stats == {**stats, "sessions": 0, "captures": 2}
+    assert kept == [([stale], 3, None)]
+    session = db.get(DBSession, stale)
+    assert (session.analyzed_capture_count, session.analyzed_through_capture_id) == (0, 0)
+    assert session.topic is not None
@@ -0,0 +1,70 @@
+import asyncio
+import json
+
+import main
+
+
+class FakeTools:
+    """Stand-in for execute_tool_call: sleeps args["delay"] and echoes args["name"]."""
+
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self.finished = []
+        self.cancelled = []
+
+    async def __call__(self, function_name, function_args):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(function_args["delay"])
+        except asyncio.CancelledError:
+            self.cancelled.append(function_args["name"])
+            raise
+        finally:
+            self.active -= 1
+        self.finished.append(function_args["name"])
+        return json.dumps({"name": function_args["name"]})
+
+
+def calls(*delays):
+    return [(f"call-{i}", "web_search", {"name": f"call-{i}", "delay": delay}) for i, delay in enumerate(delays)]
+
+
+def test_results_follow_call_order(monkeypatch):
+    tools = FakeTools()
+    monkeypatch.setattr(main, "execute_tool_call", tools)
+    events = []
+
+    async def emit(event):
+        events.append(event["id"])
+
+    results = asyncio.run(main.execute_tool_calls(calls(0.15, 0.01, 0.08), emit))
+
+    assert tools.finished == ["call-1", "call-2", "call-0"]
+    assert events == ["call-1", "call-2", "call-0"]
+    assert [json.loads(result)["name"] for result in results] == ["call-0", "call-1", "call-2"]
+
+
+def test_concurrency_is_bounded(monkeypatch):
+    tools = FakeTools()
+    monkeypatch.setattr(main, "execute_tool_call", tools)
+    monkeypatch.setattr(main, "TOOL_CALL_CONCURRENCY", 2)
+
+    results = asyncio.run(main.execute_tool_calls(calls(*[0.03] * 6)))
+
+    assert tools.max_active == 2
+    assert len(results) == 6
+
+
+def test_call_past_the_deadline_reports_a_timeout(monkeypatch):
+    tools = FakeTools()
+    monkeypatch.setattr(main, "execute_tool_call", tools)
+    monkeypatch.setattr(main, "TOOL_TURN_DEADLINE", 0.1)
+
+    results = asyncio.run(main.execute_tool_calls(calls(0.01, 5, 0.02)))
+
+    assert json.loads(results[0]) == {"name": "call-0"}
+    assert json.loads(results[2]) == {"name": "call-2"}
+    assert "timed out" in json.loads(results[1])["error"]
+    assert tools.cancelled == ["call-1"]
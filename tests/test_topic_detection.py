@@ -0,0 +1,24 @@
+from topic_detection import classify_vector, extract_terms, text_vector
+
+
+CENTROID = text_vector("python asyncio event loop coroutine scheduling")
+
+
+def test_related_text_is_same_topic():
+    score, verdict = classify_vector(text_vector("asyncio coroutine scheduling in python"), CENTROID)
+    assert verdict == "same"
+    assert score > 0.5
+
+
+def test_unrelated_text_is_a_shift():
+    assert classify_vector(text_vector("rust borrow checker lifetimes"), CENTROID)[1] == "shift"
+
+
+def test_text_without_terms_stays_in_topic():
+    for text in ("it is", "是的", "...!?", ""):
+        assert text_vector(text) == {}
+        assert classify_vector(text_vector(text), CENTROID) == (0.0, "same")
+
+
+def test_chinese_text_is_split_into_bigrams():
+    assert extract_terms("异步编程") == ["异步", "步编", "编程"]
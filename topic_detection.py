@@ -0,0 +1,147 @@
+"""
+Focus Catcher - Local Topic Detection
+本地主题检测：字符 n-gram 向量 + 余弦相似度，无需网络
+"""
+
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+
+# 检测模式：local（纯本地）| llm（每次调用 Gemini）| hybrid（仅不确定时调用 Gemini）
+TOPIC_DETECTION_MODES = ("local", "llm", "hybrid")
+TOPIC_DETECTION_MODE = os.getenv("TOPIC_DETECTION_MODE", "hybrid").lower()
+if TOPIC_DETECTION_MODE not in TOPIC_DETECTION_MODES:
+    raise ValueError(
+        f"Unknown TOPIC_DETECTION_MODE {TOPIC_DETECTION_MODE!r}, expected one of {', '.join(TOPIC_DETECTION_MODES)}"
+    )
+
+# 相似度低于该值 → 主题切换；高于 SAME 阈值 → 同一主题；中间为不确定区间
+TOPIC_SHIFT_THRESHOLD = float(os.getenv("TOPIC_SHIFT_THRESHOLD", "0.05"))
+TOPIC_SAME_THRESHOLD = float(os.getenv("TOPIC_SAME_THRESHOLD", "0.15"))
+
+# 至少需要多少条历史捕捉才进行检测
+TOPIC_MIN_CAPTURES = int(os.getenv("TOPIC_MIN_CAPTURES", "3"))
+
+_WORD_RE = re.compile(r"[a-z0-9][a-z0-9_+#.\-]*[a-z0-9+#]|[a-z0-9]")
+_CJK_RE = re.compile(r"[㐀-䶿一-鿿豈-﫿]+")
+
+_STOP_WORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "is", "are",
+    "was", "were", "be", "it", "this", "that", "with", "as", "by", "at", "from",
+    "can", "you", "we", "your", "its", "not", "but", "if", "so", "do", "does",
+}
+
+# 高频虚词，包含它们的二元组基本不携带主题信息
+_STOP_CHARS = set("的了是在和与及或也就都而这那个我你他她它们把被让吗呢吧啊")
+
+
+def extract_terms(text: str) -> list[str]:
+    """
+    Split text into topic terms.
+
+    Latin text is split into words; CJK runs are split into character bigrams,
+    which works well for Chinese without a segmenter.
+    """
+    if not text:
+        return []
+
+    text = unicodedata.normalize("NFKC", text).lower()
+    terms = [word for word in _WORD_RE.findall(text) if word not in _STOP_WORDS]
+
+    for run in _CJK_RE.findall(text):
+        if len(run) == 1:
+            if run not in _STOP_CHARS:
+                terms.append(run)
+            continue
+        for i in range(len(run) - 1):
+            bigram = run[i:i + 2]
+            if bigram[0] in _STOP_CHARS or bigram[1] in _STOP_CHARS:
+                continue
+            terms.append(bigram)
+
+    return terms
+
+
+def text_vector(text: str) -> dict[str, float]:
+    """Sublinear TF vector of a text, L2-normalized."""
+    counts = Counter(extract_terms(text))
+    vector = {term: 1.0 + math.log(count) for term, count in counts.items()}
+    return normalize(vector)
+
+
+def normalize(vector: dict[str, float]) -> dict[str, float]:
+    """Scale a sparse vector to unit length."""
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    if norm == 0:
+        return {}
+    return {term: value / norm for term, value in vector.items()}
+
+
+def centroid(vectors: list[dict[str, float]]) -> dict[str, float]:
+    """Mean of several unit vectors."""
+    total = Counter()
+    for vector in vectors:
+        total.update(vector)
+    if not vectors:
+        return {}
+    return {term: value / len(vectors) for term, value in total.items()}
+
+
+def cosine(a: dict[str, float], b: dict[str, float]) -> float:
+    """Cosine similarity of two sparse vectors."""
+    if not a or not b:
+        return 0.0
+    if len(a) > len(b):
+        a, b = b, a
+    dot = sum(value * b.get(term, 0.0) for term, value in a.items())
+    norm_a = math.sqrt(sum(value * value for value in a.values()))
+    norm_b = math.sqrt(sum(value * value for value in b.values()))
+    if norm_a == 0 or norm_b == 0:
+        return 0.0
+    return dot / (norm_a * norm_b)
+
+
+def classify_similarity(score: float) -> str:
+    """
+    Map a similarity score to a verdict.
+
+    Returns:
+        "shift", "same" or "uncertain"
+    """
+    if score < TOPIC_SHIFT_THRESHOLD:
+        return "shift"
+    if score >= TOPIC_SAME_THRESHOLD:
+        return "same"
+    return "uncertain"
+
+
+def score_against_centroid(new_text: str, topic_centroid: dict[str, float]) -> float:
+    """Similarity of a new text to a session's topic centroid."""
+    return cosine(text_vector(new_text), topic_centroid)
+
+
+def classify_vector(vector: dict[str, float], topic_centroid: dict[str, float]) -> tuple[float, str]:
+    """
+    Score a text vector against a topic centroid and classify the score.
+
+    Text without any topic terms ("it is", "是的", punctuation) has an empty
+    vector; it carries no evidence of a new topic, so it stays in the
+    current one instead of scoring 0.0 and counting as a shift.
+
+    Returns:
+        (score, verdict) with verdict "shift", "same" or "uncertain"
+    """
+    if not vector:
+        return 0.0, "same"
+    score = cosine(vector, topic_centroid)
+    return score, classify_similarity(score)
+
+
+def topic_label(text: str, max_length: int = 20) -> str:
+    """Short label for a new session, taken from the first line of the text."""
+    first_line = next((line.strip() for line in text.splitlines() if line.strip()), "")
+    if len(first_line) > max_length:
+        return first_line[:max_length] + "..."
+    return first_line or "新学习会话"